@@ -1,30 +1,156 @@
 import streamlit as st
-import pandas as pd
 import os
-from config_db import conectar_banco  # Função de conexão com o banco de dados
+from memoria import obter_monitor_memoria, medir_sessoes, contar_sessoes, rss_processo
 from dotenv import load_dotenv
 
 load_dotenv()
-# Função para apagar todos os dados e inserir os novos dados no banco de dados
+# Começa a medir a memória do processo assim que o servidor carrega a página inicial
+obter_monitor_memoria()
+
+# Função para substituir os dados do banco pelos da planilha de uma só vez
 def atualizar_dados(df):
-    conn = conectar_banco()
-    cur = conn.cursor()
+    from carga_custos import carregar_custos
+    from catalogo import limpar_cache_catalogo
+    try:
+        resultado = carregar_custos(df)
+    except Exception as e:
+        st.error(f"Erro ao atualizar os dados: {e}")
+        return
+
+    if resultado['versao_alterada']:
+        limpar_cache_catalogo()
+
+    st.success(
+        f"Dados atualizados com sucesso! {resultado['linhas_inseridas']} linhas carregadas "
+        f"({resultado['linhas_removidas']} substituídas) em {resultado['tempo_total']:.2f} s "
+        f"(cópia: {resultado['tempo_copia']:.2f} s, troca: {resultado['tempo_troca']:.2f} s). "
+        f"Versão do catálogo: {resultado['versao']}."
+    )
+
+# Função para gravar apenas as diferenças entre a planilha e o banco de dados
+def sincronizar_dados(df):
+    from carga_custos import sincronizar_custos
+    from catalogo import limpar_cache_catalogo
+    try:
+        resultado = sincronizar_custos(df)
+    except Exception as e:
+        st.error(f"Erro ao sincronizar os dados: {e}")
+        return
+
+    # Os caches só precisam ser limpos quando o catálogo realmente mudou
+    if not resultado['versao_alterada']:
+        st.info(f"Nenhuma alteração encontrada. O catálogo continua na versão {resultado['versao']}.")
+        return
+
+    limpar_cache_catalogo()
+    st.success(
+        f"Dados sincronizados com sucesso! {resultado['linhas_inseridas']} inseridas, "
+        f"{resultado['linhas_atualizadas']} atualizadas, {resultado['linhas_removidas']} removidas e "
+        f"{resultado['linhas_inalteradas']} inalteradas em {resultado['tempo_total']:.2f} s. "
+        f"Catálogo na versão {resultado['versao']}."
+    )
+
+# Função para exibir o que mudaria no banco com a planilha enviada
+def exibir_previa(diferencas):
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Novas", len(diferencas['novos']))
+    col2.metric("Alteradas", len(diferencas['alterados']))
+    col3.metric("Removidas", len(diferencas['removidos']))
+    col4.metric("Inalteradas", diferencas['inalterados'])
+
+    if not diferencas['alteracoes'].empty:
+        st.write("Valores alterados:")
+        st.dataframe(diferencas['alteracoes'])
+    if not diferencas['novos'].empty:
+        st.write("Linhas novas:")
+        st.dataframe(diferencas['novos'])
+    if not diferencas['removidos'].empty:
+        st.write("Linhas que serão removidas:")
+        st.dataframe(diferencas['removidos'])
+
+# Função para atualizar a lista de municípios distribuída com a aplicação a partir do IBGE
+def atualizar_municipios():
+    from municipios import atualizar
+    try:
+        resultado = atualizar()
+    except Exception as e:
+        st.error(f"Erro ao atualizar os municípios: {e}")
+        return
+    st.success(
+        f"{resultado['municipios']} municípios gravados (versão {resultado['versao']}): "
+        f"{len(resultado['incluidos'])} incluídos, {len(resultado['removidos'])} removidos."
+    )
+    if resultado['incluidos'] or resultado['removidos']:
+        st.write("Incluídos:", resultado['incluidos'])
+        st.write("Removidos:", resultado['removidos'])
+
+# Função para exibir a caixa de saída do arquivamento de propostas no SharePoint
+def exibir_arquivamento():
+    from arquivamento import obter_arquivamento
+
+    arquivamento = obter_arquivamento()
+    resumo = arquivamento.resumo()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Pendentes", resumo['pendentes'])
+    col2.metric("Em falha", resumo['em_falha'])
+    col3.metric("Arquivadas", resumo['arquivadas'], help="Desde que o servidor iniciou")
+    if resumo['ultimo_erro']:
+        st.write(f"Último erro: {resumo['ultimo_erro']}")
+    if resumo['em_falha'] and st.button("Reenviar falhas"):
+        st.success(f"{arquivamento.reenviar_falhas()} propostas devolvidas para a caixa de saída.")
 
-    # Apaga todos os dados da tabela
-    cur.execute("DELETE FROM custos_media_tensao")
-    conn.commit()
+MB = 1024 * 1024
 
-    # Insere os novos dados com as colunas corretas e colunas formatadas
-    for index, row in df.iterrows():
+# Função para exibir o uso de memória do servidor: processo, sessões e o que cada chave do session_state ocupa
+def exibir_uso_memoria():
+    import pandas as pd
+    from renderizacao import obter_servico_renderizacao
+    from artefatos import obter_armazem_artefatos
 
-        cur.execute("""
-            INSERT INTO custos_media_tensao (p_caixa, p_trafo, potencia, preco, perdas, classe_tensao, valor_ip_baixo, valor_ip_alto,cod_proj_custo,descricao, potencia_formatada,cod_proj_caixa)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s , %s , %s)
-        """, (row['p_caixa'], row['p_trafo'], row['potencia'], row['preco'], row['perdas'], row['classe_tensao'], row['valor_ip_baixo'], row['valor_ip_alto'],row['cod_proj_custo'], row['descricao'], row['potencia_formatada'],row['cod_proj_caixa']))
-    conn.commit()
-    cur.close()
-    conn.close()
-    st.success("Dados atualizados com sucesso!")
+    rss = rss_processo()
+    cache = obter_servico_renderizacao().cache.resumo()
+    downloads = obter_armazem_artefatos().resumo()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Memória do processo (RSS)", f"{rss / MB:.0f} MB" if rss is not None else "N/D")
+    col2.metric("Sessões", contar_sessoes())
+    col3.metric("Documentos em memória", f"{cache['tamanho_mb']:.1f} MB", help=f"{cache['documentos']} documentos no cache")
+    col4.metric("Downloads em disco", f"{downloads['tamanho_mb']:.1f} MB", help=f"{downloads['documentos']} documentos")
+
+    # Histórico medido em segundo plano desde que o servidor iniciou
+    historico = pd.DataFrame(obter_monitor_memoria().historico())
+    if len(historico) > 1:
+        historico['momento'] = pd.to_datetime(historico['momento'], unit='s')
+        historico['RSS (MB)'] = historico['rss_bytes'] / MB
+        st.line_chart(historico.set_index('momento')[['RSS (MB)']])
+        st.line_chart(historico.set_index('momento')[['sessoes']].rename(columns={'sessoes': 'Sessões'}))
+
+    # A medição percorre todo o session_state de cada sessão, por isso só roda quando pedida
+    if st.button("Medir sessões"):
+        medicoes = medir_sessoes()
+        if not medicoes:
+            st.info("Nenhuma sessão encontrada (a medição só funciona com o servidor do Streamlit).")
+            return
+
+        st.write(f"Total estimado nas sessões: {sum(m['total_bytes'] for m in medicoes) / MB:.1f} MB")
+        st.write("Por sessão:")
+        st.dataframe(pd.DataFrame([{
+            'Sessão': medicao['sessao'][:8],
+            'Ativa': medicao['ativa'],
+            'Chaves': medicao['chaves'],
+            'Tamanho (MB)': medicao['total_bytes'] / MB,
+            'Maior chave': max(medicao['por_chave'], key=medicao['por_chave'].get, default=''),
+        } for medicao in medicoes]))
+
+        por_chave = pd.DataFrame([
+            {'Chave': chave, 'bytes': tamanho}
+            for medicao in medicoes for chave, tamanho in medicao['por_chave'].items()
+        ])
+        if not por_chave.empty:
+            st.write("Por chave do session_state (somando todas as sessões):")
+            resumo = por_chave.groupby('Chave')['bytes'].agg(['count', 'sum', 'max']).sort_values('sum', ascending=False)
+            resumo.columns = ['Sessões', 'Total (MB)', 'Maior (MB)']
+            resumo[['Total (MB)', 'Maior (MB)']] = resumo[['Total (MB)', 'Maior (MB)']] / MB
+            st.dataframe(resumo)
 
 # Interface da página principal (Home)
 st.title("Proposta Automatizada - Média Tensão")
@@ -60,6 +186,10 @@ if not st.session_state['autenticado']:
             st.error("Senha incorreta. Tente novamente.")
 
 if st.session_state['autenticado']:
+    # pandas e a carga de custos só são importados na área administrativa; a página inicial abre sem eles
+    import pandas as pd
+    from carga_custos import comparar_com_banco, COLUNAS_CUSTOS  # Carga da tabela de custos
+
     st.subheader("Atualizar Base de Dados")
     
     uploaded_file = st.file_uploader("Escolha o arquivo Excel com a planilha 'atualizacao'", type="xlsx")
@@ -73,26 +203,48 @@ if st.session_state['autenticado']:
             # Certifica-se de que a aba 'atualizacao' está presente
             if 'atualizacao' in excel_file.sheet_names:
                 df = pd.read_excel(uploaded_file, sheet_name='atualizacao')
-                
-                # Exibe os dados carregados para conferência
-                st.write("Dados carregados:")
-                st.dataframe(df)
-
-                # Exibe as colunas encontradas
-                st.write("Colunas encontradas no arquivo:", df.columns.tolist())
 
                 # Verificação de layout
-                expected_columns = ['p_caixa', 'p_trafo', 'potencia', 'preco', 'perdas', 'classe_tensao', 'valor_ip_baixo', 'valor_ip_alto', 'cod_proj_custo', 'descricao', 'potencia_formatada', 'cod_proj_caixa']
+                expected_columns = COLUNAS_CUSTOS
                 if all(col in df.columns for col in expected_columns):
-                    # Verifica os tipos de dados no DataFrame
-                    st.write("Tipos de dados no DataFrame:", df.dtypes)
+                    modo = st.radio(
+                        "Modo de atualização:",
+                        options=["Incremental (somente alterações)", "Substituição completa"],
+                        index=0
+                    )
 
-                    # Botão para atualizar os dados no banco de dados
-                    if st.button("Atualizar dados"):
-                        atualizar_dados(df)
+                    if modo == "Incremental (somente alterações)":
+                        # Prévia das diferenças no lugar da tabela completa
+                        diferencas = comparar_com_banco(df)
+                        exibir_previa(diferencas)
+
+                        # Botão para gravar as diferenças no banco de dados
+                        if st.button("Atualizar dados"):
+                            sincronizar_dados(df)
+                    else:
+                        st.write(f"{len(df)} linhas serão carregadas, substituindo todo o catálogo.")
+
+                        # Botão para atualizar os dados no banco de dados
+                        if st.button("Atualizar dados"):
+                            atualizar_dados(df)
                 else:
+                    st.write("Colunas encontradas no arquivo:", df.columns.tolist())
                     st.error("A planilha não possui o layout esperado. Verifique as colunas.")
             else:
                 st.error("A aba 'atualizacao' não foi encontrada no arquivo enviado.")
         except Exception as e:
             st.error(f"Erro ao ler o arquivo: {e}")
+
+    st.markdown("---")
+    st.subheader("Lista de Municípios")
+    st.write("Lista do IBGE usada nos campos de Local Frete, distribuída com a aplicação.")
+    if st.button("Atualizar municípios (IBGE)"):
+        atualizar_municipios()
+
+    st.markdown("---")
+    st.subheader("Arquivamento no SharePoint")
+    exibir_arquivamento()
+
+    st.markdown("---")
+    st.subheader("Uso de Memória do Servidor")
+    exibir_uso_memoria()
@@ -0,0 +1,113 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+PASTA_APLICACAO = os.path.dirname(os.path.abspath(__file__))
+PAGINA_INICIAL = 'Home.py'
+
+
+def _catalogo():
+    from catalogo import obter_catalogo
+    return f"{len(obter_catalogo())} itens"
+
+
+def _municipios():
+    from municipios import obter_municipios
+    return f"{len(obter_municipios().nomes)} municípios"
+
+
+def _indice_frete():
+    from indice_frete import obter_indice_frete
+    return f"{len(obter_indice_frete().fretes)} municípios"
+
+
+def _template():
+    from cache_template import obter_cache_template
+    cache_template = obter_cache_template()
+    cache_template.caminho_arquivo()
+    return f"versão {cache_template.hash()[:12]}"
+
+
+def _renderizacao():
+    from renderizacao import obter_servico_renderizacao
+    servico = obter_servico_renderizacao()
+    servico.aquecer()
+    return f"{servico.trabalhadores} processos" if servico.trabalhadores else "threads"
+
+
+def _arquivamento():
+    from arquivamento import obter_arquivamento
+    return f"{obter_arquivamento().resumo()['pendentes']} propostas pendentes"
+
+
+# Dados carregados antes do primeiro acesso, na ordem: cada etapa devolve um resumo do que carregou
+ETAPAS = [
+    ('catálogo', _catalogo),
+    ('municípios', _municipios),
+    ('índice de frete', _indice_frete),
+    ('template', _template),
+    ('geração de documentos', _renderizacao),
+    # Retoma o envio ao SharePoint do que ficou na caixa de saída, sem esperar uma proposta nova
+    ('arquivamento', _arquivamento),
+]
+
+
+# Função para carregar os caches do processo (catálogo, municípios, frete, template e processos de geração)
+# e iniciar o arquivamento em segundo plano; uma etapa com erro (ex.: banco fora do ar) não impede as outras,
+# e o primeiro acesso tenta de novo
+def aquecer(etapas=ETAPAS):
+    resultados = {}
+    inicio_total = time.perf_counter()
+    for nome, etapa in etapas:
+        inicio = time.perf_counter()
+        try:
+            resumo = etapa()
+        except Exception as e:
+            # Só a primeira linha: algumas mensagens (ex.: do psycopg2) têm várias
+            resumo = f"erro: {(str(e).strip() or type(e).__name__).splitlines()[0]}"
+        resultados[nome] = (time.perf_counter() - inicio, resumo)
+        print(f"Aquecimento - {nome}: {resultados[nome][0]:.2f} s ({resumo})")
+    print(f"Aquecimento concluído em {time.perf_counter() - inicio_total:.2f} s.")
+    return resultados
+
+
+_thread_aquecimento = None
+_lock_aquecimento = threading.Lock()
+
+
+# Função para aquecer em segundo plano: o servidor começa a atender enquanto os caches são carregados
+def iniciar_aquecimento():
+    global _thread_aquecimento
+    with _lock_aquecimento:
+        if _thread_aquecimento is None:
+            _thread_aquecimento = threading.Thread(target=aquecer, name="aquecimento", daemon=True)
+            _thread_aquecimento.start()
+    return _thread_aquecimento
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inicia o servidor do Streamlit já carregando os caches no mesmo processo. "
+                    "Os demais argumentos vão para o 'streamlit run' (ex.: --server.port 8501)."
+    )
+    parser.add_argument('--somente', action='store_true', help="Só aquece e mostra os tempos, sem iniciar o servidor")
+    parser.add_argument('--pagina', default=PAGINA_INICIAL, help="Página principal da aplicação")
+    args, argumentos_streamlit = parser.parse_known_args()
+
+    os.chdir(PASTA_APLICACAO)
+    sys.path.insert(0, PASTA_APLICACAO)
+    if args.somente:
+        resultados = aquecer()
+        return 1 if any(resumo.startswith('erro:') for _, resumo in resultados.values()) else 0
+
+    # O aquecimento precisa rodar no processo do servidor: os caches são do processo
+    from streamlit.web import cli
+    iniciar_aquecimento()
+    sys.argv = ['streamlit', 'run', args.pagina, *argumentos_streamlit]
+    return cli.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Caixa de saída em disco com as propostas a arquivar no SharePoint; sobrevive ao reinício do servidor
+PASTA_ARQUIVAMENTO = os.getenv(
+    "ARQUIVAMENTO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'arquivamento')
+)
+# Pasta da biblioteca do SharePoint onde as propostas são arquivadas
+PASTA_PROPOSTAS = os.getenv("SHAREPOINT_PASTA_PROPOSTAS", "Propostas")
+# Envios simultâneos e propostas tratadas a cada rodada do envio em segundo plano
+CONCORRENCIA = int(os.getenv("ARQUIVAMENTO_CONCORRENCIA", "2"))
+TAMANHO_LOTE = int(os.getenv("ARQUIVAMENTO_LOTE", "10"))
+# Rodadas com erro até a proposta ir para a pasta de falhas; a espera entre elas dobra até o máximo (s)
+MAXIMO_TENTATIVAS = int(os.getenv("ARQUIVAMENTO_TENTATIVAS", "8"))
+ESPERA_INICIAL = 30
+ESPERA_MAXIMA = 3600
+
+MANIFESTO = 'tarefa.json'
+# Arquivo travado por quem está enviando as pendentes (o servidor ou o "arquivamento.py --enviar")
+ARQUIVO_TRAVA = '.trava'
+# Pastas .tmp mais antigas que isso (s) sobraram de uma gravação interrompida e podem ser apagadas
+IDADE_TEMPORARIO = 3600
+
+# Proposta na caixa de saída: arquivos guardados na pasta da tarefa e os que já foram enviados
+Tarefa = namedtuple('Tarefa', ['id', 'pasta_destino', 'arquivos', 'criada_em', 'tentativas',
+                               'proxima_tentativa', 'ultimo_erro', 'enviados'])
+
+
+# Função padrão para enviar um arquivo ao SharePoint (cliente compartilhado, com login reaproveitado)
+def enviar_ao_sharepoint(caminho, pasta_destino, nome_arquivo):
+    from sharepoint_code import obter_sharepoint
+    obter_sharepoint().enviar_arquivo(caminho, pasta_destino, nome_arquivo)
+
+
+def _travar(arquivo, esperar):
+    if fcntl is not None:
+        try:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | (0 if esperar else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+    while True:
+        try:
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not esperar:
+                return False
+            time.sleep(0.5)
+
+
+def _destravar(arquivo):
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+    else:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Trava entre processos da caixa de saída: devolve False se outro processo está enviando e esperar=False
+@contextmanager
+def travar_caixa(caminho, esperar=True):
+    with open(caminho, 'a+b') as arquivo:
+        travada = _travar(arquivo, esperar)
+        try:
+            yield travada
+        finally:
+            if travada:
+                _destravar(arquivo)
+
+
+# Arquivamento assíncrono: as propostas entram numa caixa de saída em disco (gravação atômica) e uma
+# thread em segundo plano envia em lotes, com envios simultâneos limitados e novas tentativas com espera
+class ArquivamentoPropostas:
+    def __init__(self, pasta=PASTA_ARQUIVAMENTO, enviar=enviar_ao_sharepoint, concorrencia=CONCORRENCIA,
+                 tamanho_lote=TAMANHO_LOTE, maximo_tentativas=MAXIMO_TENTATIVAS,
+                 espera_inicial=ESPERA_INICIAL, espera_maxima=ESPERA_MAXIMA):
+        self.pasta_pendentes = os.path.join(pasta, 'pendentes')
+        self.pasta_falhas = os.path.join(pasta, 'falhas')
+        self.arquivo_trava = os.path.join(pasta, ARQUIVO_TRAVA)
+        self._enviar = enviar
+        self.concorrencia = concorrencia
+        self.tamanho_lote = tamanho_lote
+        self.maximo_tentativas = maximo_tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._thread = None
+        self._executor = None
+        self.estatisticas = {'enfileiradas': 0, 'arquivadas': 0, 'erros': 0, 'falhas': 0}
+        self.ultimo_erro = None
+        os.makedirs(self.pasta_pendentes, exist_ok=True)
+        os.makedirs(self.pasta_falhas, exist_ok=True)
+        self._tarefas = self._carregar(self.pasta_pendentes)
+
+    # Lê as tarefas de uma pasta; as que não terminaram de ser gravadas (.tmp) ficam de fora, e as antigas
+    # são apagadas (as recentes podem estar sendo gravadas agora por outro processo)
+    def _carregar(self, pasta):
+        tarefas = {}
+        for nome in os.listdir(pasta):
+            caminho = os.path.join(pasta, nome)
+            if nome.endswith('.tmp'):
+                try:
+                    if time.time() - os.path.getmtime(caminho) > IDADE_TEMPORARIO:
+                        shutil.rmtree(caminho, ignore_errors=True)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(os.path.join(caminho, MANIFESTO), encoding='utf-8') as arquivo:
+                    tarefas[nome] = Tarefa(**json.load(arquivo))
+            except (OSError, ValueError, TypeError) as e:
+                print(f"Tarefa de arquivamento ilegível em {caminho}: {e}")
+        return tarefas
+
+    def _gravar_manifesto(self, pasta_tarefa, tarefa):
+        temporario = os.path.join(pasta_tarefa, MANIFESTO + '.tmp')
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(tarefa._asdict(), arquivo, ensure_ascii=False)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, os.path.join(pasta_tarefa, MANIFESTO))
+
+    # Guarda os arquivos ({nome: conteúdo}) na caixa de saída e devolve na hora; o envio é em segundo plano
+    def enfileirar(self, arquivos, pasta_destino=PASTA_PROPOSTAS):
+        tarefa = Tarefa(
+            id=uuid.uuid4().hex,
+            pasta_destino=pasta_destino,
+            arquivos=[os.path.basename(nome) for nome in arquivos],
+            criada_em=time.time(),
+            tentativas=0,
+            proxima_tentativa=0.0,
+            ultimo_erro=None,
+            enviados=[],
+        )
+        # A tarefa só aparece na caixa de saída depois de gravada por inteiro
+        temporario = os.path.join(self.pasta_pendentes, tarefa.id + '.tmp')
+        os.makedirs(temporario)
+        try:
+            for nome, conteudo in arquivos.items():
+                with open(os.path.join(temporario, os.path.basename(nome)), 'wb') as arquivo:
+                    arquivo.write(conteudo)
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+            self._gravar_manifesto(temporario, tarefa)
+            os.replace(temporario, os.path.join(self.pasta_pendentes, tarefa.id))
+        except BaseException:
+            shutil.rmtree(temporario, ignore_errors=True)
+            raise
+
+        with self._lock:
+            self._tarefas[tarefa.id] = tarefa
+            self.estatisticas['enfileiradas'] += 1
+        self._evento.set()
+        return tarefa.id
+
+    # Envia os arquivos que faltam da tarefa; com erro, agenda a próxima tentativa ou move para as falhas
+    def _processar(self, tarefa):
+        pasta_tarefa = os.path.join(self.pasta_pendentes, tarefa.id)
+        enviados = list(tarefa.enviados)
+        try:
+            for nome in tarefa.arquivos:
+                if nome in enviados:
+                    continue
+                self._enviar(os.path.join(pasta_tarefa, nome), tarefa.pasta_destino, nome)
+                enviados.append(nome)
+                # Registra o progresso para não reenviar o arquivo se o servidor cair no meio da tarefa
+                self._gravar_manifesto(pasta_tarefa, tarefa._replace(enviados=enviados))
+        except Exception as e:
+            tentativas = tarefa.tentativas + 1
+            erro = f"{type(e).__name__}: {e}"
+            espera = min(self.espera_inicial * 2 ** (tentativas - 1), self.espera_maxima)
+            tarefa = tarefa._replace(tentativas=tentativas, proxima_tentativa=time.time() + espera,
+                                     ultimo_erro=erro, enviados=enviados)
+            self._gravar_manifesto(pasta_tarefa, tarefa)
+            with self._lock:
+                self.estatisticas['erros'] += 1
+                self.ultimo_erro = erro
+                if tentativas < self.maximo_tentativas:
+                    self._tarefas[tarefa.id] = tarefa
+                    return False
+                del self._tarefas[tarefa.id]
+                self.estatisticas['falhas'] += 1
+            os.replace(pasta_tarefa, os.path.join(self.pasta_falhas, tarefa.id))
+            print(f"Arquivamento da tarefa {tarefa.id} desistiu após {tentativas} tentativas: {erro}")
+            return False
+
+        shutil.rmtree(pasta_tarefa, ignore_errors=True)
+        with self._lock:
+            del self._tarefas[tarefa.id]
+            self.estatisticas['arquivadas'] += 1
+        return True
+
+    # Relê a caixa de saída do disco: outro processo pode ter enviado ou acrescentado tarefas
+    def _recarregar(self):
+        tarefas = self._carregar(self.pasta_pendentes)
+        with self._lock:
+            self._tarefas = tarefas
+
+    # Tarefas prontas para envio (a espera já passou), das mais antigas para as mais novas
+    def _proximo_lote(self):
+        agora = time.time()
+        with self._lock:
+            prontas = [tarefa for tarefa in self._tarefas.values() if tarefa.proxima_tentativa <= agora]
+        return sorted(prontas, key=lambda tarefa: tarefa.criada_em)[:self.tamanho_lote]
+
+    # Envia um lote de tarefas prontas, no máximo "concorrencia" ao mesmo tempo; devolve quantas foram tratadas,
+    # ou None se outro processo está enviando a caixa de saída agora
+    def processar_lote(self):
+        with travar_caixa(self.arquivo_trava, esperar=False) as travada:
+            if not travada:
+                return None
+            self._recarregar()
+            lote = self._proximo_lote()
+            if not lote:
+                return 0
+            if self._executor is None:
+                for tarefa in lote:
+                    self._processar(tarefa)
+            else:
+                list(self._executor.map(self._processar, lote))
+            return len(lote)
+
+    # Tenta enviar agora cada tarefa pendente uma vez, sem esperar o horário agendado; devolve quantas foram
+    # arquivadas. Espera o servidor terminar o lote em andamento, se houver.
+    def enviar_pendentes(self):
+        with travar_caixa(self.arquivo_trava):
+            self._recarregar()
+            with self._lock:
+                tarefas = sorted(self._tarefas.values(), key=lambda tarefa: tarefa.criada_em)
+            return sum(self._processar(tarefa) for tarefa in tarefas)
+
+    def _segundos_ate_proxima(self):
+        with self._lock:
+            proximas = [tarefa.proxima_tentativa for tarefa in self._tarefas.values()]
+        if not proximas:
+            return None
+        return max(min(proximas) - time.time(), 0.0)
+
+    def _executar(self):
+        while True:
+            espera = None
+            try:
+                tratadas = self.processar_lote()
+                if tratadas:
+                    continue
+                if tratadas is None:
+                    # Outro processo (ex.: "arquivamento.py --enviar") está enviando; tenta de novo depois
+                    espera = self.espera_inicial
+            except Exception as e:
+                # Erro na própria caixa de saída (ex.: disco); tenta de novo na próxima rodada
+                print(f"Erro no arquivamento de propostas: {e}")
+                time.sleep(self.espera_inicial)
+            self._evento.wait(espera if espera is not None else self._segundos_ate_proxima())
+            self._evento.clear()
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concorrencia, thread_name_prefix="arquivamento")
+                self._thread = threading.Thread(target=self._executar, name="arquivamento", daemon=True)
+                self._thread.start()
+
+    # Devolve as tarefas da pasta de falhas para a caixa de saída, com as tentativas zeradas
+    def reenviar_falhas(self):
+        with travar_caixa(self.arquivo_trava):
+            falhas = self._carregar(self.pasta_falhas)
+            for tarefa in falhas.values():
+                tarefa = tarefa._replace(tentativas=0, proxima_tentativa=0.0)
+                origem = os.path.join(self.pasta_falhas, tarefa.id)
+                self._gravar_manifesto(origem, tarefa)
+                os.replace(origem, os.path.join(self.pasta_pendentes, tarefa.id))
+                with self._lock:
+                    self._tarefas[tarefa.id] = tarefa
+        self._evento.set()
+        return len(falhas)
+
+    def resumo(self):
+        falhas = sum(not nome.endswith('.tmp') for nome in os.listdir(self.pasta_falhas))
+        with self._lock:
+            return {
+                'pendentes': len(self._tarefas),
+                'em_falha': falhas,
+                'ultimo_erro': self.ultimo_erro,
+                **self.estatisticas,
+            }
+
+
+_arquivamento = None
+_lock_arquivamento = threading.Lock()
+
+
+# Função para obter o arquivamento do processo (inicia o envio em segundo plano na primeira chamada,
+# retomando o que ficou na caixa de saída)
+def obter_arquivamento():
+    global _arquivamento
+    if _arquivamento is None:
+        with _lock_arquivamento:
+            if _arquivamento is None:
+                _arquivamento = ArquivamentoPropostas()
+                _arquivamento.iniciar()
+    return _arquivamento
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caixa de saída das propostas arquivadas no SharePoint.")
+    parser.add_argument('--enviar', action='store_true', help="Envia agora as propostas pendentes")
+    parser.add_argument('--reenviar-falhas', action='store_true', help="Devolve as falhas para a caixa de saída")
+    parser.add_argument('--pasta', default=PASTA_ARQUIVAMENTO)
+    args = parser.parse_args()
+
+    arquivamento = ArquivamentoPropostas(args.pasta)
+    if args.reenviar_falhas:
+        print(f"{arquivamento.reenviar_falhas()} propostas devolvidas para a caixa de saída.")
+    if args.enviar:
+        arquivamento.enviar_pendentes()
+    resumo = arquivamento.resumo()
+    print(f"{resumo['pendentes']} propostas pendentes, {resumo['em_falha']} em falha, {resumo['arquivadas']} arquivadas agora.")
+    if resumo['ultimo_erro']:
+        print(f"Último erro: {resumo['ultimo_erro']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+# Pasta onde os documentos gerados ficam até serem baixados
+PASTA_ARTEFATOS = os.getenv("ARTEFATOS_DIR", os.path.join(tempfile.gettempdir(), "propostas_artefatos"))
+# Espaço máximo (MB) ocupado na pasta por todos os usuários
+LIMITE_MB = float(os.getenv("ARTEFATOS_LIMITE_MB", "1024"))
+# Documentos guardados por sessão (os mais antigos dão lugar aos novos)
+LIMITE_POR_SESSAO = int(os.getenv("ARTEFATOS_POR_SESSAO", "6"))
+# Tempo (s) sem acesso até um documento ser apagado
+ARTEFATOS_TTL = float(os.getenv("ARTEFATOS_TTL", str(4 * 3600)))
+
+EXTENSAO = '.artefato'
+
+# Referência a um documento guardado em disco; é só isso que fica no session_state
+Artefato = namedtuple('Artefato', ['id', 'sessao', 'nome_arquivo', 'mime', 'tamanho'])
+
+
+# Armazém de documentos gerados em disco, com limite total, limite por sessão e limpeza por TTL/LRU
+class ArmazemArtefatos:
+    def __init__(self, pasta=PASTA_ARTEFATOS, limite_bytes=int(LIMITE_MB * 1024 * 1024),
+                 limite_por_sessao=LIMITE_POR_SESSAO, ttl=ARTEFATOS_TTL):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        self.limite_por_sessao = limite_por_sessao
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # id -> (artefato, último acesso), do menos para o mais usado recentemente
+        self._artefatos = OrderedDict()
+        self.tamanho_bytes = 0
+        self.estatisticas = {'guardados': 0, 'leituras': 0, 'expirados': 0, 'descartados': 0}
+        os.makedirs(pasta, exist_ok=True)
+        self._remover_orfaos()
+
+    def _caminho(self, id_artefato):
+        return os.path.join(self.pasta, id_artefato + EXTENSAO)
+
+    # Arquivos de uma execução anterior do servidor não têm mais sessão que os use. A pasta pode ser
+    # compartilhada com outros processos, então só sai o que está há mais que o TTL sem acesso.
+    def _remover_orfaos(self):
+        limite = time.time() - self.ttl
+        for nome in os.listdir(self.pasta):
+            if nome.endswith(EXTENSAO) or nome.endswith(EXTENSAO + '.tmp'):
+                caminho = os.path.join(self.pasta, nome)
+                try:
+                    if os.path.getmtime(caminho) < limite:
+                        os.remove(caminho)
+                except OSError:
+                    pass
+
+    def _apagar(self, id_artefato, motivo):
+        artefato, _ = self._artefatos.pop(id_artefato)
+        self.tamanho_bytes -= artefato.tamanho
+        self.estatisticas[motivo] += 1
+        try:
+            os.remove(self._caminho(id_artefato))
+        except FileNotFoundError:
+            pass
+
+    def _limpar_expirados(self):
+        limite = time.monotonic() - self.ttl
+        for id_artefato, (_, acesso) in list(self._artefatos.items()):
+            if acesso < limite:
+                self._apagar(id_artefato, 'expirados')
+
+    # Guarda o conteúdo em disco (gravação atômica) e devolve a referência para o session_state
+    def guardar(self, sessao, nome_arquivo, conteudo, mime):
+        if len(conteudo) > self.limite_bytes:
+            raise ValueError(f"O documento '{nome_arquivo}' é maior que o espaço reservado para downloads.")
+        artefato = Artefato(uuid.uuid4().hex, sessao, nome_arquivo, mime, len(conteudo))
+        temporario = self._caminho(artefato.id) + '.tmp'
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, self._caminho(artefato.id))
+
+        with self._lock:
+            self._artefatos[artefato.id] = (artefato, time.monotonic())
+            self.tamanho_bytes += artefato.tamanho
+            self.estatisticas['guardados'] += 1
+            self._limpar_expirados()
+            # Limite da sessão: descarta os documentos mais antigos dela
+            da_sessao = [id_artefato for id_artefato, (outro, _) in self._artefatos.items() if outro.sessao == sessao]
+            for id_artefato in da_sessao[:max(len(da_sessao) - self.limite_por_sessao, 0)]:
+                self._apagar(id_artefato, 'descartados')
+            # Limite total: descarta os menos usados recentemente, de qualquer sessão
+            while self.tamanho_bytes > self.limite_bytes:
+                self._apagar(next(iter(self._artefatos)), 'descartados')
+        return artefato
+
+    # Conteúdo do documento, ou None se ele já foi apagado (expirado ou descartado)
+    def ler(self, artefato):
+        with self._lock:
+            self._limpar_expirados()
+            if artefato.id not in self._artefatos:
+                return None
+            self._artefatos[artefato.id] = (artefato, time.monotonic())
+            self._artefatos.move_to_end(artefato.id)
+            self.estatisticas['leituras'] += 1
+        try:
+            # A data do arquivo marca o último acesso para a limpeza feita por outros processos
+            os.utime(self._caminho(artefato.id))
+            with open(self._caminho(artefato.id), 'rb') as arquivo:
+                return arquivo.read()
+        except FileNotFoundError:
+            return None
+
+    def existe(self, artefato):
+        with self._lock:
+            self._limpar_expirados()
+            return artefato.id in self._artefatos
+
+    # Apaga os documentos da sessão (ex.: quando ela gera documentos novos no lugar dos anteriores)
+    def remover_sessao(self, sessao):
+        with self._lock:
+            for id_artefato, (artefato, _) in list(self._artefatos.items()):
+                if artefato.sessao == sessao:
+                    self._apagar(id_artefato, 'descartados')
+
+    def limpar_expirados(self):
+        with self._lock:
+            self._limpar_expirados()
+
+    def resumo(self):
+        with self._lock:
+            self._limpar_expirados()
+            return {
+                'documentos': len(self._artefatos),
+                'sessoes': len({artefato.sessao for artefato, _ in self._artefatos.values()}),
+                'tamanho_mb': self.tamanho_bytes / (1024 * 1024),
+                'limite_mb': self.limite_bytes / (1024 * 1024),
+                **self.estatisticas,
+            }
+
+
+_armazem = None
+_lock_armazem = threading.Lock()
+
+
+# Função para obter o armazém de documentos compartilhado pelo processo do servidor
+def obter_armazem_artefatos():
+    global _armazem
+    if _armazem is None:
+        with _lock_armazem:
+            if _armazem is None:
+                _armazem = ArmazemArtefatos()
+    return _armazem
@@ -1,6 +1,11 @@
 import streamlit as st
-from msal import ConfidentialClientApplication
+from msal import ConfidentialClientApplication, SerializableTokenCache
+import hashlib
+import json
 import os
+import secrets
+import threading
+import time
 from dotenv import load_dotenv
 
 CLIENT_ID = os.getenv('AZURE_CLIENT_ID')
@@ -10,15 +15,149 @@ AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
 REDIRECT_URI = os.getenv('REDIRECT_URI')
 SCOPES = ["User.Read"]
 
-EMAILS_PERMITIDOS = os.getenv('EMAILS_PERMITIDOS', '').split(',')
+# E-mails com acesso, sem diferenciar maiúsculas
+EMAILS_PERMITIDOS = frozenset(
+    email.strip().lower() for email in os.getenv('EMAILS_PERMITIDOS', '').split(',') if email.strip()
+)
 
-def init_app():
-    return ConfidentialClientApplication(
+# Cache de tokens do MSAL gravado criptografado (Fernet) para o login silencioso de quem volta.
+# Gere a chave com: python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+# Sem MSAL_CACHE_CHAVE o cache fica só na memória do processo.
+ARQUIVO_CACHE_TOKENS = os.getenv(
+    'MSAL_CACHE_ARQUIVO', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.msal_cache.bin')
+)
+CHAVE_CACHE_TOKENS = os.getenv('MSAL_CACHE_CHAVE')
+# Cookie que liga o navegador à conta no cache (valor aleatório; o token fica só no servidor)
+COOKIE_CONTA = 'proposta_conta'
+DIAS_LEMBRAR = int(os.getenv('MSAL_LEMBRAR_DIAS', '30'))
+
+def _hash(valor):
+    return hashlib.sha256(valor.encode('utf-8')).hexdigest()
+
+# Cache de tokens do processo: tokens do MSAL e, para cada navegador lembrado, a conta e a validade
+class CacheTokens:
+    def __init__(self, arquivo=ARQUIVO_CACHE_TOKENS, chave=CHAVE_CACHE_TOKENS):
+        from cryptography.fernet import Fernet
+        self.arquivo = arquivo
+        self._fernet = Fernet(chave) if chave else None
+        self.msal = SerializableTokenCache()
+        self.navegadores = {}
+        self._alterado = False
+        self._lock = threading.Lock()
+        self._carregar()
+
+    def _carregar(self):
+        from cryptography.fernet import InvalidToken
+        if self._fernet is None or not os.path.exists(self.arquivo):
+            return
+        agora = time.time()
+        try:
+            with open(self.arquivo, 'rb') as arquivo:
+                conteudo = json.loads(self._fernet.decrypt(arquivo.read()))
+            navegadores = {
+                navegador: dados for navegador, dados in conteudo['navegadores'].items() if dados['expira'] > agora
+            }
+            self.msal.deserialize(conteudo['msal'])
+        except (OSError, ValueError, KeyError, InvalidToken) as e:
+            # Chave trocada, arquivo corrompido ou de outro formato: os usuários entram de novo pelo login normal
+            print(f"Cache de tokens ignorado ({type(e).__name__}); os usuários farão login novamente.")
+            return
+        self.navegadores = navegadores
+
+    # Grava o cache (criptografado, gravação atômica) se algo mudou
+    def gravar(self):
+        with self._lock:
+            if self._fernet is None or not (self._alterado or self.msal.has_state_changed):
+                return
+            conteudo = json.dumps({'msal': self.msal.serialize(), 'navegadores': self.navegadores})
+            temporario = self.arquivo + '.tmp'
+            with open(os.open(temporario, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as arquivo:
+                arquivo.write(self._fernet.encrypt(conteudo.encode('utf-8')))
+            os.replace(temporario, self.arquivo)
+            self.msal.has_state_changed = False
+            self._alterado = False
+
+    # Lembra a conta para o navegador e devolve o valor do cookie
+    def lembrar(self, id_conta):
+        valor = secrets.token_urlsafe(32)
+        with self._lock:
+            self.navegadores[_hash(valor)] = {'conta': id_conta, 'expira': time.time() + DIAS_LEMBRAR * 86400}
+            self._alterado = True
+        return valor
+
+    # Conta lembrada para o cookie do navegador (None se desconhecido ou vencido)
+    def conta_do_navegador(self, valor):
+        with self._lock:
+            dados = self.navegadores.get(_hash(valor))
+        if dados is None or dados['expira'] <= time.time():
+            return None
+        return dados['conta']
+
+    def esquecer(self, valor):
+        with self._lock:
+            if self.navegadores.pop(_hash(valor), None) is not None:
+                self._alterado = True
+
+# Cliente MSAL do processo, com o cache de tokens compartilhado por todas as sessões.
+# Fica no cache_resource (e não numa variável do módulo) porque este arquivo roda de novo a cada página.
+@st.cache_resource(show_spinner=False)
+def _cliente_msal():
+    cache_tokens = CacheTokens()
+    app = ConfidentialClientApplication(
         CLIENT_ID,
         authority=AUTHORITY,
         client_credential=CLIENT_SECRET,
+        token_cache=cache_tokens.msal,
+    )
+    return app, cache_tokens
+
+def obter_app():
+    return _cliente_msal()[0]
+
+def obter_cache_tokens():
+    return _cliente_msal()[1]
+
+# Função para gravar no navegador o cookie que identifica a conta no próximo acesso
+def lembrar_navegador(id_conta):
+    valor = obter_cache_tokens().lembrar(id_conta)
+    seguro = '; Secure' if (REDIRECT_URI or '').startswith('https') else ''
+    st.html(
+        f"<script>document.cookie = '{COOKIE_CONTA}={valor}; max-age={DIAS_LEMBRAR * 86400}; "
+        f"path=/; SameSite=Lax{seguro}';</script>",
+        unsafe_allow_javascript=True,
     )
 
+# Função para liberar o acesso se o e-mail estiver na lista de permitidos
+def concluir_login(email):
+    if email and email.strip().lower() in EMAILS_PERMITIDOS:
+        st.session_state['autenticado'] = True
+        st.session_state['email'] = email
+        return True
+    st.session_state['autenticado'] = False
+    exibir_mensagem_permissao_negada()
+    return False
+
+# Função para o login silencioso: só usa a conta que este navegador usou antes (o cache do processo
+# tem as contas de todos os usuários, então nunca pega simplesmente a primeira)
+def login_silencioso(app):
+    valor = st.context.cookies.get(COOKIE_CONTA)
+    if not valor:
+        return None
+    cache_tokens = obter_cache_tokens()
+    id_conta = cache_tokens.conta_do_navegador(valor)
+    conta = next((conta for conta in app.get_accounts() if conta['home_account_id'] == id_conta), None) if id_conta else None
+    if conta is None:
+        return None
+
+    result = app.acquire_token_silent(SCOPES, account=conta)
+    cache_tokens.gravar()
+    if not result or "access_token" not in result:
+        # Sessão encerrada no Azure (senha trocada, token revogado): volta para o login normal
+        cache_tokens.esquecer(valor)
+        cache_tokens.gravar()
+        return None
+    return conta['username']
+
 def autenticar_usuario():
     # Verifica se o estado de permissão já foi armazenado
     if 'autenticado' in st.session_state:
@@ -28,45 +167,33 @@ def autenticar_usuario():
             exibir_mensagem_permissao_negada()
             return False
 
-    app = init_app()
-    accounts = app.get_accounts()
-
-    # Tenta autenticar de forma silenciosa se o usuário já estiver logado no navegador
-    if accounts:
-        result = app.acquire_token_silent(SCOPES, account=accounts[0])
-        if result and "access_token" in result:
-            email = result['id_token_claims']['preferred_username']
-            if email in EMAILS_PERMITIDOS:
-                st.session_state['autenticado'] = True
-                st.session_state['email'] = email
-                return True
-            else:
-                st.session_state['autenticado'] = False
-                exibir_mensagem_permissao_negada()
-                return False
+    app = obter_app()
+
+    # Tenta autenticar de forma silenciosa se o navegador já entrou antes
+    email = login_silencioso(app)
+    if email:
+        return concluir_login(email)
 
     # Verifica se há um código de autorização na URL após o redirecionamento
     query_params = st.query_params
     if "code" in query_params:
-        code = query_params["code"][0]
+        code = query_params["code"]
         result = app.acquire_token_by_authorization_code(
             code=code,
             scopes=SCOPES,
             redirect_uri=REDIRECT_URI
         )
+        obter_cache_tokens().gravar()
 
         if "access_token" in result:
-            email = result['id_token_claims']['preferred_username']
-            if email in EMAILS_PERMITIDOS:
-                st.session_state['autenticado'] = True
-                st.session_state['email'] = email
-                # Limpa o código da URL após a autenticação
-                st.experimental_set_query_params()  # Limpa os parâmetros da URL
+            claims = result['id_token_claims']
+            # Limpa o código da URL após a autenticação
+            st.query_params.clear()
+            if concluir_login(claims['preferred_username']):
+                lembrar_navegador(f"{claims['oid']}.{claims['tid']}")
+                obter_cache_tokens().gravar()
                 return True
-            else:
-                st.session_state['autenticado'] = False
-                exibir_mensagem_permissao_negada()
-                return False
+            return False
         else:
             st.error("Falha na autenticação. Por favor, tente novamente.")
             st.stop()
@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+import pandas as pd
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+import documentos
+import replace
+from precificacao import calcular_precos, montar_entrada, montar_tabela_potencias
+from visao_proposta import montar_visao
+
+# Benchmark dos caminhos críticos da proposta com dados sintéticos (não usa SharePoint nem Postgres).
+# Uso: python benchmark.py --saida benchmark_resultados.json
+
+TAMANHOS_PADRAO = [1, 10, 100, 500, 1000]
+POTENCIAS = [15, 30, 45, 75, 112.5, 150, 225, 300, 500, 750, 1000, 1250, 1500, 2000, 2500, 3000, 4000]
+CLASSES = ["15 kV", "24 kV", "36 kV"]
+PERDAS = ['5356-D', '5356-A', '1,2 %', '1,0 %']
+PARAMETROS = {'lucro': 5.0, 'icms': 12.0, 'frete': 5.0, 'comissao': 5.0, 'difal': 2.0, 'f_pobreza': 1.0}
+
+
+# Catálogo sintético no formato da consulta de custos_media_tensao
+def gerar_catalogo(linhas, semente=42):
+    aleatorio = random.Random(semente)
+    catalogo = []
+    for idx in range(linhas):
+        potencia = float(POTENCIAS[idx % len(POTENCIAS)])
+        classe = CLASSES[idx % len(CLASSES)]
+        catalogo.append({
+            'id': idx + 1,
+            'descricao': f"Transformador {potencia:g} kVA {classe} #{idx + 1}",
+            'potencia': potencia,
+            'classe_tensao': classe,
+            'perdas': PERDAS[idx % len(PERDAS)],
+            'preco': aleatorio.uniform(2e4, 6e5),
+            'p_trafo': aleatorio.uniform(0.0, 0.15),
+            'valor_ip_baixo': aleatorio.uniform(2e3, 2e4),
+            'valor_ip_alto': aleatorio.uniform(4e3, 4e4),
+            'p_caixa': aleatorio.uniform(0.0, 0.15),
+            'cod_proj_caixa': f"0013.{idx:04d}.000",
+            'cod_proj_custo': f"0012.{idx:04d}.000",
+        })
+    return pd.DataFrame(catalogo).sort_values('potencia', kind='stable').reset_index(drop=True)
+
+
+# Proposta sintética com N itens no formato do session_state das páginas
+def gerar_proposta(quantidade_itens, catalogo, semente=42):
+    aleatorio = random.Random(semente)
+    linhas = catalogo.to_dict('records')
+    escolhidas = [aleatorio.choice(linhas) for _ in range(quantidade_itens)]
+    fatores_k = [aleatorio.choice([1, 4, 6, 8, 13]) for _ in escolhidas]
+    ips = [aleatorio.choice(['00', '21', '23', '54']) for _ in escolhidas]
+    precos = calcular_precos(montar_entrada(escolhidas, fatores_k, ips), montar_tabela_potencias(linhas), PARAMETROS)
+
+    itens = []
+    for idx, linha in enumerate(escolhidas):
+        quantidade = aleatorio.randint(1, 5)
+        preco_unitario = int(precos['preco_unitario'][idx])
+        itens.append({
+            'ID': linha['id'],
+            'Item': idx + 1,
+            'Quantidade': quantidade,
+            'Descrição': linha['descricao'],
+            'Potência': linha['potencia'],
+            'Tensão Primária': "13,8",
+            'Tensão Secundária': "380",
+            'Derivações': "13,8/13,2/12,6/12,0/11,4kV",
+            'Fator K': fatores_k[idx],
+            'IP': ips[idx],
+            'Perdas': linha['perdas'],
+            'Preço Unitário': preco_unitario,
+            'Preço Total': preco_unitario * quantidade,
+            'IPI': 0.0,
+            'classe_tensao': linha['classe_tensao'],
+            'NBI': precos['nbi'][idx],
+            'cod_proj_caixa': linha['cod_proj_caixa'],
+            'cod_proj_custo': linha['cod_proj_custo'],
+        })
+
+    return {
+        'dados_iniciais': {
+            'dia': '18', 'mes': 'Outubro', 'ano': '2026', 'bt': '1234', 'rev': '0',
+            'cliente': 'Cliente Exemplo', 'obra': 'Obra Exemplo', 'nomeCliente': 'Contato Exemplo',
+            'email': 'contato@exemplo.com', 'local': '', 'fone': '(47) 99999-8888', 'local_frete': 'São Paulo/SP',
+        },
+        'itens_configurados': itens,
+        'contribuinte_icms': 'Não',
+        'local_frete_itens': 'São Paulo/SP',
+        **PARAMETROS,
+    }
+
+
+# Template sintético com os marcadores, cabeçalho, tabela e os títulos onde as tabelas são inseridas
+def gerar_template(caminho, paragrafos_extras=200):
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Proposta BT {{BT}}-Rev{{REV}} - {{CLIENTE}}"
+
+    doc.add_heading("Proposta Comercial", level=1)
+    doc.add_paragraph("{{LOCAL}}, {{DIA}} de {{MES}} de {{ANO}}")
+    doc.add_paragraph("À {{CLIENTE}}")
+    doc.add_paragraph("A/C: {{NOMECLIENTE}} - Fone: {{FONE}} - E-mail: {{EMAIL}}")
+    doc.add_paragraph("{obra} {{OBRA}}")
+
+    tabela = doc.add_table(rows=3, cols=2)
+    for linha, (rotulo, valor) in enumerate([("Frete", "{{LOCALFRETE}}"), ("ICMS", "{{ICMS}}"), ("IP", "{{IP}}")]):
+        tabela.cell(linha, 0).text = rotulo
+        tabela.cell(linha, 1).text = valor
+
+    for idx in range(paragrafos_extras):
+        doc.add_paragraph(f"Cláusula {idx + 1}: texto padrão da proposta para a obra {{{{OBRA}}}} do cliente {{{{CLIENTE}}}}.")
+
+    doc.add_paragraph("Grau de proteção conforme {{IP}}.")
+    doc.add_paragraph("Quadro de Preços").alignment = WD_ALIGN_PARAGRAPH.LEFT
+    doc.add_paragraph("")
+    doc.add_paragraph("Escopo de Fornecimento").alignment = WD_ALIGN_PARAGRAPH.LEFT
+    doc.add_paragraph("")
+    doc.save(caminho)
+    return caminho
+
+
+# Executa a função várias vezes: tempos sem tracemalloc e uma execução extra para o pico de memória
+def medir(funcao, preparar, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        argumentos = preparar()
+        inicio = time.perf_counter()
+        funcao(*argumentos)
+        tempos.append(time.perf_counter() - inicio)
+
+    argumentos = preparar()
+    tracemalloc.start()
+    try:
+        funcao(*argumentos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'tempo_min_s': min(tempos),
+        'tempo_mediana_s': statistics.median(tempos),
+        'memoria_pico_kb': pico / 1024,
+    }
+
+
+def _salvar_word(doc, visao, substituicoes):
+    doc = replace.inserir_tabelas_word(doc, visao, '', substituicoes)
+    doc.save(BytesIO())
+
+
+# Casos medidos: cada um recebe a proposta e o template e devolve (função, preparo dos argumentos)
+def montar_casos(proposta, template, catalogo):
+    linhas = catalogo.to_dict('records')
+    itens = proposta['itens_configurados']
+    por_descricao = {linha['descricao']: linha for linha in linhas}
+    visao = montar_visao(proposta)
+    substituicoes = documentos.montar_substituicoes(visao)
+
+    def entrada_precos():
+        # Inclui a montagem da tabela de potências, como na montagem do catálogo
+        escolhidas = [por_descricao[item['Descrição']] for item in itens]
+        return (montar_entrada(escolhidas, [item['Fator K'] for item in itens], [item['IP'] for item in itens]),
+                montar_tabela_potencias(linhas), PARAMETROS)
+
+    return {
+        'precificacao': (calcular_precos, entrada_precos),
+        'substituir_texto_documento': (replace.substituir_texto_documento, lambda: (Document(template), substituicoes)),
+        'montar_visao': (montar_visao, lambda: (proposta,)),
+        'create_custom_table': (replace.create_custom_table, lambda: (Document(template), visao, '')),
+        'create_custom_table_escopo': (replace.create_custom_table_escopo, lambda: (Document(template), visao)),
+        'inserir_tabelas_word_e_save': (_salvar_word, lambda: (Document(template), visao, substituicoes)),
+        'gerar_pdf': (documentos.gerar_pdf, lambda: (visao,)),
+    }
+
+
+def _versao_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de precificação, Word e PDF com propostas sintéticas.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO, help="Quantidades de itens por proposta")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--casos', nargs='+', help="Executa apenas os casos informados")
+    parser.add_argument('--linhas-catalogo', type=int, default=500)
+    parser.add_argument('--saida', default='benchmark_resultados.json')
+    args = parser.parse_args()
+
+    catalogo = gerar_catalogo(args.linhas_catalogo)
+    resultados = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        template = gerar_template(os.path.join(pasta, 'Template_Sintetico.docx'))
+
+        for tamanho in args.tamanhos:
+            proposta = gerar_proposta(tamanho, catalogo)
+            for caso, (funcao, preparar) in montar_casos(proposta, template, catalogo).items():
+                if args.casos and caso not in args.casos:
+                    continue
+                medicao = medir(funcao, preparar, args.repeticoes)
+                resultados.append({'caso': caso, 'itens': tamanho, **medicao})
+                print(f"{caso:<30} {tamanho:>5} itens  {medicao['tempo_mediana_s'] * 1000:>10.1f} ms  "
+                      f"{medicao['memoria_pico_kb']:>10.0f} KB")
+
+    relatorio = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'versao_codigo': _versao_codigo(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticoes': args.repeticoes,
+        'linhas_catalogo': args.linhas_catalogo,
+        'resultados': resultados,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from visao_proposta import CHAVES_PROPOSTA
+
+# Memória máxima (MB) ocupada pelos documentos gerados guardados no processo
+LIMITE_MB = float(os.getenv("DOCUMENTOS_CACHE_MB", "256"))
+
+
+# Converte tipos NumPy (vindos do catálogo) e outros valores para algo que o JSON aceite
+def _serializavel(valor):
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return str(valor)
+
+
+# Função para calcular a impressão digital de uma proposta: hash estável de tudo o que entra nos documentos
+def impressao_digital(proposta, versao_template):
+    entradas = {
+        'dados_iniciais': proposta['dados_iniciais'],
+        'itens_configurados': proposta['itens_configurados'],
+        'parametros': {chave: proposta.get(chave) for chave in CHAVES_PROPOSTA},
+        'versao_template': versao_template,
+    }
+    texto = json.dumps(entradas, sort_keys=True, ensure_ascii=False, default=_serializavel)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+# Cache LRU dos documentos gerados (bytes), limitado pelo tamanho total
+class CacheDocumentos:
+    def __init__(self, limite_bytes=int(LIMITE_MB * 1024 * 1024)):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.tamanho_bytes = 0
+        self.estatisticas = {'acertos': 0, 'faltas': 0, 'descartes': 0}
+
+    def obter(self, chave):
+        with self._lock:
+            conteudo = self._itens.get(chave)
+            if conteudo is None:
+                self.estatisticas['faltas'] += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.estatisticas['acertos'] += 1
+            return conteudo
+
+    def guardar(self, chave, conteudo):
+        # Um documento maior que o limite inteiro não é guardado
+        if len(conteudo) > self.limite_bytes:
+            return
+        with self._lock:
+            if chave in self._itens:
+                self.tamanho_bytes -= len(self._itens.pop(chave))
+            self._itens[chave] = conteudo
+            self.tamanho_bytes += len(conteudo)
+            # Descarta os menos usados recentemente até caber no limite
+            while self.tamanho_bytes > self.limite_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self.tamanho_bytes -= len(removido)
+                self.estatisticas['descartes'] += 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.tamanho_bytes = 0
+
+    def resumo(self):
+        with self._lock:
+            consultas = self.estatisticas['acertos'] + self.estatisticas['faltas']
+            return {
+                'documentos': len(self._itens),
+                'tamanho_mb': self.tamanho_bytes / (1024 * 1024),
+                'limite_mb': self.limite_bytes / (1024 * 1024),
+                'taxa_acerto': self.estatisticas['acertos'] / consultas if consultas else 0.0,
+                **self.estatisticas,
+            }
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+TEMPLATE_NOME = 'Template_Proposta_Comercial.docx'
+# Pasta onde o template baixado fica salvo e tempo (s) até conferir se mudou no SharePoint
+PASTA_TEMPLATE = os.getenv("TEMPLATE_CACHE_DIR", tempfile.gettempdir())
+TEMPLATE_TTL = float(os.getenv("TEMPLATE_TTL", "3600"))
+# Após uma falha de download com template já carregado, tenta de novo depois deste intervalo (s)
+ESPERA_APOS_FALHA = 60
+
+
+# Função padrão para buscar o conteúdo do template no SharePoint (só transfere o arquivo se ele mudou)
+def baixar_do_sharepoint(nome_arquivo):
+    from sharepoint_code import obter_sharepoint
+    return obter_sharepoint().baixar_conteudo(nome_arquivo)
+
+
+# Cache do template por processo: arquivo local gravado de forma atômica, um único download por vez
+# e o hash do conteúdo (versão do template). O documento só é interpretado nos processos de geração
+# (renderizacao._template_no_processo); o servidor não importa o python-docx.
+class CacheTemplate:
+    def __init__(self, nome_arquivo=TEMPLATE_NOME, baixar=baixar_do_sharepoint, pasta=PASTA_TEMPLATE, ttl=TEMPLATE_TTL):
+        self.nome_arquivo = nome_arquivo
+        self.caminho = os.path.join(pasta, nome_arquivo)
+        self.ttl = ttl
+        self._baixar = baixar
+        self._lock = threading.Lock()
+        self._hash = None
+        self._mtime = None
+        self._verificado_em = 0.0
+        self.estatisticas = {'downloads': 0, 'leituras': 0, 'falhas_download': 0}
+
+    def _vencido(self):
+        return time.monotonic() - self._verificado_em > self.ttl
+
+    # Grava em um arquivo temporário na mesma pasta e troca pelo definitivo de uma vez
+    def _gravar_atomico(self, conteudo):
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(self.caminho), suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                arquivo.write(conteudo)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            os.replace(temporario, self.caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    def _registrar(self, hash_conteudo):
+        self._hash = hash_conteudo
+        self._mtime = os.path.getmtime(self.caminho)
+
+    # Baixa o template; só grava de novo se o conteúdo (hash) mudou
+    def _atualizar(self):
+        conteudo = self._baixar(self.nome_arquivo)
+        self.estatisticas['downloads'] += 1
+        hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+        if hash_conteudo != self._hash:
+            self._gravar_atomico(conteudo)
+            self._registrar(hash_conteudo)
+        else:
+            # Mesmo conteúdo: só renova a data do arquivo para os outros processos
+            os.utime(self.caminho)
+            self._mtime = os.path.getmtime(self.caminho)
+        self._verificado_em = time.monotonic()
+
+    # Calcula o hash do arquivo local em blocos, sem interpretar o documento
+    def _carregar_do_disco(self):
+        hash_conteudo = hashlib.sha256()
+        with open(self.caminho, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+                hash_conteudo.update(bloco)
+        self._registrar(hash_conteudo.hexdigest())
+        self.estatisticas['leituras'] += 1
+
+    # Garante um arquivo local atual; quem chega durante um download espera por ele
+    def _garantir(self):
+        arquivo_alterado = (
+            self._hash is not None and os.path.exists(self.caminho)
+            and os.path.getmtime(self.caminho) != self._mtime
+        )
+        if self._hash is not None and not arquivo_alterado and not self._vencido():
+            return
+
+        with self._lock:
+            # Outra thread pode ter atualizado enquanto esta esperava o lock
+            if self._hash is None:
+                idade = time.time() - os.path.getmtime(self.caminho) if os.path.exists(self.caminho) else None
+                if idade is not None and idade <= self.ttl:
+                    # Arquivo recente deixado por outro processo ou por uma execução anterior
+                    self._carregar_do_disco()
+                    self._verificado_em = time.monotonic() - idade
+                else:
+                    self._atualizar()
+            elif os.path.exists(self.caminho) and os.path.getmtime(self.caminho) != self._mtime:
+                self._carregar_do_disco()
+            elif self._vencido():
+                try:
+                    self._atualizar()
+                except Exception as e:
+                    # Mantém o template atual e tenta novamente mais tarde
+                    self.estatisticas['falhas_download'] += 1
+                    self._verificado_em = time.monotonic() - self.ttl + ESPERA_APOS_FALHA
+                    print(f"Falha ao atualizar o template '{self.nome_arquivo}', usando a versão em cache: {e}")
+
+    # Caminho do arquivo local do template (baixado se necessário)
+    def caminho_arquivo(self):
+        self._garantir()
+        return self.caminho
+
+    def hash(self):
+        self._garantir()
+        return self._hash
+
+    # Esquece o template; o próximo uso confere o SharePoint novamente
+    def invalidar(self):
+        with self._lock:
+            self._hash = None
+            self._verificado_em = 0.0
+            if os.path.exists(self.caminho):
+                os.remove(self.caminho)
+
+
+_cache = None
+_lock_cache = threading.Lock()
+
+
+# Função para obter o cache de template compartilhado pelo processo
+def obter_cache_template():
+    global _cache
+    if _cache is None:
+        with _lock_cache:
+            if _cache is None:
+                _cache = CacheTemplate()
+    return _cache
@@ -0,0 +1,39 @@
+import streamlit as st
+from municipios import obter_municipios, buscar_cidades
+
+# Campos de cidade usados nas páginas de Dados Iniciais e de Itens (as páginas importam daqui, nunca uma da outra,
+# porque importar uma página executa a página inteira)
+
+# Cidades enviadas ao navegador por busca (a lista completa não vai para a página)
+LIMITE_SUGESTOES_CIDADES = 20
+
+
+# Função para verificar se a cidade está na lista do IBGE, carregada uma vez por processo e compartilhada pelas sessões
+def cidade_existe(cidade):
+    try:
+        return cidade in obter_municipios().posicoes
+    except Exception as e:
+        st.error(f"Erro ao carregar a lista de cidades: {e}")
+        return False
+
+
+# Função para escolher uma cidade: o usuário digita parte do nome e só as melhores sugestões vão para o selectbox
+def seletor_cidade(rotulo, cidade_atual, chave):
+    busca = st.text_input(
+        f"{rotulo} (buscar)", key=f"busca_{chave}", autocomplete='off',
+        placeholder='Digite parte do nome da cidade'
+    )
+    try:
+        opcoes = buscar_cidades(busca, LIMITE_SUGESTOES_CIDADES) if busca.strip() else []
+    except Exception as e:
+        st.error(f"Erro ao buscar as cidades: {e}")
+        opcoes = []
+    if busca.strip() and not opcoes:
+        st.caption("Nenhuma cidade encontrada.")
+
+    # A cidade já escolhida continua como opção (e selecionada) enquanto o usuário não escolher outra
+    if cidade_atual and cidade_atual not in opcoes:
+        opcoes = [cidade_atual] + opcoes
+    if not opcoes:
+        return cidade_atual
+    return st.selectbox(rotulo, opcoes, index=opcoes.index(cidade_atual) if cidade_atual in opcoes else 0)
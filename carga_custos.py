@@ -0,0 +1,286 @@
+import io
+import re
+import time
+import numpy as np
+import pandas as pd
+from config_db import obter_conexao
+
+# Colunas da planilha 'atualizacao' gravadas na tabela custos_media_tensao
+COLUNAS_CUSTOS = [
+    'p_caixa', 'p_trafo', 'potencia', 'preco', 'perdas', 'classe_tensao',
+    'valor_ip_baixo', 'valor_ip_alto', 'cod_proj_custo', 'descricao',
+    'potencia_formatada', 'cod_proj_caixa'
+]
+
+# Chave que identifica uma linha do catálogo entre uma planilha e outra
+COLUNAS_CHAVE = ['cod_proj_custo', 'descricao']
+COLUNAS_NUMERICAS = ['p_caixa', 'p_trafo', 'potencia', 'preco', 'valor_ip_baixo', 'valor_ip_alto']
+COLUNAS_VALORES = [col for col in COLUNAS_CUSTOS if col not in COLUNAS_CHAVE]
+# Número inteiro escrito com casas decimais zeradas (ex.: '123.0'), como o Excel grava códigos numéricos
+INTEIRO_COM_DECIMAIS = re.compile(r'^(-?\d+)\.0+$')
+
+# Consulta do catálogo usada pelas páginas e pelas ferramentas de linha de comando
+CONSULTA_CATALOGO = """
+    SELECT id, descricao, potencia, classe_tensao, perdas, preco, p_trafo, valor_ip_baixo, valor_ip_alto, p_caixa , cod_proj_caixa , cod_proj_custo
+    FROM custos_media_tensao
+    ORDER BY potencia ASC
+"""
+
+# Canal do LISTEN/NOTIFY avisado a cada nova versão do catálogo
+CANAL_VERSAO = 'custos_media_tensao_versao'
+
+
+# Função para criar (se preciso) a tabela com o número de versão do catálogo
+def garantir_tabela_versao(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS custos_media_tensao_versao (
+            id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            versao BIGINT NOT NULL,
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+# Função para incrementar a versão do catálogo dentro da transação corrente
+def incrementar_versao(cur):
+    garantir_tabela_versao(cur)
+    cur.execute("""
+        INSERT INTO custos_media_tensao_versao (id, versao) VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE
+        SET versao = custos_media_tensao_versao.versao + 1, atualizado_em = now()
+        RETURNING versao
+    """)
+    versao = cur.fetchone()[0]
+
+    # A notificação só é entregue aos outros servidores quando a transação é confirmada
+    cur.execute("SELECT pg_notify(%s, %s)", (CANAL_VERSAO, str(versao)))
+    return versao
+
+
+# Função para ler a versão atual do catálogo (0 se nunca foi versionado)
+def versao_catalogo(cur):
+    cur.execute("SELECT to_regclass('custos_media_tensao_versao') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT versao FROM custos_media_tensao_versao WHERE id = 1")
+    linha = cur.fetchone()
+    return linha[0] if linha else 0
+
+
+# Função para enviar o DataFrame para uma tabela temporária com um único COPY
+def copiar_para_staging(cur, df, tabela_staging, colunas_staging=COLUNAS_CUSTOS):
+    colunas = ', '.join(colunas_staging)
+
+    # A tabela temporária some sozinha no fim da transação
+    cur.execute(f"""
+        CREATE TEMP TABLE {tabela_staging} ON COMMIT DROP AS
+        SELECT {colunas} FROM custos_media_tensao WITH NO DATA
+    """)
+
+    # Serializa o DataFrame em CSV na memória (células vazias viram NULL)
+    buffer = io.StringIO()
+    df[colunas_staging].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    cur.copy_expert(f"COPY {tabela_staging} ({colunas}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return len(df)
+
+
+# Função para substituir todo o catálogo de preços em uma única transação
+def carregar_custos(df):
+    inicio = time.perf_counter()
+    colunas = ', '.join(COLUNAS_CUSTOS)
+
+    with obter_conexao() as conn:
+        # O bloco 'with conn' faz commit no final ou rollback em caso de erro,
+        # então quem consulta a tabela continua vendo o catálogo antigo até o commit
+        with conn:
+            with conn.cursor() as cur:
+                versao_anterior = versao_catalogo(cur)
+                linhas_enviadas = copiar_para_staging(cur, df, 'custos_media_tensao_staging')
+                fim_copia = time.perf_counter()
+
+                cur.execute("DELETE FROM custos_media_tensao")
+                linhas_removidas = cur.rowcount
+
+                cur.execute(f"""
+                    INSERT INTO custos_media_tensao ({colunas})
+                    SELECT {colunas} FROM custos_media_tensao_staging
+                """)
+                linhas_inseridas = cur.rowcount
+                versao = incrementar_versao(cur)
+    fim = time.perf_counter()
+
+    return {
+        'linhas_enviadas': linhas_enviadas,
+        'linhas_removidas': linhas_removidas,
+        'linhas_inseridas': linhas_inseridas,
+        'versao_anterior': versao_anterior,
+        'versao': versao,
+        'versao_alterada': versao != versao_anterior,
+        'tempo_copia': fim_copia - inicio,
+        'tempo_troca': fim - fim_copia,
+        'tempo_total': fim - inicio,
+    }
+
+
+# Função para padronizar os textos da chave (ex.: 123.0 vindo do Excel, ou '123.0' já gravado assim no banco, vira '123')
+def _normalizar_texto(valor):
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return ''
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        return str(int(valor))
+    texto = str(valor).strip()
+    return INTEIRO_COM_DECIMAIS.sub(r'\1', texto)
+
+
+def _normalizar(df):
+    df = df[[col for col in ['id'] + COLUNAS_CUSTOS if col in df.columns]].copy()
+    for col in COLUNAS_CUSTOS:
+        if col in COLUNAS_NUMERICAS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        else:
+            df[col] = df[col].map(_normalizar_texto)
+    return df
+
+
+# Função para comparar o catálogo atual com a planilha enviada, linha a linha pela chave
+def calcular_diferencas(df_atual, df_novo):
+    atual = _normalizar(df_atual)
+    # O id da planilha não vale para o banco: as linhas são casadas só pela chave normalizada
+    novo = _normalizar(df_novo).drop(columns='id', errors='ignore')
+
+    duplicadas = novo[novo.duplicated(COLUNAS_CHAVE, keep=False)]
+    if not duplicadas.empty:
+        raise ValueError(
+            "A planilha possui linhas repetidas para a mesma chave "
+            f"({' / '.join(COLUNAS_CHAVE)}): {duplicadas[COLUNAS_CHAVE].drop_duplicates().values.tolist()}"
+        )
+
+    juntos = atual.merge(novo, on=COLUNAS_CHAVE, how='outer', suffixes=('_atual', '_novo'), indicator=True)
+    novos = juntos[juntos['_merge'] == 'right_only']
+    removidos = juntos[juntos['_merge'] == 'left_only']
+    comuns = juntos[juntos['_merge'] == 'both']
+
+    # Marca, coluna a coluna, o que mudou nas linhas presentes nos dois lados
+    mudancas = pd.DataFrame(False, index=comuns.index, columns=COLUNAS_VALORES)
+    for col in COLUNAS_VALORES:
+        antes, depois = comuns[f'{col}_atual'], comuns[f'{col}_novo']
+        if col in COLUNAS_NUMERICAS:
+            iguais = np.isclose(antes.astype(float), depois.astype(float), rtol=0, atol=1e-9, equal_nan=True)
+        else:
+            iguais = (antes == depois).to_numpy()
+        mudancas[col] = ~iguais
+    alterados = comuns[mudancas.any(axis=1)]
+
+    # Visão longa das alterações: uma linha por coluna alterada, com o valor antes e depois
+    alteracoes = [
+        {**{chave: linha[chave] for chave in COLUNAS_CHAVE},
+         'coluna': col, 'valor_atual': linha[f'{col}_atual'], 'valor_novo': linha[f'{col}_novo']}
+        for idx, linha in alterados.iterrows()
+        for col in COLUNAS_VALORES if mudancas.at[idx, col]
+    ]
+
+    def _lado(df, sufixo):
+        return df[COLUNAS_CHAVE + [f'{col}_{sufixo}' for col in COLUNAS_VALORES]].rename(
+            columns={f'{col}_{sufixo}': col for col in COLUNAS_VALORES}
+        )[COLUNAS_CUSTOS]
+
+    return {
+        'novos': _lado(novos, 'novo').reset_index(drop=True),
+        'alterados': _lado(alterados, 'novo').reset_index(drop=True),
+        'removidos': _lado(removidos, 'atual').reset_index(drop=True),
+        'ids_removidos': [int(i) for i in removidos['id']] if 'id' in removidos else [],
+        # id no banco de cada linha de 'alterados', na mesma ordem (a chave gravada pode não estar normalizada)
+        'ids_alterados': [int(i) for i in alterados['id']] if 'id' in alterados else [],
+        'alteracoes': pd.DataFrame(alteracoes, columns=COLUNAS_CHAVE + ['coluna', 'valor_atual', 'valor_novo']),
+        'inalterados': len(comuns) - len(alterados),
+    }
+
+
+# Função para ler o catálogo na ordem usada pelo cálculo de preços (potência crescente)
+def ler_catalogo():
+    with obter_conexao() as conn:
+        return pd.read_sql(CONSULTA_CATALOGO, conn)
+
+
+# Função para ler o catálogo da aba 'atualizacao' de uma planilha, na mesma ordem da consulta ao banco
+def ler_catalogo_planilha(caminho):
+    df = pd.read_excel(caminho, sheet_name='atualizacao')
+    if 'id' not in df.columns:
+        df['id'] = range(1, len(df) + 1)
+    return df.sort_values('potencia', kind='stable').reset_index(drop=True)
+
+
+def _ler_catalogo_atual(conn):
+    return pd.read_sql(f"SELECT id, {', '.join(COLUNAS_CUSTOS)} FROM custos_media_tensao", conn)
+
+
+# Função para pré-visualizar o que a sincronização incremental faria, sem gravar nada
+def comparar_com_banco(df):
+    with obter_conexao() as conn:
+        df_atual = _ler_catalogo_atual(conn)
+    return calcular_diferencas(df_atual, df)
+
+
+# Função para gravar somente as linhas novas, alteradas e removidas, versionando o catálogo
+def sincronizar_custos(df):
+    inicio = time.perf_counter()
+    colunas = ', '.join(COLUNAS_CUSTOS)
+    # Grava também a chave: a linha alterada passa a ter a chave normalizada
+    atribuicoes = ', '.join(f"{col} = s.{col}" for col in COLUNAS_CUSTOS)
+
+    with obter_conexao() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                # Impede duas sincronizações simultâneas sem bloquear as leituras
+                cur.execute("LOCK TABLE custos_media_tensao IN SHARE ROW EXCLUSIVE MODE")
+                versao_anterior = versao_catalogo(cur)
+
+                diferencas = calcular_diferencas(_ler_catalogo_atual(conn), df)
+                fim_diff = time.perf_counter()
+
+                atualizadas = inseridas = removidas = 0
+
+                # As alteradas são atualizadas pelo id lido do banco, e não pela chave, que no banco
+                # pode estar gravada de outro jeito (ex.: ' X ' ou '123.0')
+                if not diferencas['alterados'].empty:
+                    alterados = diferencas['alterados'].assign(id=diferencas['ids_alterados'])
+                    copiar_para_staging(cur, alterados, 'custos_media_tensao_sync', ['id'] + COLUNAS_CUSTOS)
+                    cur.execute(f"""
+                        UPDATE custos_media_tensao c SET {atribuicoes}
+                        FROM custos_media_tensao_sync s
+                        WHERE c.id = s.id
+                    """)
+                    atualizadas = cur.rowcount
+
+                if not diferencas['novos'].empty:
+                    copiar_para_staging(cur, diferencas['novos'], 'custos_media_tensao_novos')
+                    cur.execute(f"""
+                        INSERT INTO custos_media_tensao ({colunas})
+                        SELECT {colunas} FROM custos_media_tensao_novos
+                    """)
+                    inseridas = cur.rowcount
+
+                if diferencas['ids_removidos']:
+                    cur.execute("DELETE FROM custos_media_tensao WHERE id = ANY(%s)", (diferencas['ids_removidos'],))
+                    removidas = cur.rowcount
+
+                # A versão só muda quando alguma linha realmente mudou
+                versao = versao_anterior
+                if atualizadas or inseridas or removidas:
+                    versao = incrementar_versao(cur)
+    fim = time.perf_counter()
+
+    return {
+        'linhas_inseridas': inseridas,
+        'linhas_atualizadas': atualizadas,
+        'linhas_removidas': removidas,
+        'linhas_inalteradas': diferencas['inalterados'],
+        'versao_anterior': versao_anterior,
+        'versao': versao,
+        'versao_alterada': versao != versao_anterior,
+        'tempo_comparacao': fim_diff - inicio,
+        'tempo_gravacao': fim - fim_diff,
+        'tempo_total': fim - inicio,
+    }
@@ -0,0 +1,150 @@
+import bisect
+import os
+import select
+import threading
+import time
+from types import MappingProxyType
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+import streamlit as st
+from config_db import obter_conexao, conectar_banco
+from carga_custos import versao_catalogo, ler_catalogo, CANAL_VERSAO
+from precificacao import montar_tabela_potencias
+
+# Intervalo máximo (s) até um servidor perceber uma nova versão do catálogo por consulta periódica
+VERSAO_TTL = float(os.getenv("CATALOGO_VERSAO_TTL", "30"))
+# Com CATALOGO_LISTEN=1 o servidor também escuta o NOTIFY da atualização e percebe a mudança na hora
+ESCUTAR_NOTIFICACOES = os.getenv("CATALOGO_LISTEN", "0") == "1"
+
+_lock_ouvinte = threading.Lock()
+_ouvinte = None
+
+
+# Função para consultar a versão do catálogo: consulta de uma linha, com checksum se a tabela de versão não existir
+@st.cache_data(ttl=VERSAO_TTL, show_spinner=False)
+def consultar_versao():
+    with obter_conexao() as conn:
+        with conn.cursor() as cur:
+            versao = versao_catalogo(cur)
+            if versao:
+                return f"v{versao}"
+            cur.execute("""
+                SELECT count(*), coalesce(md5(string_agg(c::text, '|' ORDER BY c.id)), '')
+                FROM custos_media_tensao c
+            """)
+            linhas, checksum = cur.fetchone()
+            return f"h{linhas}-{checksum}"
+
+
+# A versão entra na chave do cache: uma versão nova nunca reaproveita dados antigos
+@st.cache_data(max_entries=2, show_spinner=False)
+def buscar_dados(versao=None):
+    return ler_catalogo()
+
+
+# Catálogo de produtos indexado, montado uma vez e compartilhado (somente leitura) entre as sessões
+class Catalogo:
+    def __init__(self, df, versao=None):
+        self.versao = versao
+
+        # Linhas imutáveis na ordem da consulta (potência crescente)
+        self.linhas = tuple(MappingProxyType(linha) for linha in df.to_dict('records'))
+
+        # Índices por descrição e por id: vale a primeira linha encontrada, como no filtro .iloc[0]
+        self._por_descricao = {}
+        self._por_id = {}
+        self._por_potencia = {}
+        for linha in self.linhas:
+            self._por_descricao.setdefault(linha['descricao'], linha)
+            self._por_id.setdefault(linha['id'], linha)
+            self._por_potencia.setdefault(linha['potencia'], linha)
+
+        # Opções do selectbox de descrição (com a opção vazia) e a posição de cada uma
+        self.opcoes_descricao = tuple([""] + list(self._por_descricao))
+        self._posicao_descricao = {descricao: idx for idx, descricao in enumerate(self.opcoes_descricao)}
+
+        # Potências em ordem crescente para a busca da potência equivalente
+        self.potencias = sorted(linha['potencia'] for linha in self.linhas)
+
+        # Arrays por potência usados pelo cálculo vetorizado de preços
+        self.tabela_potencias = montar_tabela_potencias(self.linhas)
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def por_descricao(self, descricao):
+        return self._por_descricao[descricao]
+
+    def por_id(self, id_item):
+        return self._por_id[id_item]
+
+    def por_potencia(self, potencia):
+        return self._por_potencia[potencia]
+
+    def posicao_descricao(self, descricao):
+        return self._posicao_descricao.get(descricao, 0)
+
+    # Menor potência do catálogo maior ou igual ao valor (ou a maior disponível)
+    def potencia_acima(self, potencia):
+        idx = bisect.bisect_left(self.potencias, potencia)
+        return self.potencias[idx] if idx < len(self.potencias) else self.potencias[-1]
+
+
+# Catálogo indexado montado uma única vez por versão e compartilhado pelo processo
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _catalogo_da_versao(versao):
+    return Catalogo(buscar_dados(versao), versao)
+
+
+# Função para obter o catálogo indexado da versão atual do banco
+def obter_catalogo():
+    iniciar_ouvinte_versao()
+    return _catalogo_da_versao(consultar_versao())
+
+
+# Função para descartar o catálogo em memória depois de uma atualização da base
+def limpar_cache_catalogo():
+    consultar_versao.clear()
+    buscar_dados.clear()
+    _catalogo_da_versao.clear()
+
+
+# Laço da thread que escuta as notificações de nova versão enviadas por carga_custos.incrementar_versao
+def _escutar_versao():
+    espera = 1
+    while True:
+        conn = conectar_banco()
+        if conn is None:
+            time.sleep(espera)
+            espera = min(espera * 2, 60)
+            continue
+        try:
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CANAL_VERSAO}")
+            espera = 1
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    # Basta esquecer a versão: a próxima leitura consulta o banco e troca de catálogo
+                    consultar_versao.clear()
+        except psycopg2.Error as e:
+            print(f"Conexão de escuta do catálogo perdida: {e}")
+            time.sleep(espera)
+            espera = min(espera * 2, 60)
+        finally:
+            conn.close()
+
+
+# Função para iniciar (uma vez por processo) a escuta de novas versões, se habilitada
+def iniciar_ouvinte_versao():
+    global _ouvinte
+    if not ESCUTAR_NOTIFICACOES or (_ouvinte is not None and _ouvinte.is_alive()):
+        return
+    with _lock_ouvinte:
+        if _ouvinte is None or not _ouvinte.is_alive():
+            _ouvinte = threading.Thread(target=_escutar_versao, name="ouvinte-versao-catalogo", daemon=True)
+            _ouvinte.start()
@@ -1,19 +1,164 @@
 import psycopg2
+from psycopg2 import pool
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+# Limites do pool compartilhado pelo processo (todas as sessões do Streamlit)
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+TENTATIVAS_CONEXAO = 3
+ESPERA_INICIAL = 0.5  # segundos, dobra a cada nova tentativa
+VERIFICAR_APOS = 30  # segundos ociosa antes de testar a conexão com SELECT 1
+
+_pool = None
+_lock_pool = threading.Lock()
+_lock_estatisticas = threading.Lock()
+_vagas = threading.BoundedSemaphore(POOL_MAX)
+_ultimo_uso = {}
+_estatisticas = {
+    'checkouts': 0,
+    'esperas': 0,
+    'tempo_espera': 0.0,
+    'conexoes_descartadas': 0,
+    'falhas_conexao': 0,
+}
+
+
+def _contar(chave, valor=1):
+    with _lock_estatisticas:
+        _estatisticas[chave] += valor
+
+
+def _parametros_conexao():
+    # Acessando as variáveis de ambiente que foram definidas no Streamlit
+    return dict(
+        host=os.getenv("DB_HOST"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        port=os.getenv("DB_PORT"),
+        options="-c client_encoding=UTF8"
+    )
+
+
 def conectar_banco():
     try:
-        # Acessando as variáveis de ambiente que foram definidas no Streamlit
-        conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            port=os.getenv("DB_PORT"),
-            options="-c client_encoding=UTF8"
-        )
+        conn = psycopg2.connect(**_parametros_conexao())
         return conn
     except Exception as e:
         print(f"Erro ao conectar ao banco de dados: {e}")
         return None
+
+
+# Função para criar o pool uma única vez por processo, com novas tentativas em caso de falha
+def _obter_pool():
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _lock_pool:
+        if _pool is None:
+            espera = ESPERA_INICIAL
+            for tentativa in range(1, TENTATIVAS_CONEXAO + 1):
+                try:
+                    _pool = pool.ThreadedConnectionPool(POOL_MIN, POOL_MAX, **_parametros_conexao())
+                    break
+                except psycopg2.OperationalError:
+                    _contar('falhas_conexao')
+                    if tentativa == TENTATIVAS_CONEXAO:
+                        raise
+                    time.sleep(espera)
+                    espera *= 2
+    return _pool
+
+
+# Função para verificar se uma conexão reaproveitada ainda está viva
+def _conexao_viva(conn):
+    if conn.closed:
+        return False
+
+    # Conexões usadas há pouco tempo não precisam de ida ao servidor
+    if time.monotonic() - _ultimo_uso.get(id(conn), 0) < VERIFICAR_APOS:
+        return True
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+# Função para pegar uma conexão do pool, descartando as que caíram
+def _retirar_conexao(pool_db):
+    espera = ESPERA_INICIAL
+    for tentativa in range(1, TENTATIVAS_CONEXAO + 1):
+        try:
+            conn = pool_db.getconn()
+        except psycopg2.OperationalError:
+            _contar('falhas_conexao')
+            if tentativa == TENTATIVAS_CONEXAO:
+                raise
+            time.sleep(espera)
+            espera *= 2
+            continue
+
+        if _conexao_viva(conn):
+            return conn
+
+        _contar('conexoes_descartadas')
+        _ultimo_uso.pop(id(conn), None)
+        pool_db.putconn(conn, close=True)
+
+    raise psycopg2.OperationalError("Não foi possível obter uma conexão válida do pool.")
+
+
+# Gerenciador de contexto para usar uma conexão do pool e devolvê-la ao final
+@contextmanager
+def obter_conexao():
+    pool_db = _obter_pool()
+
+    # O semáforo limita o número de conexões em uso e faz quem chega depois esperar
+    if not _vagas.acquire(blocking=False):
+        _contar('esperas')
+        inicio_espera = time.monotonic()
+        if not _vagas.acquire(timeout=POOL_TIMEOUT):
+            raise pool.PoolError("Tempo esgotado aguardando uma conexão livre do banco de dados.")
+        _contar('tempo_espera', time.monotonic() - inicio_espera)
+
+    conn = None
+    descartar = False
+    try:
+        conn = _retirar_conexao(pool_db)
+        _contar('checkouts')
+        yield conn
+    except psycopg2.Error:
+        descartar = conn is not None and conn.closed
+        raise
+    finally:
+        if conn is not None:
+            if not conn.closed:
+                # Desfaz qualquer transação deixada aberta antes de devolver ao pool
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    descartar = True
+            descartar = descartar or bool(conn.closed)
+            if descartar:
+                _ultimo_uso.pop(id(conn), None)
+                _contar('conexoes_descartadas')
+            else:
+                _ultimo_uso[id(conn)] = time.monotonic()
+            pool_db.putconn(conn, close=descartar)
+        _vagas.release()
+
+
+# Função para consultar os contadores do pool (checkouts, esperas, descartes)
+def estatisticas_pool():
+    with _lock_estatisticas:
+        return dict(_estatisticas, pool_min=POOL_MIN, pool_max=POOL_MAX)
@@ -0,0 +1,186 @@
+import os
+from io import BytesIO
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from xml.sax.saxutils import escape
+from docx import Document
+from replace import inserir_tabelas_word
+
+
+# Função para montar o dicionário de substituições do template Word a partir da visão da proposta
+def montar_substituicoes(visao):
+    replacements = {
+        '{{CLIENTE}}': visao.cliente,
+        '{{NOMECLIENTE}}': visao.nome_cliente,
+        '{{FONE}}': visao.fone,
+        '{{EMAIL}}': visao.email,
+        '{{BT}}': visao.bt,
+        '{{OBRA}}': visao.obra if visao.obra else ' ',
+        '{{DIA}}': visao.dia,
+        '{{MES}}': visao.mes,
+        '{{ANO}}': visao.ano,
+        '{{REV}}': visao.rev,
+        '{{LOCAL}}': visao.local_frete,
+        '{{LOCALFRETE}}': visao.local_frete_itens,
+        '{{ICMS}}': visao.icms_texto,
+        '{{IP}}': visao.ips_texto,
+        # Rótulo "Obra:" só aparece quando a obra foi informada
+        '{obra}': '' if not visao.obra.strip() else 'Obra:'
+    }
+    return replacements
+
+
+# Função para gerar o documento Word da proposta a partir do template (caminho ou documento já aberto)
+def gerar_word(visao, template):
+    doc = Document(template) if isinstance(template, (str, os.PathLike)) else template
+    doc = inserir_tabelas_word(doc, visao, '', montar_substituicoes(visao))
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+# Estilos do PDF, criados uma única vez por processo e só lidos durante a geração
+ESTILOS_PDF = getSampleStyleSheet()
+
+# Estilo para as células da tabela
+ESTILO_CELULA_PDF = ParagraphStyle(
+    'TableCell',
+    parent=ESTILOS_PDF['Normal'],
+    fontSize=7,
+    leading=9,
+    alignment=0,  # 0=left, 1=center, 2=right, 4=justify
+    spaceAfter=0,
+    spaceBefore=0,
+)
+
+# Estilo para o cabeçalho
+ESTILO_CABECALHO_PDF = ParagraphStyle(
+    'TableHeader',
+    parent=ESTILOS_PDF['Normal'],
+    fontSize=7,
+    leading=9,
+    alignment=1,  # center
+    textColor=colors.white,
+    spaceAfter=0,
+    spaceBefore=0,
+)
+
+CABECALHO_TABELA_PDF = ['Cód. Proj Trafo', 'Cód. Proj Caixa', 'Descrição', 'K', 'IP', 'Qtde', 'Preço Unitário', 'Preço Total']
+
+# Pesos das colunas: códigos, descrição, K, IP, quantidade e preços
+PESOS_COLUNAS_PDF = [1.5, 1.5, 2.5, 0.5, 0.5, 0.5, 1.5, 1.5]
+
+# Estilo da tabela (os índices negativos valem para cada parte da tabela quebrada entre páginas)
+ESTILO_TABELA_PDF = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#00543C')),
+    ('GRID', (0, 0), (-1, -2), 0.5, colors.black),
+    ('GRID', (0, -1), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 7),
+    ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    # Alinha à esquerda o texto da coluna 'Descrição'
+    ('ALIGN', (2, 1), (2, -1), 'LEFT')
+])
+
+
+# Texto digitado pelo usuário ou vindo do catálogo, protegido da marcação do ReportLab (&, <, >)
+def _texto_pdf(valor):
+    return escape(str(valor))
+
+
+# Função para gerar o PDF (extrato) da proposta com ReportLab a partir da visão da proposta.
+# A tabela de itens é uma só, com cabeçalho repetido em cada página; o ReportLab só mede as linhas
+# que cabem na página atual ao quebrá-la (longTableOptimize), então tempo e memória crescem
+# linearmente com o número de itens.
+def gerar_pdf(visao, buffer=None):
+    # Cria um buffer para o PDF (ou escreve direto no buffer recebido)
+    buffer = buffer if buffer is not None else BytesIO()
+    # Configura o documento
+    left_margin = right_margin = 5 * mm  # Margens da página
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=right_margin,
+        leftMargin=left_margin,
+        topMargin=20 * mm,
+        bottomMargin=20 * mm
+    )
+    styles = ESTILOS_PDF
+    normal = styles['Normal']
+
+    # Cálculo da largura disponível
+    PAGE_WIDTH, PAGE_HEIGHT = A4
+    available_width = PAGE_WIDTH - doc.leftMargin - doc.rightMargin
+
+    # Dados iniciais
+    elements = [
+        Paragraph(f"Proposta: BT-{_texto_pdf(visao.bt)}-Rev{_texto_pdf(visao.rev)}", styles['Heading1']),
+        Paragraph("<b>Dados da Proposta :</b>", styles['Heading2']),
+        Paragraph(f"<b>Cliente:</b> {_texto_pdf(visao.cliente)}", normal),
+        Paragraph(f"<b>Nome do Cliente:</b> {_texto_pdf(visao.nome_cliente)}", normal),
+        Paragraph(f"<b>Telefone:</b> {_texto_pdf(visao.fone)}", normal),
+        Paragraph(f"<b>Email:</b> {_texto_pdf(visao.email)}", normal),
+        Paragraph(f"<b>BT:</b> {_texto_pdf(visao.bt)}", normal),
+        Paragraph(f"<b>Obra:</b> {_texto_pdf(visao.obra)}", normal),
+        Paragraph(f"<b>Data:</b> {visao.dia}/{visao.mes}/{visao.ano}", normal),
+        Paragraph(f"<b>Revisão:</b> {_texto_pdf(visao.rev)}", normal),
+        Paragraph(f"<b>Local:</b> {_texto_pdf(visao.local_frete)}", normal),
+        Spacer(1, 12),
+    ]
+
+    # Resumo das Variáveis
+    elements.append(Paragraph("<b>Percentuais Considerados :</b>", styles['Heading2']))
+    elements.append(Paragraph(f"<b>Contribuinte:</b> {_texto_pdf(visao.contribuinte_icms)}", normal))
+    for rotulo, percentual in visao.percentuais:
+        elements.append(Paragraph(f"<b>{rotulo}:</b> {percentual}", normal))
+    elements.append(Paragraph(f"<b>Local Frete:</b> {_texto_pdf(visao.local_frete_itens)}", normal))
+
+    # Adicionar informação de percentual considerado para cada item
+    for item in visao.itens:
+        elements.append(Paragraph(f"<b>% Caixa Item {item.numero}:</b> {item.percentual_caixa_texto}", normal))
+    elements.append(Spacer(1, 12))
+
+    # Tabela de itens configurados; a descrição de um produto do catálogo é interpretada uma única vez
+    # (o mesmo parágrafo serve a todas as linhas com a mesma descrição, sempre com a mesma largura)
+    data = [[Paragraph(titulo, ESTILO_CABECALHO_PDF) for titulo in CABECALHO_TABELA_PDF]]
+    descricoes = {}
+    for item in visao.itens:
+        descricao = descricoes.get(item.descricao)
+        if descricao is None:
+            descricao = descricoes[item.descricao] = Paragraph(_texto_pdf(item.descricao), ESTILO_CELULA_PDF)
+        data.append([
+            item.codigo_custo,
+            item.codigo_caixa,
+            descricao,
+            str(item.fator_k),
+            item.ip,
+            str(item.quantidade),
+            item.preco_unitario_moeda,
+            item.preco_total_moeda,
+        ])
+
+    total_weight = sum(PESOS_COLUNAS_PDF)
+    column_widths = [(available_width * (weight / total_weight)) for weight in PESOS_COLUNAS_PDF]
+
+    # Cria a tabela (quebrada por linha, com o cabeçalho repetido em cada página)
+    tabela = Table(data, colWidths=column_widths, repeatRows=1, splitByRow=1, longTableOptimize=1)
+    tabela.setStyle(ESTILO_TABELA_PDF)
+
+    elements.append(Paragraph("<b>Itens Configurados</b>", styles['Heading2']))
+    elements.append(tabela)
+
+    # Adiciona a frase de total abaixo da tabela
+    elements.append(Paragraph(f"<b>Total: {visao.total_moeda}</b>", styles['Heading2']))
+
+    # Construir o PDF; cada flowable é descartado da lista assim que a sua página é desenhada
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,145 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import namedtuple
+from datetime import date
+from types import MappingProxyType
+from municipios import gravar_arquivo, ler_arquivo, normalizar
+
+# Índice de frete por município de destino, gerado a partir de uma tabela de distâncias
+# (python indice_frete.py distancias.csv) e distribuído com a aplicação
+ARQUIVO_INDICE = os.getenv(
+    "INDICE_FRETE_ARQUIVO", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'indice_frete.json.gz')
+)
+
+# O frete de cada município vem da própria tabela (frete_percentual), nunca de uma estimativa pela distância
+COLUNAS_TABELA = ['municipio', 'distancia_km', 'frete_percentual']
+
+# Índice carregado, compartilhado por todas as sessões (imutável): município normalizado -> (km, frete %)
+IndiceFrete = namedtuple('IndiceFrete', ['versao', 'gerado_em', 'origem', 'fretes'])
+# Frete sugerido para um município
+SugestaoFrete = namedtuple('SugestaoFrete', ['municipio', 'distancia_km', 'frete_percentual'])
+
+
+def _numero(valor):
+    texto = str(valor).strip().replace(',', '.')
+    return float(texto) if texto and texto.lower() != 'nan' else None
+
+
+# Função para ler a tabela de distâncias (CSV com ; ou , ou planilha Excel): municipio ("Cidade/UF"),
+# distancia_km e frete_percentual
+def ler_tabela_distancias(caminho):
+    import pandas as pd
+    if caminho.lower().endswith(('.xlsx', '.xls')):
+        tabela = pd.read_excel(caminho, dtype=str, keep_default_na=False)
+    else:
+        tabela = pd.read_csv(caminho, sep=None, engine='python', dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    faltando = [coluna for coluna in COLUNAS_TABELA if coluna not in tabela.columns]
+    if faltando:
+        raise ValueError(f"A tabela de distâncias não tem as colunas: {', '.join(faltando)}")
+    return tabela.to_dict('records')
+
+
+# Função para montar o conteúdo do índice a partir das linhas da tabela de distâncias. O índice é consultado
+# sem acentos e maiúsculas, então "São Paulo/SP" e "SAO PAULO/SP" são o mesmo município e não podem se repetir.
+def montar_indice(linhas, origem=''):
+    municipios = {}
+    linhas_por_chave = {}
+    for posicao, linha in enumerate(linhas, start=2):
+        municipio = str(linha['municipio']).strip()
+        distancia = _numero(linha['distancia_km'])
+        percentual = _numero(linha['frete_percentual'])
+        if not municipio or distancia is None or percentual is None:
+            raise ValueError(f"Linha {posicao}: município, distância ou frete em branco.")
+        chave = normalizar(municipio)
+        if chave in linhas_por_chave:
+            raise ValueError(f"Linha {posicao}: o município {municipio} já está na linha {linhas_por_chave[chave]}.")
+        linhas_por_chave[chave] = posicao
+        municipios[municipio] = [distancia, percentual]
+
+    texto = json.dumps(municipios, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return {
+        'versao': hashlib.sha256(texto.encode('utf-8')).hexdigest()[:12],
+        'gerado_em': date.today().isoformat(),
+        'origem': os.path.basename(origem),
+        'municipios': municipios,
+    }
+
+
+def _carregar(conteudo):
+    return IndiceFrete(
+        versao=conteudo['versao'],
+        gerado_em=conteudo['gerado_em'],
+        origem=conteudo.get('origem', ''),
+        fretes=MappingProxyType({
+            normalizar(municipio): SugestaoFrete(municipio, distancia, percentual)
+            for municipio, (distancia, percentual) in conteudo['municipios'].items()
+        }),
+    )
+
+
+_indice = None
+_lock_indice = threading.Lock()
+
+
+# Função para obter o índice de frete, carregado uma vez por processo (vazio se o arquivo não existe)
+def obter_indice_frete():
+    global _indice
+    if _indice is None:
+        with _lock_indice:
+            if _indice is None:
+                if os.path.exists(ARQUIVO_INDICE):
+                    _indice = _carregar(ler_arquivo(ARQUIVO_INDICE))
+                else:
+                    _indice = IndiceFrete(None, None, '', MappingProxyType({}))
+    return _indice
+
+
+# Função para sugerir o frete de um município ("Cidade/UF"); None se ele não está no índice
+def sugerir_frete(municipio):
+    if not municipio:
+        return None
+    return obter_indice_frete().fretes.get(normalizar(municipio.strip()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o índice de frete por município a partir de uma tabela de distâncias.")
+    parser.add_argument('tabela', nargs='?', help="CSV ou planilha com municipio, distancia_km e frete_percentual")
+    parser.add_argument('--arquivo', default=ARQUIVO_INDICE, help="Arquivo do índice gerado")
+    args = parser.parse_args()
+
+    if not args.tabela:
+        if not os.path.exists(args.arquivo):
+            print(f"Arquivo {args.arquivo} não encontrado. Gere com: python indice_frete.py distancias.csv")
+            return 1
+        conteudo = ler_arquivo(args.arquivo)
+        print(f"{len(conteudo['municipios'])} municípios, versão {conteudo['versao']}, gerado em {conteudo['gerado_em']} a partir de {conteudo['origem']}.")
+        return 0
+
+    conteudo = montar_indice(ler_tabela_distancias(args.tabela), origem=args.tabela)
+    gravar_arquivo(conteudo, args.arquivo)
+    print(f"{len(conteudo['municipios'])} municípios gravados em {args.arquivo} (versão {conteudo['versao']}).")
+
+    # Confere a cobertura em relação à lista de municípios da aplicação
+    try:
+        from municipios import obter_municipios
+        nomes = obter_municipios().nomes
+    except Exception as e:
+        print(f"Lista de municípios indisponível para conferir a cobertura: {e}")
+        return 0
+    indice = _carregar(conteudo)
+    sem_frete = [nome for nome in nomes if normalizar(nome) not in indice.fretes]
+    desconhecidos = sorted(set(indice.fretes) - {normalizar(nome) for nome in nomes})
+    print(f"Cobertura: {len(nomes) - len(sem_frete)} de {len(nomes)} municípios da lista.")
+    for nome in sem_frete[:20]:
+        print(f"  sem distância: {nome}")
+    for nome in desconhecidos[:20]:
+        print(f"  fora da lista de municípios: {indice.fretes[nome].municipio}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
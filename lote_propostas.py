@@ -0,0 +1,269 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+import pandas as pd
+from precificacao import precificar_itens, montar_tabela_potencias, NBI_POR_CLASSE, TENSOES_PADRAO
+from renderizacao import renderizar_word, renderizar_pdf
+from visao_proposta import montar_visao, nome_arquivo_word, nome_arquivo_pdf
+from indice_frete import sugerir_frete
+
+# Geração de propostas em lote, sem Streamlit: precifica como a página de Itens e gera o Word e o PDF
+# de cada proposta em paralelo.
+# Uso: python lote_propostas.py lote.xlsx --saida propostas/ [--template Template.docx] [--catalogo planilha.xlsx]
+#
+# A planilha do lote tem duas abas:
+# - 'propostas': bt, rev, cliente, nomeCliente, fone, email, obra, data, local_frete, local_frete_itens,
+#   contribuinte_icms, lucro, icms, frete, comissao, difal, f_pobreza (uma linha por proposta);
+#   com o frete em branco vale o sugerido pelo índice de frete para o local de entrega
+# - 'itens': bt, rev, descricao, quantidade, fator_k, ip, tensao_primaria, tensao_secundaria, derivacoes, ipi
+
+MESES_PT = [
+    "", "Janeiro", "Fevereiro", "Março", "Abril", "Maio",
+    "Junho", "Julho", "Agosto", "Setembro", "Outubro",
+    "Novembro", "Dezembro"
+]
+OPCOES_IP = ['00', '21', '23', '54']
+FATORES_K = [1, 4, 6, 8, 13]
+# Valores iniciais da página de Itens, usados quando a coluna está vazia
+PARAMETROS_PADRAO = {'lucro': 5.0, 'icms': 12.0, 'frete': 5.0, 'comissao': 5.0, 'difal': 0.0, 'f_pobreza': 0.0}
+COLUNAS_OBRIGATORIAS = {
+    'propostas': ['bt', 'rev', 'cliente'],
+    'itens': ['bt', 'rev', 'descricao'],
+}
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def _numero(valor, padrao):
+    texto = _texto(valor).replace(',', '.')
+    return float(texto) if texto else padrao
+
+
+# Função para ler um número inteiro de um item (ex.: '2' ou '2,0'); frações como '1,5' são recusadas
+# em vez de truncadas
+def _inteiro_item(posicao, campo, valor, padrao):
+    try:
+        numero = _numero(valor, padrao)
+    except ValueError:
+        raise ValueError(f"Item {posicao}: {campo} '{_texto(valor)}' não é um número.") from None
+    if not float(numero).is_integer():
+        raise ValueError(f"Item {posicao}: {campo} {_texto(valor)} precisa ser um número inteiro.")
+    return int(numero)
+
+
+# Função para ler as abas do lote como texto (BT e revisão não podem virar números)
+def ler_lote(caminho):
+    abas = pd.read_excel(caminho, sheet_name=list(COLUNAS_OBRIGATORIAS), dtype=str, keep_default_na=False)
+    for aba, colunas in COLUNAS_OBRIGATORIAS.items():
+        faltando = [coluna for coluna in colunas if coluna not in abas[aba].columns]
+        if faltando:
+            raise ValueError(f"A aba '{aba}' não tem as colunas: {', '.join(faltando)}")
+    return abas['propostas'].to_dict('records'), abas['itens'].to_dict('records')
+
+
+# Função para montar o item no formato de itens_configurados da página de Itens (ainda sem preço)
+def montar_item(posicao, linha_item, detalhes_item):
+    fator_k = _inteiro_item(posicao, 'Fator K', linha_item.get('fator_k'), 1)
+    if fator_k not in FATORES_K:
+        raise ValueError(f"Item {posicao}: Fator K {fator_k} inválido (opções: {FATORES_K}).")
+    ip = (_texto(linha_item.get('ip')) or '00').zfill(2)
+    if ip not in OPCOES_IP:
+        raise ValueError(f"Item {posicao}: IP {ip} inválido (opções: {', '.join(OPCOES_IP)}).")
+    quantidade = _inteiro_item(posicao, 'Quantidade', linha_item.get('quantidade'), 1)
+    if quantidade < 1:
+        raise ValueError(f"Item {posicao}: Quantidade {quantidade} inválida (mínimo 1).")
+
+    classe_tensao = detalhes_item['classe_tensao']
+    tensao_primaria_padrao, derivacoes_padrao = TENSOES_PADRAO.get(classe_tensao, ('', ''))
+    return {
+        'ID': detalhes_item['id'],
+        'Item': posicao,
+        'Quantidade': quantidade,
+        'Descrição': detalhes_item['descricao'],
+        'Potência': detalhes_item['potencia'],
+        'Tensão Primária': _texto(linha_item.get('tensao_primaria')) or tensao_primaria_padrao,
+        'Tensão Secundária': _texto(linha_item.get('tensao_secundaria')) or '380',
+        'Derivações': _texto(linha_item.get('derivacoes')) or derivacoes_padrao,
+        'Fator K': fator_k,
+        'IP': ip,
+        'Perdas': detalhes_item['perdas'],
+        'Preço Unitário': 0.0,
+        'Preço Total': 0.0,
+        'IPI': _numero(linha_item.get('ipi'), 0.0),
+        'classe_tensao': classe_tensao,
+        'adicional_caixa_classe': None,
+        'NBI': NBI_POR_CLASSE.get(classe_tensao, '0'),
+        'cod_proj_caixa': detalhes_item['cod_proj_caixa'],
+        'cod_proj_custo': detalhes_item['cod_proj_custo'],
+    }
+
+
+# Função para montar e precificar uma proposta do lote (mesmo formato de montar_proposta do session_state)
+def montar_proposta_lote(linha, linhas_itens, por_descricao, tabela_potencias):
+    if not linhas_itens:
+        raise ValueError("Proposta sem itens.")
+
+    data = pd.to_datetime(linha['data'], dayfirst=True).date() if _texto(linha.get('data')) else date.today()
+    local_frete = _texto(linha.get('local_frete'))
+    dados_iniciais = {
+        'dia': data.strftime('%d'),
+        'mes': MESES_PT[data.month],
+        'ano': data.strftime('%Y'),
+        'bt': _texto(linha['bt']),
+        'rev': _texto(linha['rev']),
+        'cliente': _texto(linha['cliente']),
+        'obra': _texto(linha.get('obra')) or ' ',
+        'nomeCliente': _texto(linha.get('nomeCliente')),
+        'email': _texto(linha.get('email')),
+        'local': '',
+        'fone': _texto(linha.get('fone')),
+        'local_frete': local_frete,
+    }
+
+    # Cliente contribuinte do ICMS não tem DIFAL nem fundo de pobreza (como na página de Itens)
+    contribuinte_icms = _texto(linha.get('contribuinte_icms')) or 'Sim'
+    parametros = {chave: _numero(linha.get(chave), padrao) for chave, padrao in PARAMETROS_PADRAO.items()}
+    local_frete_itens = _texto(linha.get('local_frete_itens')) or local_frete
+    if not _texto(linha.get('frete')):
+        sugestao = sugerir_frete(local_frete_itens)
+        if sugestao is not None:
+            parametros['frete'] = sugestao.frete_percentual
+    if contribuinte_icms == 'Sim':
+        parametros['difal'] = 0.0
+        parametros['f_pobreza'] = 0.0
+
+    itens = []
+    detalhes_itens = []
+    for posicao, linha_item in enumerate(linhas_itens, start=1):
+        descricao = _texto(linha_item['descricao'])
+        if descricao not in por_descricao:
+            raise ValueError(f"Item {posicao}: descrição '{descricao}' não encontrada no catálogo.")
+        detalhes_itens.append(por_descricao[descricao])
+        itens.append(montar_item(posicao, linha_item, por_descricao[descricao]))
+
+    precificar_itens(itens, detalhes_itens, tabela_potencias, parametros)
+
+    return {
+        **parametros,
+        'contribuinte_icms': contribuinte_icms,
+        'local_frete_itens': local_frete_itens,
+        'versao_catalogo': None,
+        'dados_iniciais': dados_iniciais,
+        'itens_configurados': itens,
+    }
+
+
+# Função para montar todas as propostas do lote; devolve as propostas e as linhas do relatório
+def montar_propostas(linhas_propostas, linhas_itens, df_catalogo):
+    linhas_catalogo = df_catalogo.to_dict('records')
+    tabela_potencias = montar_tabela_potencias(linhas_catalogo)
+    por_descricao = {}
+    for linha in linhas_catalogo:
+        por_descricao.setdefault(linha['descricao'], linha)
+
+    itens_por_proposta = {}
+    for linha_item in linhas_itens:
+        itens_por_proposta.setdefault((_texto(linha_item['bt']), _texto(linha_item['rev'])), []).append(linha_item)
+
+    propostas = []
+    relatorio = []
+    vistas = set()
+    for linha in linhas_propostas:
+        chave = (_texto(linha['bt']), _texto(linha['rev']))
+        registro = {'bt': chave[0], 'rev': chave[1], 'cliente': _texto(linha['cliente']), 'itens': 0,
+                    'valor_total': 0.0, 'arquivo_word': '', 'arquivo_pdf': '', 'status': 'ok', 'erro': ''}
+        relatorio.append(registro)
+        try:
+            if chave in vistas:
+                raise ValueError("BT e revisão repetidos no lote.")
+            vistas.add(chave)
+            proposta = montar_proposta_lote(linha, itens_por_proposta.get(chave, []), por_descricao, tabela_potencias)
+        except Exception as e:
+            registro['status'] = 'erro'
+            registro['erro'] = str(e)
+            propostas.append(None)
+            continue
+        registro['itens'] = len(proposta['itens_configurados'])
+        registro['valor_total'] = sum(item['Preço Total'] for item in proposta['itens_configurados'])
+        propostas.append(proposta)
+
+    return propostas, relatorio
+
+
+# Função para gerar os documentos das propostas em paralelo e gravá-los na pasta de saída
+def gerar_documentos(propostas, relatorio, caminho_template, pasta_saida, processos=None):
+    os.makedirs(pasta_saida, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        trabalhos = {}
+        for posicao, proposta in enumerate(propostas):
+            if proposta is None:
+                continue
+            visao = montar_visao(proposta)
+            trabalhos[executor.submit(renderizar_word, visao, caminho_template)] = (posicao, 'word', nome_arquivo_word(proposta))
+            trabalhos[executor.submit(renderizar_pdf, visao)] = (posicao, 'pdf', nome_arquivo_pdf(proposta))
+
+        for future in as_completed(trabalhos):
+            posicao, tipo, nome_arquivo = trabalhos[future]
+            registro = relatorio[posicao]
+            try:
+                conteudo = future.result()
+            except Exception as e:
+                registro['status'] = 'erro'
+                registro['erro'] = (registro['erro'] + ' ' if registro['erro'] else '') + f"{tipo}: {e}"
+                continue
+            with open(os.path.join(pasta_saida, nome_arquivo), 'wb') as arquivo:
+                arquivo.write(conteudo)
+            registro[f'arquivo_{tipo}'] = nome_arquivo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera propostas (Word e PDF) em lote a partir de uma planilha.")
+    parser.add_argument('lote', help="Planilha com as abas 'propostas' e 'itens'")
+    parser.add_argument('--saida', default='propostas', help="Pasta onde os documentos e o resumo são gravados")
+    parser.add_argument('--template', help="Template Word local (padrão: baixado do SharePoint)")
+    parser.add_argument('--catalogo', help="Usa a aba 'atualizacao' desta planilha no lugar do banco de dados")
+    parser.add_argument('--processos', type=int, default=os.cpu_count(), help="Processos de geração em paralelo")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    inicio = time.perf_counter()
+
+    if args.catalogo:
+        from carga_custos import ler_catalogo_planilha
+        df_catalogo = ler_catalogo_planilha(args.catalogo)
+    else:
+        from carga_custos import ler_catalogo
+        df_catalogo = ler_catalogo()
+
+    if args.template:
+        caminho_template = args.template
+    else:
+        from cache_template import obter_cache_template
+        caminho_template = obter_cache_template().caminho_arquivo()
+
+    linhas_propostas, linhas_itens = ler_lote(args.lote)
+    propostas, relatorio = montar_propostas(linhas_propostas, linhas_itens, df_catalogo)
+    gerar_documentos(propostas, relatorio, caminho_template, args.saida, args.processos)
+
+    # Resumo em CSV (separador ';' para abrir direto no Excel em português)
+    caminho_resumo = os.path.join(args.saida, 'resumo.csv')
+    pd.DataFrame(relatorio).to_csv(caminho_resumo, sep=';', decimal=',', index=False, encoding='utf-8-sig')
+
+    com_erro = [registro for registro in relatorio if registro['status'] == 'erro']
+    print(
+        f"{len(relatorio) - len(com_erro)} de {len(relatorio)} propostas geradas em "
+        f"{time.perf_counter() - inicio:.1f} s. Resumo em {caminho_resumo}."
+    )
+    for registro in com_erro:
+        print(f"  BT {registro['bt']}-Rev{registro['rev']}: {registro['erro']}")
+    return 1 if com_erro else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
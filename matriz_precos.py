@@ -0,0 +1,233 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from precificacao import calcular_precos, montar_tabela_potencias, COLUNAS_PRECO
+
+# Combinações calculadas para cada linha do catálogo (mesmas opções da página de Itens)
+FATORES_K = [1, 4, 6, 8, 13]
+OPCOES_IP = ['00', '21', '23', '54']
+OPCOES_CONTRIBUINTE = ['Sim', 'Não']
+LINHAS_POR_BLOCO = 1000
+LIMITE_LINHAS_EXCEL = 1_048_575  # uma linha da aba fica para o cabeçalho
+
+COLUNAS_DESCRITIVAS = ['id', 'descricao', 'potencia', 'classe_tensao', 'perdas', 'cod_proj_custo', 'cod_proj_caixa']
+COLUNAS_SAIDA = COLUNAS_DESCRITIVAS + [
+    'fator_k', 'ip', 'contribuinte_icms', 'potencia_equivalente', 'preco_base1',
+    'adicional_ip', 'adicional_k', 'adicional_caixa_classe', 'preco_unitario'
+]
+# Colunas calculadas gravadas como texto e como inteiro no Parquet (as demais calculadas são float;
+# as descritivas seguem os tipos do catálogo)
+COLUNAS_TEXTO = ['ip', 'contribuinte_icms']
+COLUNAS_INTEIRAS = ['fator_k', 'preco_unitario']
+# Colunas numéricas do catálogo usadas no preço: uma linha com valor em branco ou infinito nelas não tem preço
+COLUNAS_NUMERICAS_PRECO = ['preco', 'p_trafo', 'potencia', 'valor_ip_baixo', 'valor_ip_alto', 'p_caixa']
+
+
+# Função para gerar a matriz de preços em blocos de linhas do catálogo.
+# Cada bloco tem linhas × fatores K × IPs × contribuinte, calculados de uma só vez.
+def gerar_blocos(df_catalogo, parametros, linhas_por_bloco=LINHAS_POR_BLOCO):
+    # A tabela de potências usa o catálogo inteiro, na ordem da consulta (potência crescente)
+    tabela_potencias = montar_tabela_potencias(df_catalogo.to_dict('records'))
+
+    fatores_k = np.repeat(FATORES_K, len(OPCOES_IP))
+    ips = np.tile(np.array(OPCOES_IP, dtype=object), len(FATORES_K))
+    combinacoes = len(fatores_k)
+
+    for inicio in range(0, len(df_catalogo), linhas_por_bloco):
+        bloco = df_catalogo.iloc[inicio:inicio + linhas_por_bloco]
+
+        entrada = {coluna: np.repeat(bloco[coluna].to_numpy(), combinacoes) for coluna in COLUNAS_PRECO}
+        entrada['fator_k'] = np.tile(fatores_k, len(bloco))
+        entrada['ip'] = np.tile(ips, len(bloco))
+        descritivas = {coluna: np.repeat(bloco[coluna].to_numpy(), combinacoes) for coluna in COLUNAS_DESCRITIVAS}
+
+        partes = []
+        for contribuinte in OPCOES_CONTRIBUINTE:
+            # Cliente contribuinte do ICMS não tem DIFAL nem fundo de pobreza (como na página de Itens)
+            parametros_cenario = dict(parametros)
+            if contribuinte == "Sim":
+                parametros_cenario['difal'] = 0.0
+                parametros_cenario['f_pobreza'] = 0.0
+
+            precos = calcular_precos(entrada, tabela_potencias, parametros_cenario)
+            partes.append(pd.DataFrame({
+                **descritivas,
+                'fator_k': entrada['fator_k'],
+                'ip': entrada['ip'],
+                'contribuinte_icms': contribuinte,
+                'potencia_equivalente': precos['potencia_equivalente'],
+                'preco_base1': precos['preco_base1'],
+                'adicional_ip': precos['adicional_ip'],
+                'adicional_k': precos['adicional_k'],
+                'adicional_caixa_classe': precos['adicional_caixa_classe'],
+                'preco_unitario': precos['preco_unitario'],
+            }, columns=COLUNAS_SAIDA))
+
+        yield pd.concat(partes, ignore_index=True)
+
+
+# Tipo do Arrow equivalente ao dtype de uma coluna do catálogo (object vira texto)
+def _tipo_arrow(pa, dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return pa.bool_()
+    if pd.api.types.is_integer_dtype(dtype):
+        return pa.int64()
+    if pd.api.types.is_float_dtype(dtype):
+        return pa.float64()
+    return pa.string()
+
+
+# Função para converter uma coluna descritiva em texto, mantendo os vazios como None
+def _como_texto(serie):
+    return serie.map(lambda valor: None if pd.isna(valor) else str(valor))
+
+
+# Função para montar o schema do Parquet a partir dos tipos do catálogo. Inferido do primeiro bloco, uma
+# coluna de texto toda vazia nesse bloco ficaria com o tipo null e os blocos seguintes não caberiam nele.
+def _esquema_parquet(pa, df_catalogo):
+    campos = []
+    for coluna in COLUNAS_SAIDA:
+        if coluna in COLUNAS_DESCRITIVAS:
+            tipo = _tipo_arrow(pa, df_catalogo[coluna].dtype)
+        elif coluna in COLUNAS_TEXTO:
+            tipo = pa.string()
+        elif coluna in COLUNAS_INTEIRAS:
+            tipo = pa.int64()
+        else:
+            tipo = pa.float64()
+        campos.append(pa.field(coluna, tipo))
+    return pa.schema(campos)
+
+
+# Função para gravar os blocos em Parquet, um row group por bloco
+def _gravar_parquet(blocos, caminho, df_catalogo):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("A exportação em Parquet precisa do pacote 'pyarrow' (pip install pyarrow).")
+
+    esquema = _esquema_parquet(pa, df_catalogo)
+    colunas_texto = [campo.name for campo in esquema if campo.name in COLUNAS_DESCRITIVAS and campo.type == pa.string()]
+    total = 0
+    with pq.ParquetWriter(caminho, esquema) as escritor:
+        for bloco in blocos:
+            # Colunas object vindas do Excel misturam números e textos (ex.: cod_proj_custo); o Arrow só aceita texto
+            for coluna in colunas_texto:
+                bloco[coluna] = _como_texto(bloco[coluna])
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+            total += len(bloco)
+    return total
+
+
+# Função para gravar os blocos em Excel no modo write_only (linhas vão direto para o disco)
+def _gravar_excel(blocos, caminho):
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    aba = None
+    linhas_na_aba = 0
+    total = 0
+    for bloco in blocos:
+        # Converte NaN em célula vazia e tipos NumPy em tipos Python
+        valores = bloco.astype(object).where(bloco.notna(), None).to_numpy().tolist()
+        for linha in valores:
+            if aba is None or linhas_na_aba >= LIMITE_LINHAS_EXCEL:
+                aba = livro.create_sheet(f"precos_{len(livro.worksheets) + 1}")
+                aba.append(COLUNAS_SAIDA)
+                linhas_na_aba = 0
+            aba.append(linha)
+            linhas_na_aba += 1
+        total += len(bloco)
+
+    if aba is None:
+        livro.create_sheet("precos_1").append(COLUNAS_SAIDA)
+    livro.save(caminho)
+    return total
+
+
+# Função para separar as linhas do catálogo que têm todos os valores do preço numéricos e finitos das demais
+def separar_linhas_invalidas(df_catalogo):
+    valores = df_catalogo[COLUNAS_NUMERICAS_PRECO].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    validas = np.isfinite(valores).all(axis=1)
+    return df_catalogo[validas].reset_index(drop=True), df_catalogo[~validas]
+
+
+# Função para calcular e exportar a matriz completa de preços (.xlsx ou .parquet).
+# Linhas do catálogo sem preço calculável ficam de fora (inclusive da tabela de potências equivalentes)
+# e são informadas no resultado, em vez de interromper a exportação inteira.
+def exportar_matriz(df_catalogo, parametros, caminho, linhas_por_bloco=LINHAS_POR_BLOCO):
+    inicio = time.perf_counter()
+    if not caminho.lower().endswith(('.parquet', '.xlsx')):
+        raise ValueError("Formato de saída não suportado. Use um arquivo .xlsx ou .parquet.")
+
+    validas, invalidas = separar_linhas_invalidas(df_catalogo)
+    blocos = gerar_blocos(validas, parametros, linhas_por_bloco)
+    try:
+        if caminho.lower().endswith('.parquet'):
+            total = _gravar_parquet(blocos, caminho, df_catalogo)
+        else:
+            total = _gravar_excel(blocos, caminho)
+    except BaseException:
+        # Não deixa para trás um arquivo gravado pela metade
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        raise
+
+    return {
+        'linhas_catalogo': len(df_catalogo),
+        'linhas_ignoradas': len(invalidas),
+        'ids_ignorados': invalidas['id'].tolist() if 'id' in invalidas else [],
+        'precos': total,
+        'tempo_total': time.perf_counter() - inicio,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gera a tabela de preços de todo o catálogo para todos os fatores K, IPs e contribuinte Sim/Não."
+    )
+    parser.add_argument('saida', help="Arquivo de saída (.xlsx ou .parquet)")
+    parser.add_argument('--planilha', help="Usa a aba 'atualizacao' desta planilha no lugar do banco de dados")
+    parser.add_argument('--lucro', type=float, default=5.0)
+    parser.add_argument('--icms', type=float, default=12.0)
+    parser.add_argument('--frete', type=float, default=5.0)
+    parser.add_argument('--comissao', type=float, default=5.0)
+    parser.add_argument('--difal', type=float, default=0.0, help="Aplicado apenas ao cenário não contribuinte")
+    parser.add_argument('--f-pobreza', dest='f_pobreza', type=float, default=0.0, help="Aplicado apenas ao cenário não contribuinte")
+    parser.add_argument('--linhas-por-bloco', type=int, default=LINHAS_POR_BLOCO)
+    args = parser.parse_args()
+
+    if args.planilha:
+        from carga_custos import ler_catalogo_planilha
+        df_catalogo = ler_catalogo_planilha(args.planilha)
+    else:
+        from dotenv import load_dotenv
+        from carga_custos import ler_catalogo
+        load_dotenv()
+        df_catalogo = ler_catalogo()
+
+    parametros = {
+        'lucro': args.lucro,
+        'icms': args.icms,
+        'frete': args.frete,
+        'comissao': args.comissao,
+        'difal': args.difal,
+        'f_pobreza': args.f_pobreza,
+    }
+    resultado = exportar_matriz(df_catalogo, parametros, args.saida, args.linhas_por_bloco)
+    print(
+        f"{resultado['precos']} preços ({resultado['linhas_catalogo']} linhas do catálogo) "
+        f"gravados em {args.saida} em {resultado['tempo_total']:.2f} s."
+    )
+    if resultado['linhas_ignoradas']:
+        print(
+            f"{resultado['linhas_ignoradas']} linhas do catálogo ignoradas por valores em branco ou inválidos "
+            f"em {', '.join(COLUNAS_NUMERICAS_PRECO)} (ids: {resultado['ids_ignorados'][:20]})."
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+from io import BytesIO
+
+# Intervalo (s) entre as medições de memória do processo e quantas medições são guardadas (24 h)
+INTERVALO_AMOSTRAS = float(os.getenv("MEMORIA_INTERVALO", "60"))
+MAXIMO_AMOSTRAS = int(os.getenv("MEMORIA_AMOSTRAS", "1440"))
+
+
+# Função para estimar a memória de um objeto somando tudo o que ele referencia (cada objeto conta uma vez)
+def tamanho_profundo(objeto, vistos=None):
+    vistos = set() if vistos is None else vistos
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+
+    # DataFrames e arrays sabem o próprio tamanho, inclusive dos textos (deep=True)
+    if hasattr(objeto, 'memory_usage') and hasattr(objeto, 'columns'):
+        return int(objeto.memory_usage(index=True, deep=True).sum())
+    if hasattr(objeto, 'nbytes') and hasattr(objeto, 'dtype'):
+        return max(sys.getsizeof(objeto), int(objeto.nbytes))
+    if isinstance(objeto, BytesIO):
+        return sys.getsizeof(objeto) + objeto.getbuffer().nbytes
+
+    tamanho = sys.getsizeof(objeto, 0)
+    if isinstance(objeto, dict):
+        for chave, valor in objeto.items():
+            tamanho += tamanho_profundo(chave, vistos) + tamanho_profundo(valor, vistos)
+    elif isinstance(objeto, (list, tuple, set, frozenset, deque)):
+        for valor in objeto:
+            tamanho += tamanho_profundo(valor, vistos)
+    elif hasattr(objeto, '__dict__') and not isinstance(objeto, (type, types.ModuleType)) and not callable(objeto):
+        tamanho += tamanho_profundo(vars(objeto), vistos)
+    return tamanho
+
+
+# Função para ler a memória residente (RSS) do processo, em bytes (None fora do Linux)
+def rss_processo():
+    try:
+        with open('/proc/self/status') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+# Gerenciador de sessões do servidor Streamlit (None fora do servidor, ex.: scripts e testes)
+def _gerenciador_sessoes():
+    from streamlit.runtime import Runtime
+    if not Runtime.exists():
+        return None
+    # O Streamlit não tem API pública para isso; usa o gerenciador de sessões do runtime
+    return getattr(Runtime.instance(), '_session_mgr', None)
+
+
+# Função para contar as sessões guardadas no servidor (ativas e desconectadas ainda em memória)
+def contar_sessoes():
+    gerenciador = _gerenciador_sessoes()
+    return gerenciador.num_sessions() if gerenciador is not None else 0
+
+
+# Função para listar as sessões do servidor Streamlit: [(id, ativa, estado)]
+def listar_sessoes():
+    gerenciador = _gerenciador_sessoes()
+    if gerenciador is None:
+        return []
+    ativas = {info.session.id for info in gerenciador.list_active_sessions()}
+    sessoes = []
+    for info in gerenciador.list_sessions():
+        try:
+            estado = dict(info.session.session_state.filtered_state)
+        except Exception:
+            # A sessão mudou durante a leitura; fica para a próxima medição
+            continue
+        sessoes.append((info.session.id, info.session.id in ativas, estado))
+    return sessoes
+
+
+# Função para medir cada sessão e cada chave do session_state (estimativa profunda, em bytes)
+def medir_sessoes():
+    medicoes = []
+    for id_sessao, ativa, estado in listar_sessoes():
+        por_chave = {chave: tamanho_profundo(valor) for chave, valor in estado.items()}
+        medicoes.append({
+            'sessao': id_sessao,
+            'ativa': ativa,
+            'chaves': len(por_chave),
+            'total_bytes': sum(por_chave.values()),
+            'por_chave': por_chave,
+        })
+    return sorted(medicoes, key=lambda medicao: medicao['total_bytes'], reverse=True)
+
+
+# Histórico da memória do processo e do número de sessões, medido em segundo plano
+class MonitorMemoria:
+    def __init__(self, intervalo=INTERVALO_AMOSTRAS, maximo_amostras=MAXIMO_AMOSTRAS):
+        self.intervalo = intervalo
+        self.amostras = deque(maxlen=maximo_amostras)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def registrar(self):
+        try:
+            sessoes = contar_sessoes()
+        except Exception:
+            sessoes = None
+        amostra = {'momento': time.time(), 'rss_bytes': rss_processo(), 'sessoes': sessoes}
+        with self._lock:
+            self.amostras.append(amostra)
+        return amostra
+
+    def _executar(self):
+        while True:
+            self.registrar()
+            time.sleep(self.intervalo)
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="monitor_memoria", daemon=True)
+                self._thread.start()
+
+    def historico(self):
+        with self._lock:
+            return list(self.amostras)
+
+
+_monitor = None
+_lock_monitor = threading.Lock()
+
+
+# Função para obter o monitor de memória do processo (inicia as medições na primeira chamada)
+def obter_monitor_memoria():
+    global _monitor
+    if _monitor is None:
+        with _lock_monitor:
+            if _monitor is None:
+                _monitor = MonitorMemoria()
+                _monitor.iniciar()
+    return _monitor
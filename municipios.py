@@ -0,0 +1,208 @@
+import argparse
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from datetime import date
+from types import MappingProxyType
+
+# Lista de municípios do IBGE distribuída com a aplicação (gerada por "python municipios.py --atualizar")
+ARQUIVO_MUNICIPIOS = os.getenv(
+    "MUNICIPIOS_ARQUIVO", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'municipios.json.gz')
+)
+URL_IBGE = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
+TIMEOUT_IBGE = 30
+# Sem o arquivo e com o IBGE fora do ar, espera este intervalo (s) antes de tentar de novo
+ESPERA_APOS_FALHA = 300
+
+# Municípios carregados, compartilhados por todas as sessões (imutável):
+# nomes no formato "Cidade/UF" em ordem alfabética, a posição de cada nome na lista e os índices de busca
+# (nome inteiro e cada palavra do nome, sem acentos e em minúsculas, ordenados para busca por prefixo)
+Municipios = namedtuple('Municipios', ['versao', 'gerado_em', 'nomes', 'posicoes', 'prefixos', 'palavras'])
+
+
+# UF do município; municípios novos podem vir sem microrregião, então usa a região imediata
+def _uf(cidade):
+    if cidade.get('microrregiao'):
+        return cidade['microrregiao']['mesorregiao']['UF']['sigla']
+    return cidade['regiao-imediata']['regiao-intermediaria']['UF']['sigla']
+
+
+# Função para buscar os municípios na API do IBGE: [[código, nome, UF], ...] em ordem de código
+def baixar_do_ibge():
+    import requests
+    response = requests.get(URL_IBGE, timeout=TIMEOUT_IBGE)
+    response.raise_for_status()
+    return sorted([cidade['id'], cidade['nome'], _uf(cidade)] for cidade in response.json())
+
+
+# Texto sem acentos e em minúsculas, para a busca ("São Paulo" -> "sao paulo")
+def normalizar(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def _montar(conteudo):
+    nomes = tuple(sorted(f"{nome}/{uf}" for _, nome, uf in conteudo['municipios']))
+    normalizados = [normalizar(nome) for nome in nomes]
+    return Municipios(
+        versao=conteudo['versao'],
+        gerado_em=conteudo['gerado_em'],
+        nomes=nomes,
+        posicoes=MappingProxyType({nome: posicao for posicao, nome in enumerate(nomes)}),
+        prefixos=tuple(sorted((normalizado, posicao) for posicao, normalizado in enumerate(normalizados))),
+        palavras=tuple(sorted(
+            (palavra, posicao) for posicao, normalizado in enumerate(normalizados)
+            for palavra in set(re.split(r'[^a-z0-9]+', normalizado)) if palavra
+        )),
+    )
+
+
+# Posições das entradas do índice que começam com o prefixo
+def _com_prefixo(indice, prefixo):
+    inicio = bisect.bisect_left(indice, (prefixo,))
+    # Percorre pelo índice a partir do início, sem copiar o resto da tupla
+    for idx in range(inicio, len(indice)):
+        chave, posicao = indice[idx]
+        if not chave.startswith(prefixo):
+            break
+        yield posicao
+
+
+# Função para buscar cidades pelo começo do nome ou de qualquer palavra do nome, sem diferenciar acentos
+# e maiúsculas; devolve no máximo "limite" nomes, primeiro os que começam com o texto digitado
+def buscar_cidades(texto, limite=20, municipios=None):
+    municipios = municipios if municipios is not None else obter_municipios()
+    termos = [termo for termo in re.split(r'[^a-z0-9]+', normalizar(texto)) if termo]
+    if not termos:
+        return []
+
+    encontradas = []
+    vistas = set()
+    # Nome inteiro começando com o texto ("sao p" -> São Paulo/SP, São Pedro/SP...)
+    for posicao in _com_prefixo(municipios.prefixos, ' '.join(termos)):
+        if len(encontradas) >= limite:
+            return encontradas
+        encontradas.append(municipios.nomes[posicao])
+        vistas.add(posicao)
+    # Depois, nomes com uma palavra começando com cada termo ("paulo sp", "rio jan")
+    candidatas = None
+    for termo in termos:
+        posicoes = set(_com_prefixo(municipios.palavras, termo))
+        candidatas = posicoes if candidatas is None else candidatas & posicoes
+    for posicao in sorted(candidatas - vistas):
+        if len(encontradas) >= limite:
+            break
+        encontradas.append(municipios.nomes[posicao])
+    return encontradas
+
+
+def _conteudo(registros):
+    texto = json.dumps(registros, ensure_ascii=False, separators=(',', ':'))
+    return {
+        'versao': hashlib.sha256(texto.encode('utf-8')).hexdigest()[:12],
+        'gerado_em': date.today().isoformat(),
+        'fonte': URL_IBGE,
+        'municipios': registros,
+    }
+
+
+def ler_arquivo(caminho=ARQUIVO_MUNICIPIOS):
+    with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+# Função para gravar o arquivo de municípios (gzip, gravação atômica)
+def gravar_arquivo(conteudo, caminho=ARQUIVO_MUNICIPIOS):
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(caminho)), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as bruto, gzip.GzipFile(fileobj=bruto, mode='wb', mtime=0) as arquivo:
+            arquivo.write(json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+_municipios = None
+_falha_em = None
+_lock_municipios = threading.Lock()
+
+
+# Função para obter os municípios, carregados uma única vez por processo.
+# Sem o arquivo distribuído (ainda não gerado), busca uma vez no IBGE e guarda no processo.
+def obter_municipios():
+    global _municipios, _falha_em
+    if _municipios is not None:
+        return _municipios
+    with _lock_municipios:
+        if _municipios is None:
+            if os.path.exists(ARQUIVO_MUNICIPIOS):
+                _municipios = _montar(ler_arquivo(ARQUIVO_MUNICIPIOS))
+            else:
+                if _falha_em is not None and time.monotonic() - _falha_em < ESPERA_APOS_FALHA:
+                    raise RuntimeError("Lista de municípios indisponível. Tente novamente em alguns minutos.")
+                try:
+                    _municipios = _montar(_conteudo(baixar_do_ibge()))
+                except Exception:
+                    _falha_em = time.monotonic()
+                    raise
+        return _municipios
+
+
+# Função para atualizar o arquivo com a lista atual do IBGE e recarregar o processo; devolve as diferenças
+def atualizar(caminho=ARQUIVO_MUNICIPIOS):
+    global _municipios
+    novo = _conteudo(baixar_do_ibge())
+    anteriores = set()
+    if os.path.exists(caminho):
+        anteriores = {f"{nome}/{uf}" for _, nome, uf in ler_arquivo(caminho)['municipios']}
+    atuais = {f"{nome}/{uf}" for _, nome, uf in novo['municipios']}
+    gravar_arquivo(novo, caminho)
+    if os.path.abspath(caminho) == os.path.abspath(ARQUIVO_MUNICIPIOS):
+        with _lock_municipios:
+            _municipios = _montar(novo)
+    return {
+        'versao': novo['versao'],
+        'municipios': len(atuais),
+        'incluidos': sorted(atuais - anteriores),
+        'removidos': sorted(anteriores - atuais),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lista de municípios do IBGE distribuída com a aplicação.")
+    parser.add_argument('--atualizar', action='store_true', help="Baixa a lista atual do IBGE e grava o arquivo")
+    parser.add_argument('--arquivo', default=ARQUIVO_MUNICIPIOS)
+    args = parser.parse_args()
+
+    if args.atualizar:
+        resultado = atualizar(args.arquivo)
+        print(
+            f"{resultado['municipios']} municípios gravados em {args.arquivo} (versão {resultado['versao']}): "
+            f"{len(resultado['incluidos'])} incluídos, {len(resultado['removidos'])} removidos."
+        )
+        for nome in resultado['incluidos']:
+            print(f"  + {nome}")
+        for nome in resultado['removidos']:
+            print(f"  - {nome}")
+        return 0
+
+    if not os.path.exists(args.arquivo):
+        print(f"Arquivo {args.arquivo} não encontrado. Gere com: python municipios.py --atualizar")
+        return 1
+    conteudo = ler_arquivo(args.arquivo)
+    print(f"{len(conteudo['municipios'])} municípios, versão {conteudo['versao']}, gerado em {conteudo['gerado_em']}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
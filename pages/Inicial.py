@@ -1,25 +1,9 @@
 import streamlit as st
-import requests
+from campos_cidade import cidade_existe, seletor_cidade
 from datetime import datetime
 
 st.set_page_config(layout="wide")
 
-def carregar_cidades():
-    if 'cidades' not in st.session_state:
-        url = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                st.session_state['cidades'] = sorted(
-                    [f"{cidade['nome']}/{cidade['microrregiao']['mesorregiao']['UF']['sigla']}" for cidade in response.json()]
-                )
-            else:
-                st.error("Erro ao buscar as cidades. Por favor, tente novamente mais tarde.")
-                st.session_state['cidades'] = []
-        except Exception as e:
-            st.error(f"Erro ao conectar com a API: {e}")    
-            st.session_state['cidades'] = []
-
 def aplicar_mascara_telefone():
     telefone = ''.join(filter(str.isdigit, st.session_state['fone_raw']))  # Remove todos os caracteres que não são dígitos
     if len(telefone) == 11:
@@ -46,12 +30,9 @@ if 'dados_iniciais' not in st.session_state:
         'fone': ''
     }
 
-# Carrega as cidades apenas uma vez
-carregar_cidades()
-
 # Verifica se 'local_frete' já existe em 'dados_iniciais', caso contrário, inicializa
 if 'local_frete' not in st.session_state['dados_iniciais']:
-    st.session_state['dados_iniciais']['local_frete'] = "São Paulo/SP" if "São Paulo/SP" in st.session_state['cidades'] else (st.session_state['cidades'][0] if st.session_state['cidades'] else '')
+    st.session_state['dados_iniciais']['local_frete'] = "São Paulo/SP" if cidade_existe("São Paulo/SP") else ''
 
 def configurar_informacoes():
     st.title('Dados Iniciais')
@@ -93,11 +74,7 @@ def configurar_informacoes():
         })
 
         # Input para Local Frete
-        local_frete = st.selectbox(
-            'Local Frete:',
-            st.session_state['cidades'],
-            index=st.session_state['cidades'].index(st.session_state['dados_iniciais']['local_frete']) if st.session_state['dados_iniciais']['local_frete'] in st.session_state['cidades'] else 0
-        )
+        local_frete = seletor_cidade('Local Frete:', st.session_state['dados_iniciais']['local_frete'], 'local_frete')
         st.session_state['dados_iniciais']['local_frete'] = local_frete  
 
         st.text_input(
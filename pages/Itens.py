@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
-from config_db import conectar_banco
+from catalogo import obter_catalogo
+from precificacao import precificar_itens, parametros_comerciais, NBI_POR_CLASSE, TENSOES_PADRAO
 import os
 from dotenv import load_dotenv
-from pages.Inicial import carregar_cidades
+from campos_cidade import seletor_cidade
+from indice_frete import sugerir_frete
 
 
 load_dotenv()
@@ -17,46 +19,14 @@ def verificar_dados_iniciais():
             return False
     return True
 
-@st.cache_data
-def buscar_dados():
-    conn = conectar_banco()
-    query = """
-        SELECT id, descricao, potencia, classe_tensao, perdas, preco, p_trafo, valor_ip_baixo, valor_ip_alto, p_caixa , cod_proj_caixa , cod_proj_custo
-        FROM custos_media_tensao
-        ORDER BY potencia ASC
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
-def calcular_preco_total(preco_unit, quantidade):
-    return preco_unit * quantidade
-
 if 'itens_configurados' not in st.session_state:
     st.session_state['itens_configurados'] = []
 
 st.title('Configuração Itens')
 st.markdown("---")
-df = buscar_dados()
-icms_base = 12 / 100
-irpj_cssl = 2.28 / 100
-tkxadmmkt = 3.7 / 100
-mocusfixo = 20 / 100
-pisconfins = 9.25 / 100
-p_caixa_24 = 30 / 100
-p_caixa_36 = 50 / 100
-valor_ip_baixo = df['valor_ip_baixo'].iloc[0]
-valor_ip_alto = df['valor_ip_alto'].iloc[0]
-p_caixa = df['p_caixa'].iloc[0]
-percentuais_k = {
-    1: 0.0,
-    4: 0.0502,
-    6: 0.0917,
-    13: 0.2317,
-    20: 0.3359
-}
-
-carregar_cidades()
+catalogo = obter_catalogo()
+# Versão do catálogo usada nos preços (identifica os documentos gerados a partir deles)
+st.session_state['versao_catalogo'] = catalogo.versao
 
 if 'dados_iniciais' not in st.session_state:
     st.session_state['dados_iniciais'] = {}
@@ -66,7 +36,9 @@ if 'lucro' not in st.session_state:
 if 'icms' not in st.session_state:
     st.session_state['icms'] = 12.0
 if 'frete' not in st.session_state:
-    st.session_state['frete'] = 5.0
+    # Começa com o frete sugerido para o local de entrega dos dados iniciais, se houver
+    sugestao_inicial = sugerir_frete(st.session_state['dados_iniciais'].get('local_frete', ''))
+    st.session_state['frete'] = sugestao_inicial.frete_percentual if sugestao_inicial else 5.0
 if 'comissao' not in st.session_state:
     st.session_state['comissao'] = 5.0
 
@@ -80,13 +52,20 @@ st.session_state['icms'] = icms
 frete = st.number_input('Frete (%):', min_value=0.0, step=0.1, value=st.session_state['frete'])
 st.session_state['frete'] = frete
 
-cidades = st.session_state['cidades']
-local_frete_itens = st.selectbox(
-    'Local Frete :',
-    st.session_state['cidades'],
-    index=st.session_state['cidades'].index(st.session_state['local_frete_itens']) if st.session_state['local_frete_itens'] in st.session_state['cidades'] else 0
-)
-st.session_state['local_frete_itens'] = local_frete_itens
+local_frete_itens = seletor_cidade('Local Frete :', st.session_state['local_frete_itens'], 'local_frete_itens')
+
+# Ao trocar o local de entrega, o frete passa a ser o sugerido pelo índice de frete (pode ser alterado à mão)
+sugestao_frete = sugerir_frete(local_frete_itens)
+if local_frete_itens != st.session_state['local_frete_itens']:
+    st.session_state['local_frete_itens'] = local_frete_itens
+    if sugestao_frete is not None and sugestao_frete.frete_percentual != st.session_state['frete']:
+        st.session_state['frete'] = sugestao_frete.frete_percentual
+        st.rerun()
+if sugestao_frete is not None:
+    st.caption(
+        f"Frete sugerido para {local_frete_itens}: {sugestao_frete.frete_percentual:.1f}% "
+        f"({sugestao_frete.distancia_km:.0f} km da fábrica)."
+    )
 
 contribuinte_icms = st.radio(
     "O cliente é contribuinte do ICMS?",
@@ -120,8 +99,6 @@ else:
 comissao = st.number_input('Comissão (%):', min_value=0.0, step=0.1, value=st.session_state['comissao'])
 st.session_state['comissao'] = comissao
 
-percentuais = (lucro / 100) + (icms_base) + (comissao / 100) + (frete / 100) + irpj_cssl + tkxadmmkt + mocusfixo + pisconfins
-
 quantidade_itens = st.number_input('Quantidade de Itens:', min_value=1, step=1, value=len(st.session_state.get('itens_configurados', [])) or 1)
 
 while len(st.session_state['itens_configurados']) < quantidade_itens:
@@ -153,16 +130,18 @@ while len(st.session_state['itens_configurados']) > quantidade_itens:
 opcoes_ip = ['00', '21', '23', '54']
 fator_k_opcoes = [1, 4, 6, 8, 13]
 
+# Itens com descrição escolhida, precificados todos juntos depois do laço
+itens_para_precificar = []
+
 for item in range(len(st.session_state['itens_configurados'])):
     st.subheader(f"Item {item + 1}")
 
-    descricao_opcoes = [""] + df['descricao'].unique().tolist()
     descricao_key = f'descricao_{item}'
     descricao_escolhida = st.selectbox(
         f'Digite ou Selecione a Descrição do Item {item + 1}:',
-        descricao_opcoes,
+        catalogo.opcoes_descricao,
         key=descricao_key,
-        index=0 if st.session_state['itens_configurados'][item]['Descrição'] == "" else descricao_opcoes.index(st.session_state['itens_configurados'][item]['Descrição'])
+        index=catalogo.posicao_descricao(st.session_state['itens_configurados'][item]['Descrição'])
     )
 
     if descricao_escolhida == "":
@@ -171,26 +150,16 @@ for item in range(len(st.session_state['itens_configurados'])):
         st.session_state['itens_configurados'][item]['Preço Unitário'] = 0.0
         continue
 
-    id_item = df[df['descricao'] == descricao_escolhida]['id'].values[0]
+    detalhes_item = catalogo.por_descricao(descricao_escolhida)
+    id_item = detalhes_item['id']
     st.session_state['itens_configurados'][item]['ID'] = id_item
     st.session_state['itens_configurados'][item]['Descrição'] = descricao_escolhida
 
-    detalhes_item = df[df['descricao'] == descricao_escolhida].iloc[0]
     st.session_state['itens_configurados'][item]['Potência'] = detalhes_item['potencia']
     st.session_state['itens_configurados'][item]['Perdas'] = detalhes_item['perdas']
     st.session_state['itens_configurados'][item]['classe_tensao'] = detalhes_item['classe_tensao']
     st.session_state['itens_configurados'][item]['cod_proj_caixa'] = detalhes_item['cod_proj_caixa']
     st.session_state['itens_configurados'][item]['cod_proj_custo'] = detalhes_item['cod_proj_custo']
-    
-    valor_ip_baixo = detalhes_item['valor_ip_baixo']
-    valor_ip_alto = detalhes_item['valor_ip_alto']
-    p_caixa = detalhes_item['p_caixa']
-    preco_base = detalhes_item['preco']
-    p_trafo = detalhes_item['p_trafo']
-    
-    preco_base1 = preco_base / (1 - p_trafo - percentuais)
-
-    item_index = 0 
 
     fator_k_escolhido = st.selectbox(
         f'Selecione o Fator K do Item: ',
@@ -208,94 +177,15 @@ for item in range(len(st.session_state['itens_configurados'])):
     )
     st.session_state['itens_configurados'][item]['IP'] = ip_escolhido
 
-    # Pegar a potência do item (a partir da descrição selecionada anteriormente)
-    potencia = st.session_state['itens_configurados'][item]['Potência']
-
-    # Inicializa a potência equivalente com a potência original
-    potencia_equivalente = potencia
-
-    # Se o Fator K for maior que 5, calcular a potência equivalente
-        # Se o Fator K for maior que 5, calcular a potência equivalente
-    if fator_k_escolhido > 5:
-        potencia_equivalente = potencia / (
-            (-0.000000391396 * fator_k_escolhido**6) +
-            (0.000044437349 * fator_k_escolhido**5) -
-            (0.001966117106 * fator_k_escolhido**4) +
-            (0.040938237195 * fator_k_escolhido**3) -
-            (0.345600795014 * fator_k_escolhido**2) -
-            (1.369407483908 * fator_k_escolhido) +
-            101.826204136368
-        ) / 100 * 10000  # Ajuste para multiplicar corretamente
-
-        # Arredondar para o valor mais próximo para cima na coluna 'potencia' da base de dados
-        potencias_disponiveis = sorted(df['potencia'].values)
-        potencia_equivalente = next((p for p in potencias_disponiveis if p >= potencia_equivalente), potencias_disponiveis[-1])
-
-        # Atualizar a potência equivalente no session_state
-        st.session_state['itens_configurados'][item]['Potência Equivalente'] = potencia_equivalente
-
-        # Buscar os valores da potência equivalente
-        detalhes_item_equivalente = df[df['potencia'] == potencia_equivalente].iloc[0]
-        valor_ip_baixo = detalhes_item_equivalente['valor_ip_baixo']
-        valor_ip_alto = detalhes_item_equivalente['valor_ip_alto']
-        p_caixa = detalhes_item_equivalente['p_caixa']
-    else:
-        # Usar os valores da potência original se o fator K for <= 5
-        valor_ip_baixo = detalhes_item['valor_ip_baixo']
-        valor_ip_alto = detalhes_item['valor_ip_alto']
-        p_caixa = detalhes_item['p_caixa']
-
-    # Cálculo do adicional IP baseado no IP escolhido e os valores adequados (potência original ou equivalente)
-    if ip_escolhido == '00':
-        adicional_ip = 0.0
-    else:
-        adicional_ip = valor_ip_baixo / (1 - percentuais - p_caixa) if int(ip_escolhido) < 54 else valor_ip_alto / (1 - percentuais - p_caixa)
-
-# Atualizar o preço total considerando o adicional IP e demais fatores
-
     classe_tensao = detalhes_item['classe_tensao']
-    adicional_caixa_classe = 0
-    if classe_tensao == "24 kV":
-        adicional_caixa_classe = p_caixa_24 * adicional_ip
-    elif classe_tensao == "36 kV":
-        adicional_caixa_classe = p_caixa_36 * adicional_ip
-    elif classe_tensao == "15 kV":
-        adicional_caixa_classe = 0
-
-    adicional_k = 0
-    if fator_k_escolhido in percentuais_k:
-        adicional_k = preco_base1 * percentuais_k[fator_k_escolhido]
-    
-
-    if classe_tensao == "15 kV":
-        NBI = '95kV'
-    elif classe_tensao == "24 kV":
-        NBI = '125kV'
-    elif classe_tensao == "36 kV":
-        NBI = '150kV'
-    else:
-        NBI = '0'
-    st.session_state['itens_configurados'][item]['NBI'] = NBI
+    st.session_state['itens_configurados'][item]['NBI'] = NBI_POR_CLASSE.get(classe_tensao, '0')
 
-    adicional_k = 0
-    if fator_k_escolhido in percentuais_k:
-        adicional_k = preco_base1 * percentuais_k[fator_k_escolhido]
-
-    preco_unitario = int(((preco_base1 + adicional_ip + adicional_k + adicional_caixa_classe) * (1 - 0.12)) / \
-                      (1 - (st.session_state['difal'] / 100) - (st.session_state['f_pobreza'] / 100) - (st.session_state['icms'] / 100)))
-
-    st.session_state['itens_configurados'][item]['Preço Unitário'] = preco_unitario
+    # O preço é calculado após o laço, em uma única passada para todos os itens
+    itens_para_precificar.append((item, detalhes_item))
 
     # Regras para valores padrão de Tensão Primária, Tensão Secundária e Derivações
-    if classe_tensao == "15 kV":
-        tensao_primaria_padrao = "13,8"
-        derivacoes_padrao = "13,8/13,2/12,6/12,0/11,4kV"
-    elif classe_tensao == "24 kV":
-        tensao_primaria_padrao = "23,1"
-        derivacoes_padrao = "23,1/22,0/20kV"
-    elif classe_tensao == "36 kV":
-        tensao_primaria_padrao = "34,5"
-        derivacoes_padrao = "+/- 2x2,5%"
+    if classe_tensao in TENSOES_PADRAO:
+        tensao_primaria_padrao, derivacoes_padrao = TENSOES_PADRAO[classe_tensao]
     else:
         tensao_primaria_padrao = st.session_state['itens_configurados'][item]['Tensão Primária']
         derivacoes_padrao = st.session_state['itens_configurados'][item]['Derivações']
@@ -336,11 +226,17 @@ for item in range(len(st.session_state['itens_configurados'])):
     ipi = st.number_input(f'IPI do Item {item + 1} (%):', min_value=0.0, step=0.1, value=0.0, key=f'ipi_{item}')
     st.session_state['itens_configurados'][item]['IPI'] = ipi
 
-    preco_total = calcular_preco_total(preco_unitario, quantidade)
-    st.session_state['itens_configurados'][item]['Preço Total'] = preco_total
-
     st.markdown("---")
 
+# Cálculo vetorizado dos preços de todos os itens selecionados
+if itens_para_precificar:
+    precificar_itens(
+        [st.session_state['itens_configurados'][item] for item, _ in itens_para_precificar],
+        [detalhes_item for _, detalhes_item in itens_para_precificar],
+        catalogo.tabela_potencias,
+        parametros_comerciais(st.session_state)
+    )
+
 # Mostrar a tabela de resumo
 st.subheader("Resumo dos Itens Selecionados")
 resumo_df = pd.DataFrame(st.session_state['itens_configurados'])
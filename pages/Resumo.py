@@ -1,16 +1,13 @@
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 import streamlit as st
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from docx import Document
-from sharepoint_code import SharePoint  # Certifique-se de ter este módulo
-from replace import inserir_tabelas_word  # Certifique-se de ter esta função
-from babel import numbers
+from cache_template import obter_cache_template
+from visao_proposta import montar_proposta, montar_visao, nome_arquivo_word, nome_arquivo_pdf
+from renderizacao import obter_servico_renderizacao, FilaCheia
+from artefatos import obter_armazem_artefatos
+from arquivamento import obter_arquivamento
 
 st.set_page_config(layout="wide")
 
@@ -35,257 +32,113 @@ def verificar_dados_completos():
 
     return True
 
-# Função para baixar o template uma vez e reutilizá-lo
+# Função para obter o caminho do template, baixado uma vez por processo e conferido periodicamente
 def get_template_file():
-    local_template_path = "/tmp/Template_Proposta_Comercial.docx"
-    
-    if not os.path.exists(local_template_path):
-        sp = SharePoint()
-        template_name = 'Template_Proposta_Comercial.docx'
-        local_template_path = sp.download_file(template_name)
-    
-    return local_template_path
-
-# Função para gerar documento Word
-def gerar_documento_word():
-    template_path = get_template_file()
-    output_filename = f"Proposta Blutrafos nº BT {st.session_state['dados_iniciais']['bt']}-Rev{st.session_state['dados_iniciais']['rev']}.docx"
-    
-    replacements = {
-        '{{CLIENTE}}': str(st.session_state['dados_iniciais'].get('cliente', '')),
-        '{{NOMECLIENTE}}': str(st.session_state['dados_iniciais'].get('nomeCliente', '')),
-        '{{FONE}}': str(st.session_state['dados_iniciais'].get('fone', '')),
-        '{{EMAIL}}': str(st.session_state['dados_iniciais'].get('email', '')),
-        '{{BT}}': str(st.session_state['dados_iniciais'].get('bt', '')),
-        '{{OBRA}}': str(st.session_state['dados_iniciais'].get('obra', ' ')) if st.session_state['dados_iniciais'].get('obra') else ' ',
-        '{{DIA}}': str(st.session_state['dados_iniciais'].get('dia', '')),
-        '{{MES}}': str(st.session_state['dados_iniciais'].get('mes', '')),
-        '{{ANO}}': str(st.session_state['dados_iniciais'].get('ano', '')),
-        '{{REV}}': str(st.session_state['dados_iniciais'].get('rev', '')),
-        '{{LOCAL}}': str(st.session_state['dados_iniciais'].get('local_frete', '')),
-        '{{LOCALFRETE}}': str(st.session_state['local_frete_itens']),
-        '{{ICMS}}': str(st.session_state['icms']).replace('.', ',') + "%",
-        '{{IP}}': ', '.join(set(
-            str(item['IP']) for item in st.session_state['itens_configurados'] if item['IP'] != '00')),
-    '{obra}': '' if not st.session_state['dados_iniciais'].get('obra', '').strip() else 'Obra:'
+    return obter_cache_template().caminho_arquivo()
+
+ROTULOS_DOCUMENTO = {'word': 'Documento Word', 'pdf': 'PDF'}
+DESCRICAO_STATUS = {'na_fila': 'Na fila', 'processando': 'Gerando', 'concluido': 'Concluído', 'erro': 'Erro'}
+MIME_DOCUMENTO = {
+    'word': "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    'pdf': "application/pdf",
 }
 
-    # Se {{OBRA}} for vazio, também remover {obra}
-    if replacements['{{OBRA}}'] == '':
-        replacements['{obra}'] = ''
+# Função para identificar a sessão no armazém de documentos (os arquivos ficam em disco, não no session_state)
+def id_sessao():
+    if 'id_sessao' not in st.session_state:
+        st.session_state['id_sessao'] = uuid.uuid4().hex
+    return st.session_state['id_sessao']
 
-    itens_configurados = st.session_state.get('itens_configurados', [])
+# Função para enviar o Word e o PDF da proposta ao serviço de geração (os dois são gerados em paralelo)
+def iniciar_geracao_documentos():
+    proposta = montar_proposta(st.session_state)
 
-    if not itens_configurados:
+    if not proposta['itens_configurados']:
         st.error("Por favor, preencha todos os itens antes de gerar o documento.")
-        return None, None
-
-    buffer = BytesIO()
+        return
 
     try:
-        doc = Document(template_path)
-        doc = inserir_tabelas_word(doc, itens_configurados, '', replacements)
-        doc.save(buffer)
-        
-        buffer.seek(0)
-        return buffer, output_filename
-    
-    except Exception as e:
-        st.error(f"Erro ao gerar o documento: {e}")
-        return None, None
-# Função para gerar PDF com ReportLab
-def gerar_pdf():
-    # Cria um buffer para o PDF
-    buffer = BytesIO()
-    try:
-        # Configura o documento
-        left_margin = right_margin = 5 * mm  # Margens da página
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=right_margin,
-            leftMargin=left_margin,
-            topMargin=20 * mm,
-            bottomMargin=20 * mm
-        )
-        elements = []
-        styles = getSampleStyleSheet()
-
-        # Cálculo da largura disponível
-        PAGE_WIDTH, PAGE_HEIGHT = A4
-        available_width = PAGE_WIDTH - doc.leftMargin - doc.rightMargin
-
-        # Dados iniciais
-        dados_iniciais = st.session_state['dados_iniciais']
-        elementos_dados_iniciais = [
-            Paragraph(f"Proposta: BT-{st.session_state['dados_iniciais'].get('bt', '')}-Rev{st.session_state['dados_iniciais'].get('rev', '')}", styles['Heading1']),
-            Paragraph("<b>Dados da Proposta :</b>", styles['Heading2']),
-            Paragraph(f"<b>Cliente:</b> {dados_iniciais.get('cliente', '')}", styles['Normal']),
-            Paragraph(f"<b>Nome do Cliente:</b> {dados_iniciais.get('nomeCliente', '')}", styles['Normal']),
-            Paragraph(f"<b>Telefone:</b> {dados_iniciais.get('fone', '')}", styles['Normal']),
-            Paragraph(f"<b>Email:</b> {dados_iniciais.get('email', '')}", styles['Normal']),
-            Paragraph(f"<b>BT:</b> {dados_iniciais.get('bt', '')}", styles['Normal']),
-            Paragraph(f"<b>Obra:</b> {dados_iniciais.get('obra', '')}", styles['Normal']),
-            Paragraph(f"<b>Data:</b> {dados_iniciais.get('dia', '')}/{dados_iniciais.get('mes', '')}/{dados_iniciais.get('ano', '')}", styles['Normal']),
-            Paragraph(f"<b>Revisão:</b> {dados_iniciais.get('rev', '')}", styles['Normal']),
-            Paragraph(f"<b>Local:</b> {dados_iniciais.get('local_frete', '')}", styles['Normal']),
-            Spacer(1, 12),
-        ]
-        elements.extend(elementos_dados_iniciais)
-
-        # Resumo das Variáveis
-        elementos_variaveis = [
-            Paragraph("<b>Percentuais Considerados :</b>", styles['Heading2']),
-            Paragraph(f"<b>Contribuinte:</b> {st.session_state['contribuinte_icms']}", styles['Normal']),
-            Paragraph(f"<b>Lucro:</b> {st.session_state['lucro']:.2f}%", styles['Normal']),
-            Paragraph(f"<b>ICMS:</b> {st.session_state['icms']:.2f}%", styles['Normal']),
-            Paragraph(f"<b>Frete:</b> {st.session_state['frete']:.2f}%", styles['Normal']),
-            Paragraph(f"<b>Comissão:</b> {st.session_state['comissao']:.2f}%", styles['Normal']),
-            Paragraph(f"<b>DIFAL:</b> {st.session_state['difal']:.2f}%", styles['Normal']),
-            Paragraph(f"<b>F.pobreza:</b> {st.session_state['f_pobreza']:.2f}%", styles['Normal']),
-            Paragraph(f"<b>Local Frete:</b> {st.session_state['local_frete_itens']}", styles['Normal']),
-        ]
-
-        voltage_class_percentage = {
-            "15 kV": 0,
-            "24 kV": 30,
-            "36 kV": 50
-        }
-
-        # Adicionar informação de percentual considerado para cada item
-        itens_configurados = st.session_state.get('itens_configurados', [])
-        for idx, item in enumerate(itens_configurados, start=1):
-            # Obter a classe de tensão corretamente
-            classe_tensao = item.get('classe_tensao', '')
-            percentual_considerado = voltage_class_percentage.get(classe_tensao, 'Não especificado')
-            if item['IP'] == 00:
-                percentual_considerado = 0
-            elementos_variaveis.append(
-                Paragraph(f"<b>% Caixa Item {idx}:</b> {percentual_considerado}%", styles['Normal'])
-            )
-
-        elementos_variaveis.append(Spacer(1, 12))
-        elements.extend(elementos_variaveis)
-
-        # Estilo para as células da tabela
-        table_cell_style = ParagraphStyle(
-            'TableCell',
-            parent=styles['Normal'],
-            fontSize=7,
-            leading=9,
-            alignment=0,  # 0=left, 1=center, 2=right, 4=justify
-            spaceAfter=0,
-            spaceBefore=0,
-        )
-
-        # Tabela de itens configurados (mantendo o formato original)
-        data = [['Cód. Proj Trafo', 'Cód. Proj Caixa', 'Descrição', 'K', 'IP', 'Qtde', 'Preço Unitário','Preço Total']]
-
-        # Estilo para o cabeçalho
-        header_style = ParagraphStyle(
-            'TableHeader',
-            parent=styles['Normal'],
-            fontSize=7,
-            leading=9,
-            alignment=1,  # center
-            textColor=colors.white,
-            spaceAfter=0,
-            spaceBefore=0,
+        cache_template = obter_cache_template()
+        trabalhos = obter_servico_renderizacao().enviar_proposta(
+            proposta, cache_template.caminho_arquivo(), versao_template=cache_template.hash()
         )
+    except FilaCheia as e:
+        st.warning(str(e))
+        return
+    except Exception as e:
+        st.error(f"Erro ao iniciar a geração dos documentos: {e}")
+        return
 
-        # Substituir os cabeçalhos por Paragraphs para consistência
-        data[0] = [Paragraph(cell, header_style) for cell in data[0]]
-
-        total_geral = 0  # Variável para somar o total geral
-
-        for item in itens_configurados:
-            # Pega a potência equivalente ou a original se a equivalente estiver vazia
-            potencia_item = item.get('Potência Equivalente') or item.get('Potência')
-            
-            # Verifica o tipo de dado e formata a potência
-            if isinstance(potencia_item, (int, float)):
-                potencia_str = f"{potencia_item:g} kVA"  # Formata a potência se for número
-            else:
-                potencia_str = f"{potencia_item} kVA"  # Se for string, apenas concatene com "kVA"
-            
-            # Mapeia o código de acordo com a potência
-            codigo_item = item.get('cod_proj_caixa')  
-
-            if item.get('IP') == "00": 
-                codigo_item="N/A"
-            # Calcula o preço total do item
-            preco_unitario = float(item.get('Preço Unitário', 0) or 0)
-            quantidade = float(item.get('Quantidade', 0) or 0)
-            preco_total_item = preco_unitario * quantidade
-            total_geral += preco_total_item
-            
-            codigo_custo = item.get('cod_proj_custo') 
-            # Formatar o preço total em reais
-            preco_total_str = numbers.format_currency(preco_total_item, 'BRL', locale='pt_BR')
-
-            # Formatar o preço unitário em reais
-            preco_unitario_str = numbers.format_currency(preco_unitario, 'BRL', locale='pt_BR')
-            data.append([
-                codigo_custo,
-                codigo_item,
-                Paragraph(item.get('Descrição', ''), table_cell_style),
-                str(item.get('Fator K', '')),
-                item.get('IP', ''),
-                str(quantidade),
-                f"R$ {preco_unitario_str}",  # Substitui vírgula por ponto
-                f"R$ {preco_total_str}", 
-            ])
-
-        # Definição de pesos para as colunas (ajustado para 6 colunas)
-        column_widths_weights = [
-            1.5,
-            1.5,  # 'Código'
-            2.5,    # 'Descrição'
-            0.5,  # 'Fator K'
-            0.5,  # 'IP'
-            0.5,  # 'Quantidade'
-            1.5,  # 'Preço Unitário'
-             1.5,  # 'Preço TOtal'
-        ]
-        total_weight = sum(column_widths_weights)
-        column_widths = [(available_width * (weight / total_weight)) for weight in column_widths_weights]
-
-        # Cria a tabela
-        tabela = Table(data, colWidths=column_widths, repeatRows=1)
-
-        # Estilo da tabela
-        table_style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#00543C')),
-            ('GRID', (0, 0), (-1, -2), 0.5, colors.black),
-            ('GRID', (0, -1), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            # Alinha à esquerda o texto da coluna 'Descrição'
-            ('ALIGN', (2, 1), (2, -1), 'LEFT')
-        ])
-
-        tabela.setStyle(table_style)
-
-        elements.append(Paragraph("<b>Itens Configurados</b>", styles['Heading2']))
-        elements.append(tabela)
-
-        # Adiciona a frase de total abaixo da tabela
-        elements.append(Paragraph(f"<b>Total: R$ {preco_total_str}</b>", styles['Heading2']))
-
-        # Construir o PDF
-        doc.build(elements)
-        buffer.seek(0)
-        return buffer
+    st.session_state['trabalhos_documentos'] = trabalhos
+    st.session_state['nomes_documentos'] = {'word': nome_arquivo_word(proposta), 'pdf': nome_arquivo_pdf(proposta)}
+    st.session_state['downloads_gerados'] = False
 
+# Função para arquivar os documentos no SharePoint: entram na caixa de saída e são enviados em segundo plano
+def arquivar_documentos(conteudos):
+    try:
+        obter_arquivamento().enfileirar(conteudos)
     except Exception as e:
-        st.error(f"Erro ao gerar o PDF: {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return None
+        st.warning(f"Os documentos não puderam ser guardados para arquivamento no SharePoint: {e}")
+        return
+    st.caption("Os documentos serão arquivados no SharePoint em segundo plano.")
+
+# Função para acompanhar a geração da sessão e guardar os arquivos quando ficarem prontos
+def acompanhar_geracao_documentos():
+    servico = obter_servico_renderizacao()
+    trabalhos = st.session_state['trabalhos_documentos']
+    painel = st.empty()
+
+    while True:
+        estados = {tipo: servico.obter(id_trabalho) for tipo, id_trabalho in trabalhos.items()}
+        if any(trabalho is None for trabalho in estados.values()):
+            # Resultado descartado (expirado ou servidor reiniciado)
+            del st.session_state['trabalhos_documentos']
+            painel.error("A geração dos documentos foi perdida. Clique em Confirmar novamente.")
+            return
+
+        terminados = sum(trabalho.status in ('concluido', 'erro') for trabalho in estados.values())
+        with painel.container():
+            st.progress(terminados / len(estados), text=f"Gerando documentos ({terminados}/{len(estados)})")
+            for tipo, trabalho in estados.items():
+                linha = f"{ROTULOS_DOCUMENTO[tipo]}: {DESCRICAO_STATUS[trabalho.status]} ({trabalho.tempo_decorrido():.1f} s)"
+                posicao = servico.posicao_na_fila(trabalho.id)
+                if posicao:
+                    linha += f" - posição {posicao} na fila"
+                st.write(linha)
+
+        if terminados == len(estados):
+            break
+        time.sleep(0.3)
+
+    painel.empty()
+    del st.session_state['trabalhos_documentos']
+
+    # Os documentos novos substituem os gerados antes nesta sessão
+    armazem = obter_armazem_artefatos()
+    armazem.remover_sessao(id_sessao())
+    st.session_state.pop('artefatos_documentos', None)
+    st.session_state['downloads_gerados'] = False
+
+    # Grava cada documento em disco assim que é coletado; a sessão guarda só a referência
+    nomes = st.session_state['nomes_documentos']
+    artefatos = {}
+    conteudos = {}
+    for tipo, trabalho in estados.items():
+        try:
+            conteudos[nomes[tipo]] = servico.coletar(trabalho.id)
+            artefatos[tipo] = armazem.guardar(id_sessao(), nomes[tipo], conteudos[nomes[tipo]], MIME_DOCUMENTO[tipo])
+        except Exception as e:
+            st.error(f"Erro ao gerar o {ROTULOS_DOCUMENTO[tipo]}: {e}")
+            if trabalho.erro():
+                st.error(trabalho.erro())
+
+    if len(artefatos) == len(estados):
+        st.success("Documentos gerados com sucesso.")
+        st.session_state['artefatos_documentos'] = artefatos
+        st.session_state['downloads_gerados'] = True
+        arquivar_documentos(conteudos)
+    else:
+        st.error("Erro ao gerar os documentos.")
 
 
 # Página para gerar o documento
@@ -322,21 +175,10 @@ def pagina_gerar_documento():
     st.write(f"**F.pobreza:** {st.session_state['f_pobreza']:.2f}%")
     st.write(f"**Local Frete:** {st.session_state['local_frete_itens']}")
 
-    # Adicionar informação de percentual considerado para cada item
-    itens_configurados = st.session_state.get('itens_configurados', [])
-    voltage_class_percentage = {
-        "15 kV": 0,
-        "24 kV": 30,
-        "36 kV": 50
-    }
-    for idx, item in enumerate(itens_configurados, start=1):
-        classe_tensao = item.get('classe_tensao', '')
-        percentual_considerado = voltage_class_percentage.get(classe_tensao, 'Não especificado')
-        # Ajustar o percentual_considerado com base no valor do IP
-        if item.get('IP') == "00":
-            percentual_considerado = 0
-        
-        st.write(f"**% Caixa Item {idx}:** {percentual_considerado}%")
+    # Percentual de caixa de cada item, pela mesma visão da proposta usada nos documentos
+    visao = montar_visao(montar_proposta(st.session_state))
+    for item in visao.itens:
+        st.write(f"**% Caixa Item {item.numero}:** {item.percentual_caixa_texto}")
 
     st.write("---")
 
@@ -359,55 +201,36 @@ def pagina_gerar_documento():
     # Botão para Confirmar e gerar documentos
     if st.button('Confirmar', disabled=not dados_completos):
         if dados_completos:
-            # Gerar o documento Word
-            buffer_word, output_filename_word = gerar_documento_word()
-
-            # Gerar o PDF
-            buffer_pdf = gerar_pdf()
-
-            if buffer_word and buffer_pdf:
-                st.success("Documentos gerados com sucesso.")
-
-                # Armazenar os buffers e nomes dos arquivos no session_state
-                st.session_state['buffer_word'] = buffer_word
-                st.session_state['output_filename_word'] = output_filename_word
-                st.session_state['buffer_pdf'] = buffer_pdf
-                st.session_state['pdf_filename'] = f"Resumo_Proposta_BT_{st.session_state['dados_iniciais']['bt']}-Rev{st.session_state['dados_iniciais']['rev']}_EXTRATO.pdf"
-                st.session_state['downloads_gerados'] = True
-
-            else:
-                st.error("Erro ao gerar os documentos.")
+            iniciar_geracao_documentos()
         else:
             st.error("Por favor, preencha todos os campos obrigatórios antes de gerar os documentos.")
 
-    # Exibir os botões de download se os documentos foram gerados
+    # Acompanhar a geração em andamento (continua de onde parou se a página for recarregada)
+    if 'trabalhos_documentos' in st.session_state:
+        acompanhar_geracao_documentos()
+
+    # Exibir os botões de download se os documentos foram gerados e ainda estão guardados
+    armazem = obter_armazem_artefatos()
+    artefatos = st.session_state.get('artefatos_documentos', {})
+    if st.session_state.get('downloads_gerados') and not all(armazem.existe(artefato) for artefato in artefatos.values()):
+        st.session_state['downloads_gerados'] = False
+        st.info("Os documentos gerados expiraram. Clique em Confirmar para gerá-los novamente.")
+
     if st.session_state.get('downloads_gerados'):
         st.markdown("### Documentos Gerados:")
-        # Documento Word
-        col1, col2 = st.columns([6,1])
-        with col1:
-            output_filename_word = st.session_state.get('output_filename_word', 'Documento Word')
-            st.write(f"📄 {output_filename_word}")
-        with col2:
-            st.download_button(
-                label="⬇️",
-                data=st.session_state.get('buffer_word'),
-                file_name=output_filename_word,
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            )
-
-        # Documento PDF
-        col1, col2 = st.columns([6,1])
-        with col1:
-            pdf_filename = st.session_state.get('pdf_filename', 'Documento PDF')
-            st.write(f"📄 {pdf_filename}")
-        with col2:
-            st.download_button(
-                label="⬇️",
-                data=st.session_state.get('buffer_pdf'),
-                file_name=pdf_filename,
-                mime="application/pdf"
-            )
+        for tipo, artefato in artefatos.items():
+            col1, col2 = st.columns([6,1])
+            with col1:
+                st.write(f"📄 {artefato.nome_arquivo}")
+            with col2:
+                # O arquivo só é lido do disco quando o usuário clica para baixar
+                st.download_button(
+                    label="⬇️",
+                    data=lambda artefato=artefato: armazem.ler(artefato) or b'',
+                    file_name=artefato.nome_arquivo,
+                    mime=artefato.mime,
+                    key=f"download_{tipo}",
+                )
     else:
         st.warning("Aperte no botão acima para gerar os documentos.")
 
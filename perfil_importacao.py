@@ -0,0 +1,74 @@
+import argparse
+import ast
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+PASTA_APLICACAO = os.path.dirname(os.path.abspath(__file__))
+# Páginas medidas por padrão: o custo de cada uma é o das importações do topo do arquivo
+PAGINAS = ['Home.py', 'pages/Inicial.py', 'pages/Itens.py', 'pages/Resumo.py']
+
+
+# Função para listar os módulos importados no nível do arquivo (fora de funções e blocos condicionais)
+def importacoes_do_arquivo(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        arvore = ast.parse(arquivo.read(), filename=caminho)
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos.extend(alias.name for alias in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            modulos.append(no.module)
+    return list(dict.fromkeys(modulos))
+
+
+# Função para medir a importação dos módulos num interpretador novo (python -X importtime), depois do
+# streamlit, que o servidor já carregou antes de rodar qualquer página; devolve {pacote: microssegundos}
+def medir_importacoes(modulos):
+    codigo = 'import streamlit\n' + ''.join(f'import {modulo}\n' for modulo in modulos)
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=PASTA_APLICACAO, capture_output=True, text=True,
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+
+    por_pacote = defaultdict(int)
+    depois_do_streamlit = False
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, _, nome = linha[len('import time:'):].split('|')
+        # As linhas saem na ordem em que as importações terminam: a do streamlit fecha tudo o que ele carregou
+        if not depois_do_streamlit:
+            depois_do_streamlit = nome.strip() == 'streamlit' and not nome[:nome.index('streamlit')].strip(' ')
+            continue
+        por_pacote[nome.strip().split('.')[0]] += int(proprio)
+    return dict(por_pacote)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação de cada página no início do servidor.")
+    parser.add_argument('arquivos', nargs='*', default=PAGINAS, help="Páginas ou módulos (.py) a medir")
+    parser.add_argument('--modulos', nargs='+', help="Mede estes módulos em vez das páginas")
+    parser.add_argument('--maiores', type=int, default=8, help="Pacotes mais lentos listados por página")
+    args = parser.parse_args()
+
+    medicoes = {'módulos informados': args.modulos} if args.modulos else {
+        arquivo: importacoes_do_arquivo(os.path.join(PASTA_APLICACAO, arquivo)) for arquivo in args.arquivos
+    }
+    for nome, modulos in medicoes.items():
+        try:
+            por_pacote = medir_importacoes(modulos)
+        except RuntimeError as e:
+            print(f"{nome}: erro ao importar ({e})")
+            continue
+        print(f"{nome}: {sum(por_pacote.values()) / 1000:.0f} ms além do streamlit")
+        for pacote, tempo in sorted(por_pacote.items(), key=lambda item: item[1], reverse=True)[:args.maiores]:
+            print(f"  {pacote:<24} {tempo / 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import numpy as np
+
+# Percentuais fixos que compõem o preço (mesmos valores usados desde a página de Itens)
+icms_base = 12 / 100
+irpj_cssl = 2.28 / 100
+tkxadmmkt = 3.7 / 100
+mocusfixo = 20 / 100
+pisconfins = 9.25 / 100
+p_caixa_24 = 30 / 100
+p_caixa_36 = 50 / 100
+percentuais_k = {
+    1: 0.0,
+    4: 0.0502,
+    6: 0.0917,
+    13: 0.2317,
+    20: 0.3359
+}
+NBI_POR_CLASSE = {
+    "15 kV": '95kV',
+    "24 kV": '125kV',
+    "36 kV": '150kV'
+}
+
+# Tensão primária e derivações sugeridas para cada classe de tensão
+TENSOES_PADRAO = {
+    "15 kV": ("13,8", "13,8/13,2/12,6/12,0/11,4kV"),
+    "24 kV": ("23,1", "23,1/22,0/20kV"),
+    "36 kV": ("34,5", "+/- 2x2,5%"),
+}
+
+# Colunas da linha do catálogo usadas no cálculo do preço
+COLUNAS_PRECO = ['preco', 'p_trafo', 'potencia', 'valor_ip_baixo', 'valor_ip_alto', 'p_caixa', 'classe_tensao']
+
+# Percentuais comerciais digitados na página de Itens (mesmas chaves do session_state)
+CHAVES_PARAMETROS = ['lucro', 'icms', 'frete', 'comissao', 'difal', 'f_pobreza']
+
+
+# Função para separar os percentuais comerciais de um dicionário (ex.: st.session_state)
+def parametros_comerciais(origem):
+    return {chave: float(origem.get(chave, 0.0) or 0.0) for chave in CHAVES_PARAMETROS}
+
+
+# Soma dos percentuais aplicados sobre o preço base (na mesma ordem da fórmula original)
+def calcular_percentuais(lucro, comissao, frete):
+    return (lucro / 100) + (icms_base) + (comissao / 100) + (frete / 100) + irpj_cssl + tkxadmmkt + mocusfixo + pisconfins
+
+
+# Função para calcular a potência equivalente bruta para fatores K maiores que 5
+def potencia_equivalente_bruta(potencia, fator_k):
+    fator_k = np.asarray(fator_k, dtype=np.int64)
+    return np.asarray(potencia, dtype=float) / (
+        (-0.000000391396 * fator_k**6) +
+        (0.000044437349 * fator_k**5) -
+        (0.001966117106 * fator_k**4) +
+        (0.040938237195 * fator_k**3) -
+        (0.345600795014 * fator_k**2) -
+        (1.369407483908 * fator_k) +
+        101.826204136368
+    ) / 100 * 10000
+
+
+# Aplica a função uma vez por valor distinto (poucos: IPs, fatores K, classes) e espalha o resultado
+def _mapear(valores, funcao, dtype):
+    valores = np.asarray(valores)
+    if valores.dtype == object:
+        valores = valores.astype(str)
+    distintos, inverso = np.unique(valores, return_inverse=True)
+    return np.array([funcao(valor) for valor in distintos], dtype=dtype)[inverso.reshape(-1)]
+
+
+# Função para montar a tabela de potências do catálogo usada no arredondamento da potência equivalente.
+# Para cada potência vale a primeira linha do catálogo, como no filtro df[df['potencia'] == p].iloc[0]
+def montar_tabela_potencias(linhas):
+    primeiras = {}
+    for linha in linhas:
+        primeiras.setdefault(linha['potencia'], linha)
+    potencias = sorted(primeiras)
+    return {
+        'potencia': np.array(potencias, dtype=float),
+        'valor_ip_baixo': np.array([primeiras[p]['valor_ip_baixo'] for p in potencias], dtype=float),
+        'valor_ip_alto': np.array([primeiras[p]['valor_ip_alto'] for p in potencias], dtype=float),
+        'p_caixa': np.array([primeiras[p]['p_caixa'] for p in potencias], dtype=float),
+    }
+
+
+# Função para montar a entrada de calcular_precos a partir das linhas do catálogo e das escolhas de cada item
+def montar_entrada(linhas, fatores_k, ips):
+    entrada = {coluna: [linha[coluna] for linha in linhas] for coluna in COLUNAS_PRECO}
+    entrada['fator_k'] = list(fatores_k)
+    entrada['ip'] = list(ips)
+    return entrada
+
+
+# Função para calcular o preço unitário e os componentes de N itens de uma vez.
+# 'itens' é um dicionário (ou DataFrame) com os arrays: preco, p_trafo, potencia, valor_ip_baixo,
+# valor_ip_alto, p_caixa e classe_tensao (da linha do catálogo), fator_k e ip (escolhidos pelo usuário).
+def calcular_precos(itens, tabela_potencias, parametros):
+    preco = np.asarray(itens['preco'], dtype=float)
+    p_trafo = np.asarray(itens['p_trafo'], dtype=float)
+    potencia = np.asarray(itens['potencia'], dtype=float)
+    classe_tensao = np.asarray(itens['classe_tensao'], dtype=object)
+    fator_k = np.asarray(itens['fator_k'], dtype=np.int64)
+    ip = np.asarray(itens['ip'], dtype=object)
+
+    percentuais = calcular_percentuais(parametros['lucro'], parametros['comissao'], parametros['frete'])
+    preco_base1 = preco / (1 - p_trafo - percentuais)
+
+    # Fator K maior que 5: arredonda a potência equivalente para cima entre as potências do catálogo
+    # e usa os valores de IP e caixa dessa potência; caso contrário, os valores do próprio item
+    usa_equivalente = fator_k > 5
+    potencias = tabela_potencias['potencia']
+    posicao = np.searchsorted(potencias, potencia_equivalente_bruta(potencia, fator_k), side='left')
+    posicao = np.minimum(posicao, len(potencias) - 1)
+    potencia_equivalente = np.where(usa_equivalente, potencias[posicao], np.nan)
+
+    valor_ip_baixo = np.where(usa_equivalente, tabela_potencias['valor_ip_baixo'][posicao], np.asarray(itens['valor_ip_baixo'], dtype=float))
+    valor_ip_alto = np.where(usa_equivalente, tabela_potencias['valor_ip_alto'][posicao], np.asarray(itens['valor_ip_alto'], dtype=float))
+    p_caixa = np.where(usa_equivalente, tabela_potencias['p_caixa'][posicao], np.asarray(itens['p_caixa'], dtype=float))
+
+    # Adicional de IP: nenhum para IP 00, valor baixo abaixo de IP 54 e valor alto a partir dele
+    ip_numerico = _mapear(ip, int, np.int64)
+    valor_ip = np.where(ip_numerico < 54, valor_ip_baixo, valor_ip_alto)
+    adicional_ip = np.where(ip_numerico == 0, 0.0, valor_ip / (1 - percentuais - p_caixa))
+
+    adicional_caixa_classe = np.select(
+        [classe_tensao == "24 kV", classe_tensao == "36 kV"],
+        [p_caixa_24 * adicional_ip, p_caixa_36 * adicional_ip],
+        default=0.0
+    )
+
+    # Fatores K fora da tabela (ex.: 8) não têm adicional
+    tem_percentual_k = _mapear(fator_k, lambda k: int(k) in percentuais_k, bool)
+    percentual_k = _mapear(fator_k, lambda k: percentuais_k.get(int(k), 0.0), float)
+    adicional_k = np.where(tem_percentual_k, preco_base1 * percentual_k, 0.0)
+
+    divisor = (1 - (parametros['difal'] / 100) - (parametros['f_pobreza'] / 100) - (parametros['icms'] / 100))
+    preco_bruto = ((preco_base1 + adicional_ip + adicional_k + adicional_caixa_classe) * (1 - 0.12)) / divisor
+
+    # NaN ou infinito (ex.: valor em branco no catálogo, percentuais que zeram o divisor) viraria um inteiro
+    # sem sentido no astype; o int() da fórmula original também recusava esses valores
+    invalidos = np.flatnonzero(~np.isfinite(preco_bruto))
+    if invalidos.size:
+        raise ValueError(
+            "Não foi possível calcular o preço (valor em branco ou divisão por zero) dos itens: "
+            + ', '.join(str(posicao + 1) for posicao in invalidos[:10])
+            + (f" e mais {invalidos.size - 10}" if invalidos.size > 10 else "")
+        )
+    # Trunca em direção a zero, como o int() da fórmula original
+    preco_unitario = np.trunc(preco_bruto)
+
+    return {
+        'preco_base1': preco_base1,
+        'potencia_equivalente': potencia_equivalente,
+        'adicional_ip': adicional_ip,
+        'adicional_k': adicional_k,
+        'adicional_caixa_classe': adicional_caixa_classe,
+        'preco_unitario': preco_unitario.astype(np.int64),
+        'nbi': _mapear(classe_tensao, lambda classe: NBI_POR_CLASSE.get(classe, '0'), object),
+    }
+
+
+# Função para precificar itens configurados (dicionários no formato da página de Itens) a partir das
+# linhas do catálogo escolhidas para cada um; grava preço unitário, total e potência equivalente nos itens
+def precificar_itens(itens, linhas, tabela_potencias, parametros):
+    precos = calcular_precos(
+        montar_entrada(linhas, [item['Fator K'] for item in itens], [item['IP'] for item in itens]),
+        tabela_potencias,
+        parametros
+    )
+
+    for posicao, item in enumerate(itens):
+        # Potência equivalente (arredondada para cima no catálogo) só existe para Fator K maior que 5
+        if item['Fator K'] > 5:
+            item['Potência Equivalente'] = float(precos['potencia_equivalente'][posicao])
+
+        preco_unitario = int(precos['preco_unitario'][posicao])
+        item['Preço Unitário'] = preco_unitario
+        item['Preço Total'] = preco_unitario * item['Quantidade']
+
+    return precos
@@ -0,0 +1,255 @@
+import copy
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from cache_documentos import CacheDocumentos, impressao_digital
+from visao_proposta import montar_visao
+
+# Processos que geram documentos (compartilhados por todas as sessões do servidor).
+# Com RENDER_WORKERS=0 a geração roda em threads do próprio processo (útil em desenvolvimento).
+TRABALHADORES = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Máximo de trabalhos aguardando ou em execução; acima disso novos pedidos são recusados
+FILA_MAXIMA = int(os.getenv("RENDER_FILA_MAX", str(max(TRABALHADORES, 1) * 4)))
+# Tempo (s) que um resultado não coletado fica guardado antes de ser descartado
+RESULTADO_TTL = 900
+
+TIPOS_PROPOSTA = ['word', 'pdf']
+
+
+class FilaCheia(Exception):
+    pass
+
+
+# Templates já interpretados neste processo, pelo hash do conteúdo do arquivo
+_templates = {}
+
+
+def _template_no_processo(caminho_template):
+    from docx import Document
+    with open(caminho_template, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    chave = hashlib.sha256(conteudo).hexdigest()
+    if chave not in _templates:
+        _templates.clear()  # só interessa a versão atual do template
+        _templates[chave] = Document(BytesIO(conteudo))
+    return copy.deepcopy(_templates[chave])
+
+
+# Funções executadas nos processos de geração (também usadas pelo lote_propostas.py):
+# recebem a visão da proposta (montar_visao) e devolvem os bytes do arquivo. Os geradores (python-docx e
+# reportlab) só são importados aqui, nos processos de geração; o servidor não precisa deles para abrir as páginas.
+def renderizar_word(visao, caminho_template):
+    import documentos
+    return documentos.gerar_word(visao, _template_no_processo(caminho_template)).getvalue()
+
+
+def renderizar_pdf(visao):
+    import documentos
+    return documentos.gerar_pdf(visao).getvalue()
+
+
+# Executada ao iniciar cada processo de geração: importa os geradores antes do primeiro documento
+def preparar_processo():
+    import documentos  # carrega o python-docx e o reportlab
+
+
+# Um trabalho de geração de documento e o seu estado
+class Trabalho:
+    def __init__(self, tipo, future, do_cache=False):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.future = future
+        self.do_cache = do_cache
+        self.criado_em = time.monotonic()
+        self.concluido_em = self.criado_em if do_cache else None
+
+    # No pool de processos, running() já é verdadeiro quando o trabalho entra na fila interna de envio
+    # aos processos, que guarda até trabalhadores + 1 chamadas: com todos os processos ocupados, um
+    # trabalho ainda não iniciado pode aparecer como 'processando'. 'na_fila' é o que está antes disso.
+    @property
+    def status(self):
+        if self.future.done():
+            return 'erro' if self.future.exception() is not None else 'concluido'
+        if self.future.running():
+            return 'processando'
+        return 'na_fila'
+
+    def tempo_decorrido(self):
+        return (self.concluido_em or time.monotonic()) - self.criado_em
+
+    def erro(self):
+        excecao = self.future.exception() if self.future.done() else None
+        if excecao is None:
+            return None
+        return ''.join(traceback.format_exception(type(excecao), excecao, excecao.__traceback__))
+
+
+# Pool de processos limitado com fila também limitada (recusa pedidos quando cheia)
+class ServicoRenderizacao:
+    def __init__(self, trabalhadores=TRABALHADORES, fila_maxima=FILA_MAXIMA, cache=None):
+        self.trabalhadores = trabalhadores
+        self.fila_maxima = fila_maxima
+        self.cache = cache if cache is not None else CacheDocumentos()
+        self._vagas = threading.BoundedSemaphore(fila_maxima)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._trabalhos = OrderedDict()
+        self.estatisticas = {'enviados': 0, 'concluidos': 0, 'erros': 0, 'recusados': 0}
+
+    # Chamada sempre com self._lock: dois pedidos ao mesmo tempo não podem criar dois pools
+    def _obter_executor(self):
+        if self._executor is None:
+            if self.trabalhadores > 0:
+                # 'spawn': o servidor do Streamlit tem várias threads, e fork com threads pode travar
+                contexto = multiprocessing.get_context(os.getenv("RENDER_START_METHOD", "spawn"))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.trabalhadores, mp_context=contexto, initializer=preparar_processo
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="renderizacao")
+        return self._executor
+
+    # Inicia todos os processos de geração já com os geradores importados (aquecimento do servidor)
+    def aquecer(self):
+        with self._lock:
+            executor = self._obter_executor()
+        for future in [executor.submit(preparar_processo) for _ in range(max(self.trabalhadores, 1))]:
+            future.result()
+
+    def _finalizar(self, trabalho, chave_cache):
+        trabalho.concluido_em = time.monotonic()
+        self._vagas.release()
+        sucesso = trabalho.future.exception() is None
+        if sucesso and chave_cache is not None:
+            self.cache.guardar(chave_cache, trabalho.future.result())
+        with self._lock:
+            self.estatisticas['concluidos' if sucesso else 'erros'] += 1
+
+    def _descartar_antigos(self):
+        agora = time.monotonic()
+        for id_trabalho, trabalho in list(self._trabalhos.items()):
+            if trabalho.concluido_em is not None and agora - trabalho.concluido_em > RESULTADO_TTL:
+                del self._trabalhos[id_trabalho]
+
+    def _submeter(self, tipo, chave_cache, funcao, *argumentos):
+        with self._lock:
+            try:
+                future = self._obter_executor().submit(funcao, *argumentos)
+            except BrokenProcessPool:
+                # Um processo de geração morreu: encerra o pool quebrado (sem esperar, cancelando o que
+                # ficou na fila) para não deixar processos e threads para trás, recria e tenta uma vez mais
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                future = self._obter_executor().submit(funcao, *argumentos)
+            trabalho = Trabalho(tipo, future)
+            self._trabalhos[trabalho.id] = trabalho
+            self.estatisticas['enviados'] += 1
+            self._descartar_antigos()
+        future.add_done_callback(lambda _: self._finalizar(trabalho, chave_cache))
+        return trabalho.id
+
+    # Registra como concluído um documento encontrado no cache, sem ocupar a fila
+    def _registrar_pronto(self, tipo, conteudo):
+        future = Future()
+        future.set_result(conteudo)
+        trabalho = Trabalho(tipo, future, do_cache=True)
+        with self._lock:
+            self._trabalhos[trabalho.id] = trabalho
+            self._descartar_antigos()
+        return trabalho.id
+
+    # Reserva as vagas de todos os trabalhos de um pedido, ou de nenhum
+    def _reservar(self, quantidade):
+        if quantidade == 0:
+            return
+        reservadas = 0
+        while reservadas < quantidade and self._vagas.acquire(blocking=False):
+            reservadas += 1
+        if reservadas < quantidade:
+            for _ in range(reservadas):
+                self._vagas.release()
+            with self._lock:
+                self.estatisticas['recusados'] += 1
+            raise FilaCheia(
+                f"Há {self.fila_maxima} documentos em geração no servidor. Tente novamente em alguns instantes."
+            )
+
+    # Envia o Word e o PDF de uma proposta, que são gerados em paralelo; devolve {tipo: id do trabalho}.
+    # Com a versão do template, documentos já gerados para as mesmas entradas vêm do cache.
+    def enviar_proposta(self, proposta, caminho_template, versao_template=None):
+        chaves = {tipo: None for tipo in TIPOS_PROPOSTA}
+        prontos = {}
+        if versao_template is not None:
+            digital = impressao_digital(proposta, versao_template)
+            for tipo in TIPOS_PROPOSTA:
+                chaves[tipo] = (digital, tipo)
+                conteudo = self.cache.obter(chaves[tipo])
+                if conteudo is not None:
+                    prontos[tipo] = conteudo
+
+        faltando = [tipo for tipo in TIPOS_PROPOSTA if tipo not in prontos]
+        # A visão é montada uma única vez e enviada aos dois documentos
+        visao = montar_visao(proposta) if faltando else None
+        self._reservar(len(faltando))
+        ids = {tipo: self._registrar_pronto(tipo, conteudo) for tipo, conteudo in prontos.items()}
+        try:
+            if 'word' in faltando:
+                ids['word'] = self._submeter('word', chaves['word'], renderizar_word, visao, caminho_template)
+            if 'pdf' in faltando:
+                ids['pdf'] = self._submeter('pdf', chaves['pdf'], renderizar_pdf, visao)
+        except Exception:
+            # Devolve as vagas dos trabalhos que não chegaram a ser enviados
+            for _ in range(len(TIPOS_PROPOSTA) - len(ids)):
+                self._vagas.release()
+            raise
+        return {tipo: ids[tipo] for tipo in TIPOS_PROPOSTA}
+
+    def obter(self, id_trabalho):
+        with self._lock:
+            return self._trabalhos.get(id_trabalho)
+
+    # Posição do trabalho entre os que ainda não começaram (0 se já começou ou terminou)
+    def posicao_na_fila(self, id_trabalho):
+        with self._lock:
+            aguardando = [trabalho.id for trabalho in self._trabalhos.values() if trabalho.status == 'na_fila']
+        return aguardando.index(id_trabalho) + 1 if id_trabalho in aguardando else 0
+
+    # Devolve o conteúdo gerado (bytes) e esquece o trabalho
+    def coletar(self, id_trabalho):
+        with self._lock:
+            trabalho = self._trabalhos.pop(id_trabalho)
+        return trabalho.future.result()
+
+    def resumo(self):
+        with self._lock:
+            status = [trabalho.status for trabalho in self._trabalhos.values()]
+            return {
+                'trabalhadores': self.trabalhadores,
+                'fila_maxima': self.fila_maxima,
+                'na_fila': status.count('na_fila'),
+                'processando': status.count('processando'),
+                **self.estatisticas,
+                'cache': self.cache.resumo(),
+            }
+
+
+_servico = None
+_lock_servico = threading.Lock()
+
+
+# Função para obter o serviço de geração compartilhado pelo processo do servidor
+def obter_servico_renderizacao():
+    global _servico
+    if _servico is None:
+        with _lock_servico:
+            if _servico is None:
+                _servico = ServicoRenderizacao()
+    return _servico
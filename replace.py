@@ -1,173 +1,142 @@
-from docx.shared import Pt, RGBColor, Cm
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-from docx import Document
-from docx.enum.text import WD_ALIGN_PARAGRAPH 
-import math
+from docx.shared import Cm, Emu
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn, nsdecls
+import bisect
+import re
+from xml.sax.saxutils import escape
 from docx.enum.table import WD_TABLE_ALIGNMENT
 
 
-
-# Função para definir a altura de uma linha
-def set_row_height(row, height_cm):
-    tr = row._tr
-    trHeight = OxmlElement('w:trHeight')
-    trHeight.set(qn('w:val'), str(int(height_cm * 567)))  # Multiplicando por 567 para converter cm para twips
-    trHeight.set(qn('w:hRule'), 'exact')  # Define altura exata
-    tr.append(trHeight)
-
-# Função para aplicar largura exata a uma célula
-def set_column_widths(table, col_widths):
-    for row in table.rows:
-        for idx, width in enumerate(col_widths):
-            row.cells[idx].width = width
-
-# Função para aplicar formatação a um parágrafo
-def apply_paragraph_formatting(paragraph, alignment='center', space_before=Pt(5), space_after=Pt(0)):
-    paragraph_format = paragraph.paragraph_format
-    paragraph_format.space_before = space_before
-    paragraph_format.space_after = space_after
-    paragraph_format.line_spacing = 1  # Espaçamento simples
-    paragraph.alignment = {'left': 0, 'center': 1, 'right': 2}.get(alignment, 1)
-
-# Função para aplicar sombreamento a uma célula
-def set_cell_shading(cell, color):
-    tc_pr = cell._element.get_or_add_tcPr()
-    shd = OxmlElement('w:shd')
-    shd.set(qn('w:val'), 'clear')
-    shd.set(qn('w:color'), 'auto')
-    shd.set(qn('w:fill'), color)
-    tc_pr.append(shd)
-
-# Função para adicionar bordas duplas a uma célula
-def add_double_borders(cell):
-    tc = cell._element
-    tcPr = tc.get_or_add_tcPr()
-    tcBorders = OxmlElement('w:tcBorders')
-    for border_name in ['top', 'left', 'bottom', 'right']:
-        border = OxmlElement(f'w:{border_name}')
-        border.set(qn('w:val'), 'double')  # Bordas duplas
-        border.set(qn('w:sz'), '4')
-        border.set(qn('w:space'), '0')
-        border.set(qn('w:color'), '000000')
-        tcBorders.append(border)
-    tcPr.append(tcBorders)
-
-# Função para determinar a eficiência com base nas perdas
-def determinar_eficiencia(perdas):
-    if perdas == '5356-D':
-        return "D"
-    elif perdas == '5356-A':
-        return "A"
-    elif perdas == '1,2 %':
-        return "1,2%"
-    elif perdas == '1,0 %':
-        return "1%"
-    else:
-        return "N/A"  # Valor padrão se não for encontrado
-
-# Função para criar a tabela do Quadro de Preços
-def create_custom_table(doc, itens_configurados, observacao):
-    num_linhas = len(itens_configurados) + 2  # Uma linha para cada item + cabeçalho + total
-    table = doc.add_table(rows=num_linhas, cols=10)  # Adicionando a coluna de IPI
+# Formatação das tabelas da proposta: cada trecho de XML é montado uma única vez e repetido em todas as células
+COR_CABECALHO = '00543C'  # Verde escuro
+BORDAS_DUPLAS_XML = '<w:tcBorders>' + ''.join(
+    f'<w:{lado} w:val="double" w:sz="4" w:space="0" w:color="000000"/>' for lado in ['top', 'left', 'bottom', 'right']
+) + '</w:tcBorders>'
+SOMBREAMENTO_XML = f'<w:shd w:val="clear" w:color="auto" w:fill="{COR_CABECALHO}"/>'
+
+
+# Propriedades de fonte de um run (equivalente a run.font.name, size, bold e color)
+def _fonte_xml(nome, tamanho, negrito=False, cor=None):
+    nome = escape(nome, {'"': '&quot;'})
+    return (
+        f'<w:rPr><w:rFonts w:ascii="{nome}" w:hAnsi="{nome}"/>'
+        + ('<w:b/>' if negrito else '')
+        + (f'<w:color w:val="{cor}"/>' if cor else '')
+        + f'<w:sz w:val="{int(tamanho * 2)}"/></w:rPr>'
+    )
+
+
+# Propriedades de parágrafo equivalentes a apply_paragraph_formatting
+def _paragrafo_xml(alinhamento='center', space_before=5):
+    return (
+        f'<w:pPr><w:spacing w:before="{int(space_before * 20)}" w:after="0" w:line="240" w:lineRule="auto"/>'
+        f'<w:jc w:val="{alinhamento}"/></w:pPr>'
+    )
+
+
+FONTE_QUADRO = _fonte_xml('Calibri Light (Títulos)', 11)
+FONTE_QUADRO_DESTAQUE = _fonte_xml('Calibri Light (Títulos)', 11, negrito=True, cor='FFFFFF')
+FONTE_ESCOPO_CABECALHO = _fonte_xml('Calibri Light (T)', 11, negrito=True, cor='FFFFFF')
+FONTE_ESCOPO = _fonte_xml('Calibri Light (Título)', 10)
+FONTE_ESCOPO_NEGRITO = _fonte_xml('Calibri Light (Título)', 10, negrito=True)
+PARAGRAFO_CENTRO = _paragrafo_xml('center')
+PARAGRAFO_CENTRO_SEM_ESPACO = _paragrafo_xml('center', space_before=0)
+PARAGRAFO_ESQUERDA_SEM_ESPACO = _paragrafo_xml('left', space_before=0)
+PARAGRAFO_ESCOPO = '<w:pPr><w:spacing w:after="40"/><w:jc w:val="both"/></w:pPr>'
+
+
+# Função para gerar o XML de um run; tabulações e quebras de linha viram w:tab e w:br, como em run.text
+def _run_xml(texto, fonte=''):
+    conteudo = []
+    for trecho in re.split(r'(\t|\r|\n)', texto):
+        if trecho == '\t':
+            conteudo.append('<w:tab/>')
+        elif trecho in ('\r', '\n'):
+            conteudo.append('<w:br/>')
+        elif trecho:
+            preservar = ' xml:space="preserve"' if trecho != trecho.strip() else ''
+            conteudo.append(f'<w:t{preservar}>{escape(trecho)}</w:t>')
+    return f'<w:r>{fonte}{"".join(conteudo)}</w:r>'
+
+
+# Função para gerar o XML de uma célula com bordas duplas (e sombreamento, se pedido)
+def _celula_xml(largura, runs, paragrafo, sombreada=False, colunas=1):
+    return (
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{largura}"/>'
+        + (f'<w:gridSpan w:val="{colunas}"/>' if colunas > 1 else '')
+        + (SOMBREAMENTO_XML if sombreada else '')
+        + BORDAS_DUPLAS_XML
+        + f'</w:tcPr><w:p>{paragrafo}{runs}</w:p></w:tc>'
+    )
+
+
+# Função para gerar o XML de uma linha; a altura fica na mesma posição usada por set_row_height
+def _linha_xml(celulas, height_cm=None):
+    altura = f'<w:trHeight w:val="{int(height_cm * 567)}" w:hRule="exact"/>' if height_cm else ''
+    return f'<w:tr>{"".join(celulas)}{altura}</w:tr>'
+
+
+# Função para anexar todas as linhas à tabela de uma vez (um único parse do XML)
+def _anexar_linhas(table, linhas):
+    tbl = parse_xml(f'<w:tbl {nsdecls("w")}>{"".join(linhas)}</w:tbl>')
+    table._tbl.extend(list(tbl))
+
+
+# Função para criar a tabela do Quadro de Preços a partir da visão da proposta (visao_proposta.montar_visao)
+def create_custom_table(doc, visao, observacao):
+    table = doc.add_table(rows=0, cols=10)  # Adicionando a coluna de IPI
 
     # Ajustar o alinhamento da tabela para a esquerda
     table.alignment = WD_TABLE_ALIGNMENT.LEFT
 
-    # Definir a indentação esquerda da tabela como zero
-    table.left_indent = Cm(0)  # Adicionando a coluna de IPI
-
-    # Definir larguras fixas para as colunas
-    col_widths = [Cm(1.1), Cm(1.25), Cm(2.2), Cm(1.0), Cm(2.7), Cm(1.0), Cm(1.75), Cm(2.63), Cm(2.63), Cm(1.15)]
-
     # Desabilitar o ajuste automático
     table.autofit = False  # Desativa o autofit
 
-    # Aplicar largura das colunas
-    set_column_widths(table, col_widths)
+    # Larguras fixas das colunas (em twips, como gravadas em cada célula)
+    col_widths = [Cm(1.1), Cm(1.25), Cm(2.2), Cm(1.0), Cm(2.7), Cm(1.0), Cm(1.75), Cm(2.63), Cm(2.63), Cm(1.15)]
+    larguras = [largura.twips for largura in col_widths]
 
     # Cabeçalho
-    header_row = table.rows[0]
     header_data = ["Item", "Qtde", "Potência", "K", "Tensões", "IP", "Perda", "Preço Uni. R$", "Preço Total R$", "IPI"]
-    for idx, cell in enumerate(header_row.cells):
-        cell.text = header_data[idx]
-        paragraph = cell.paragraphs[0]
-        run = paragraph.runs[0]
-        run.font.name = 'Calibri Light (Títulos)'
-        run.font.size = Pt(11)
-        run.bold = True
-        run.font.color.rgb = RGBColor(255, 255, 255)  # Cor branca
-        apply_paragraph_formatting(paragraph, alignment='center')
-
-        # Adicionar sombreamento e bordas duplas
-        set_cell_shading(cell, '00543C')  # Cor verde escura
-        add_double_borders(cell)
-
-    set_row_height(header_row, 1)  # 1 cm de altura
-
-    # Preenchendo a tabela com os itens configurados
-    for idx, item in enumerate(itens_configurados, start=1):
-        row = table.rows[idx]
-        row.cells[0].text = str(idx)  # Número do item
-        row.cells[1].text = str(item["Quantidade"])  # Quantidade
-        row.cells[2].text = f"{item['Potência']:.1f}".replace('.', ',') + " kVA" if item["Potência"] % 1 != 0 else f"{int(item['Potência'])} kVA"
-        row.cells[3].text = str(item["Fator K"])  # Fator K
-        row.cells[4].text = f"{item['Tensão Primária']}kV /{item['Tensão Secundária']} V"  # Tensão
-        row.cells[5].text = str(item["IP"])  # IP
-        row.cells[6].text = str(item["Perdas"])  # Norma (antiga Perda)
-        row.cells[7].text = f"{item['Preço Unitário']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")  # Preço unitário
-        row.cells[8].text = f"{item['Preço Total']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")  # Preço total
-        row.cells[9].text = f"{item.get('IPI', '0')}%"  # IPI
-
-        # Definir a altura da linha como 1,0 cm
-        set_row_height(row, 1.0)
-
-        for cell in row.cells:
-            paragraph = cell.paragraphs[0]
-            run = paragraph.runs[0]
-            run.font.name = 'Calibri Light (Títulos)'
-            run.font.size = Pt(11)
-            apply_paragraph_formatting(paragraph, alignment='center')
-
-            # Adicionando bordas duplas para cada célula
-            add_double_borders(cell)
-
-    # Última linha - Valor Total
-    total_row = table.rows[-1]
-    total_row.cells[0].merge(total_row.cells[6])  # Mesclar células até "Norma"
-    total_row.cells[7].merge(total_row.cells[9])  # Mesclar as colunas Preço Uni., Preço Total e IPI
-    total_row.cells[0].text = "Valor Total do Fornecimento:"
-    total_row.cells[7].text = f"R$ {sum(item['Preço Total'] for item in itens_configurados):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-    # Definir altura da linha de total como 0,6 cm
-    set_row_height(total_row, 0.6)
-
-    # Adicionar bordas e formatação para a linha do valor total
-    for idx in [0, 7]:
-        paragraph = total_row.cells[idx].paragraphs[0]
-        run = paragraph.runs[0]
-        run.font.name = 'Calibri Light (Títulos)'
-        run.font.size = Pt(11)
-        run.bold = True
-        run.font.color.rgb = RGBColor(255, 255, 255)
-        apply_paragraph_formatting(paragraph, alignment='center', space_before=Pt(0))  # Espaçamento removido
-        set_cell_shading(total_row.cells[idx], '00543C')  # Cor de fundo verde escura
-        add_double_borders(total_row.cells[idx])
-
-    # Adicionando a linha de observação
-    obs_row = table.add_row()
-    obs_row.cells[0].merge(obs_row.cells[9])  # Mesclar todas as células da linha de observação
-    obs_cell = obs_row.cells[0]
-    obs_cell.text = f"Obs.: {observacao}"
-    obs_paragraph = obs_cell.paragraphs[0]
-    obs_run = obs_paragraph.runs[0]
-    obs_run.font.name = 'Calibri Light (Títulos)'
-    obs_run.font.size = Pt(11)
-    apply_paragraph_formatting(obs_paragraph, alignment='left', space_before=Pt(0))  # Espaçamento removido
-
-    # Adicionar bordas duplas à célula de observação
-    add_double_borders(obs_cell)
-
+    linhas = [_linha_xml([
+        _celula_xml(larguras[idx], _run_xml(texto, FONTE_QUADRO_DESTAQUE), PARAGRAFO_CENTRO, sombreada=True)
+        for idx, texto in enumerate(header_data)
+    ], height_cm=1)]  # 1 cm de altura
+
+    # Preenchendo a tabela com os itens configurados (linhas de 1,0 cm)
+    for item in visao.itens:
+        valores = [
+            str(item.numero),
+            str(item.quantidade),
+            item.potencia_texto,
+            str(item.fator_k),
+            item.tensoes_texto,
+            item.ip,
+            item.perdas,
+            item.preco_unitario_texto,
+            item.preco_total_texto,
+            item.ipi_texto,
+        ]
+        linhas.append(_linha_xml([
+            _celula_xml(larguras[coluna], _run_xml(texto, FONTE_QUADRO), PARAGRAFO_CENTRO)
+            for coluna, texto in enumerate(valores)
+        ], height_cm=1.0))
+
+    # Última linha - Valor Total (células mescladas até "Norma" e de Preço Uni. até IPI), com 0,6 cm
+    linhas.append(_linha_xml([
+        _celula_xml(sum(larguras[:7]), _run_xml("Valor Total do Fornecimento:", FONTE_QUADRO_DESTAQUE),
+                    PARAGRAFO_CENTRO_SEM_ESPACO, sombreada=True, colunas=7),
+        _celula_xml(sum(larguras[7:]), _run_xml(visao.total_moeda, FONTE_QUADRO_DESTAQUE),
+                    PARAGRAFO_CENTRO_SEM_ESPACO, sombreada=True, colunas=3),
+    ], height_cm=0.6))
+
+    # Linha de observação, mesclando todas as colunas da grade da tabela
+    largura_grade = Emu(sum(coluna.w for coluna in table._tbl.tblGrid.gridCol_lst)).twips
+    linhas.append(_linha_xml([
+        _celula_xml(largura_grade, _run_xml(f"Obs.: {observacao}", FONTE_QUADRO), PARAGRAFO_ESQUERDA_SEM_ESPACO, colunas=10)
+    ]))
+
+    _anexar_linhas(table, linhas)
     return table
 
 
@@ -184,186 +153,166 @@ def set_table_left_indent(table, indent):
         tbl_pr.append(tbl_indent_element)
 
 
-def create_custom_table_escopo(doc, itens_configurados):
-    table = doc.add_table(rows=len(itens_configurados) + 1, cols=2)  # Tabela com 2 colunas (Item e Escopo do Fornecimento)
+# Função para criar a tabela de Escopo de Fornecimento a partir da visão da proposta
+def create_custom_table_escopo(doc, visao):
+    table = doc.add_table(rows=0, cols=2)  # Tabela com 2 colunas (Item e Escopo do Fornecimento)
 
-    # Ajustar o alinhamento da tabela para a esquerda
+    # Ajustar o alinhamento da tabela para a esquerda, sem indentação
     table.alignment = WD_TABLE_ALIGNMENT.LEFT
-    
     set_table_left_indent(table, 0)
 
-    # Definir a indentação esquerda da tabela como zero
-    table.left_indent = Cm(0) # Tabela com 2 colunas (Item e Escopo do Fornecimento)
-
     # Desabilitar o ajuste automático
     table.autofit = False  # Desativa o autofit
 
-    # Definir larguras fixas para as colunas
-    col_widths = [Cm(1.5), Cm(15.0)]  # Ajuste as larguras das colunas para não exceder o tamanho total
-    set_column_widths(table, col_widths)
+    # Larguras fixas das colunas (não excedem o tamanho total)
+    larguras = [Cm(1.5).twips, Cm(15.0).twips]
 
-    # Cabeçalho
-    header_row = table.rows[0]
+    # Cabeçalho com 1 cm de altura
     header_data = ["Item", "Escopo do Fornecimento:"]
-
-    for idx, cell in enumerate(header_row.cells):
-        cell.text = header_data[idx]
-        paragraph = cell.paragraphs[0]
-        run = paragraph.runs[0]
-        run.font.name = 'Calibri Light (T)'
-        run.font.size = Pt(11)
-        run.bold = True
-        run.font.color.rgb = RGBColor(255, 255, 255)  # Cor branca
-        apply_paragraph_formatting(paragraph, alignment='center')
-
-        # Definindo altura do cabeçalho como 1 cm
-        set_row_height(header_row, 1)
-
-        # Adicionando bordas duplas e cor de fundo
-        set_cell_shading(cell, '00543C')  # Cor verde escura
-        add_double_borders(cell)
+    linhas = [_linha_xml([
+        _celula_xml(larguras[idx], _run_xml(texto, FONTE_ESCOPO_CABECALHO), PARAGRAFO_CENTRO, sombreada=True)
+        for idx, texto in enumerate(header_data)
+    ], height_cm=1)]
 
     # Preenchendo a tabela com os itens configurados
-    for idx, item in enumerate(itens_configurados, start=1):
-        row = table.rows[idx]
-
-        # Coluna "Item"
-        row.cells[0].text = str(idx)  # Número do item
-        apply_paragraph_formatting(row.cells[0].paragraphs[0], alignment='center')
-        add_double_borders(row.cells[0])
-
-        # Verificar se a chave 'Classe de Tensao' existe, senão usar um valor padrão ou ajustar a chave correta
-        classe_tensao = item.get('classe_tensao', 'N/A').replace('kV', '').strip()  # Remove 'kV'
-        tensao_secundaria = item.get('Tensão Secundária', 'N/A').replace('kV', '').strip()  # Tensão Secundária
-        eficiencia = determinar_eficiencia(item['Perdas'])
-        NBI = item.get('NBI', 'N/A')
-
-        potencia = item.get('Potência', 'N/A')
-        if isinstance(potencia, (int, float)):
-            if potencia % 1 == 0:  # Verifica se a parte decimal é 0
-                potencia_formatada = f"{int(potencia)} kVA"  # Converte para inteiro
-            else:
-                potencia_formatada = f"{potencia:.1f}".replace('.', ',') + " kVA"  # Formata com uma casa decimal e troca ponto por vírgula
-        else:
-            potencia_formatada = potencia 
-
-        # Pegando o valor da Tensão Secundária como texto e tentando convertê-lo para float
-        tensao_secundaria_str = item.get('Tensão Secundária', '0')
-
-        try:
-            # Tenta converter a tensão secundária para float
-            # Convertendo a tensão secundária para float
-            tensao_secundaria_float = float(tensao_secundaria_str)
-
-            # Cálculo correto da tensão secundária a partir da tensão de linha (usando sqrt(3))
-            raiz_tensao_secundaria = 1.73
-            tensao_calculada = tensao_secundaria_float / raiz_tensao_secundaria
-
-            # Forçando o arredondamento para cima (próximo número inteiro)
-            tensao_calculada_arredondada = round(tensao_calculada)  # Arredonda sempre para cima
-            tensao_secundaria_arredondada = round(tensao_secundaria_float)  # Arredonda sempre para cima
-
-            # Formata o texto com os dois valores arredondados
-            tensao_secundaria_texto = f"{tensao_secundaria_arredondada}/{tensao_calculada_arredondada}V"
-        
-        except ValueError:
-            # Se a conversão falhar, exibe apenas o valor original como texto e um aviso
-            tensao_secundaria_texto = f"{tensao_secundaria_str}V (valor inválido para cálculo)"
-
-        # Texto de escopo com negrito em palavras selecionadas
-        escopo_text = (
-            f"Transformador Trifásico **isolado a seco**, Classe de tensão **{classe_tensao}/1,1kV**, "
-            f"Marca e Fabricação Blutrafos, Potência: **{potencia_formatada}**, Fator: **K={item.get('Fator K', 'N/A')}**, "
-            f"Tensão **Primária**: **{item.get('Tensão Primária', 'N/A')}kV**, Derivações: **{item.get('Derivações', 'N/A')}**, "
-            f"Tensão **Secundária**: **{tensao_secundaria_texto}**, Grupo de Ligação: **Dyn-1**, "
-            f"Frequência: **60Hz**, NBI: **{NBI}**, Classe de Temperatura: F (155ºC), "
-            f"Elevação Temperatura média dos enrolamentos: **100ºC**, Materiais dos enrolamentos: **Alumínio**, "
-            f"Altitude de Instalação: **≤1000m**, Temperatura ambiente máxima: 40°C, "
-            f"Alta tensão Encapsulado em Resina Epóxi à Vácuo, Regime de Serviço: Contínuo, "
-            f"Tipo de Refrigeração: **AN** e Grau de Proteção: **IP-{item.get('IP', 'N/A')}**, "
-            f"Demais características cfe. Norma ABNT-NBR 5356/11 - Eficiência **“{eficiencia}”** e acessórios abaixo."
+    for item in visao.itens:
+        runs = ''.join(
+            _run_xml(parte, FONTE_ESCOPO_NEGRITO if negrito else FONTE_ESCOPO) for parte, negrito in item.escopo_partes
         )
+        linhas.append(_linha_xml([
+            _celula_xml(larguras[0], _run_xml(str(item.numero)), PARAGRAFO_CENTRO),  # Número do item
+            _celula_xml(larguras[1], runs, PARAGRAFO_ESCOPO),
+        ]))
 
-        # Configurar o parágrafo e aplicar negrito no texto configurado
-        escopo_paragraph = row.cells[1].paragraphs[0]
-        escopo_paragraph.text = ""  # Limpar o texto padrão
-        escopo_parts = escopo_text.split("**")  # Separar o texto nas partes que precisam de negrito
-
-        for i, part in enumerate(escopo_parts):
-            run = escopo_paragraph.add_run(part)
-            if i % 2 == 1:  # Partes ímpares serão negritadas
-                run.bold = True
-            run.font.name = 'Calibri Light (Título)'
-            run.font.size = Pt(10)
+    _anexar_linhas(table, linhas)
+    return table
 
-        # Aplicar formatação no parágrafo
-        escopo_paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY  # Alinhamento justificado
-        paragraph_format = escopo_paragraph.paragraph_format
-        paragraph_format.space_after = Pt(2)
 
-        # Bordas para a célula de escopo
-        add_double_borders(row.cells[1])
+W_P = qn('w:p')
+W_T = qn('w:t')
+W_TC = qn('w:tc')
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# Cabeçalhos e rodapés de cada seção que podem conter marcadores
+PARTES_SECAO = ['header', 'first_page_header', 'even_page_header', 'footer', 'first_page_footer', 'even_page_footer']
+
+
+# Função para listar os elementos de texto (w:t) de um parágrafo, sem entrar em parágrafos aninhados (caixas de texto)
+def _textos_paragrafo(p):
+    textos = []
+    for t in p.iter(W_T):
+        ancestral = t.getparent()
+        while ancestral is not None and ancestral.tag != W_P:
+            ancestral = ancestral.getparent()
+        if ancestral is p:
+            textos.append(t)
+    return textos
+
+
+def _definir_texto(t, texto):
+    t.text = texto
+    if texto != texto.strip():
+        t.set(XML_SPACE, 'preserve')
+
+
+# Função para remover um parágrafo (em uma célula de tabela, mantém um parágrafo vazio, obrigatório no Word)
+def _remover_paragrafo(p):
+    pai = p.getparent()
+    if pai is None:
+        return
+    if pai.tag == W_TC and len(pai.findall(W_P)) == 1:
+        for filho in list(p):
+            if filho.tag != qn('w:pPr'):
+                p.remove(filho)
+        return
+    pai.remove(p)
+
+
+# Função para substituir os marcadores de um parágrafo, inclusive os divididos em vários runs
+def _substituir_paragrafo(p, padrao, replacements, remover_ip):
+    textos = _textos_paragrafo(p)
+    if not textos:
+        return
+    conteudo = [t.text or '' for t in textos]
+    texto = ''.join(conteudo)
+    if '{' not in texto:
+        return
+
+    ocorrencias = list(padrao.finditer(texto))
+    if not ocorrencias:
+        return
+
+    # Regra especial: {{IP}} sem valor remove o parágrafo inteiro
+    if remover_ip and any(ocorrencia.group(0) == '{{IP}}' for ocorrencia in ocorrencias):
+        _remover_paragrafo(p)
+        return
+
+    # Posição inicial de cada w:t dentro do texto do parágrafo
+    inicios = []
+    posicao = 0
+    for parte in conteudo:
+        inicios.append(posicao)
+        posicao += len(parte)
+
+    # Da última para a primeira ocorrência, para não deslocar as posições ainda não tratadas
+    for ocorrencia in reversed(ocorrencias):
+        inicio, fim = ocorrencia.span()
+        primeiro = bisect.bisect_right(inicios, inicio) - 1
+        ultimo = bisect.bisect_right(inicios, fim - 1) - 1
+
+        # O texto novo fica no run onde o marcador começa, preservando a formatação dele
+        deslocamento_inicio = inicio - inicios[primeiro]
+        deslocamento_fim = fim - inicios[ultimo]
+        if primeiro == ultimo:
+            conteudo[primeiro] = (conteudo[primeiro][:deslocamento_inicio] + replacements[ocorrencia.group(0)]
+                                  + conteudo[primeiro][deslocamento_fim:])
+        else:
+            conteudo[primeiro] = conteudo[primeiro][:deslocamento_inicio] + replacements[ocorrencia.group(0)]
+            for meio in range(primeiro + 1, ultimo):
+                conteudo[meio] = ''
+            conteudo[ultimo] = conteudo[ultimo][deslocamento_fim:]
 
-    return table
+    for t, novo in zip(textos, conteudo):
+        if (t.text or '') != novo:
+            _definir_texto(t, novo)
 
 
-#
-def substituir_texto_documento(doc, replacements):
-    def remove_paragraph(paragraph):
-        p = paragraph._element
-        p.getparent().remove(p)
-        paragraph._p = paragraph._element = None
-
-    # Substituir texto em todos os parágrafos do documento
-    for paragraph in doc.paragraphs:
-        for old_text, new_text in replacements.items():
-            if old_text in paragraph.text:
-                if old_text == "{{IP}}" and not new_text.strip():  # Condicionar a remoção apenas ao campo IP
-                    # Remove o parágrafo se o texto de substituição estiver vazio
-                    remove_paragraph(paragraph)
-                    break  # Sai do loop interno após remover o parágrafo
-                else:
-                    inline = paragraph.runs
-                    for run in inline:
-                        if old_text in run.text:
-                            run.text = run.text.replace(old_text, new_text)
-
-    # Substituir texto em todas as tabelas do documento
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                paragraphs = cell.paragraphs
-                for paragraph in paragraphs:
-                    for old_text, new_text in replacements.items():
-                        if old_text in paragraph.text:
-                            if old_text == "{{IP}}" and not new_text.strip():  # Condicionar a remoção apenas ao campo IP
-                                # Remove o parágrafo se o texto de substituição estiver vazio
-                                remove_paragraph(paragraph)
-                                break  # Sai do loop interno após remover o parágrafo
-                            else:
-                                inline = paragraph.runs
-                                for run in inline:
-                                    if old_text in run.text:
-                                        run.text = run.text.replace(old_text, new_text)
-
-    # Substituir texto no cabeçalho de todas as seções do documento
+# Função para listar as partes do documento onde há texto: corpo, cabeçalhos e rodapés (sem repetir os compartilhados)
+def _elementos_documento(doc):
+    elementos = [doc.element.body]
+    vistos = set()
     for section in doc.sections:
-        header = section.header
-        for paragraph in header.paragraphs:
-            for old_text, new_text in replacements.items():
-                if old_text in paragraph.text:
-                    if old_text == "{{IP}}" and not new_text.strip():  # Condicionar a remoção apenas ao campo IP
-                        # Remove o parágrafo se o texto de substituição estiver vazio
-                        remove_paragraph(paragraph)
-                        break  # Sai do loop interno após remover o parágrafo
-                    else:
-                        inline = paragraph.runs
-                        for run in inline:
-                            if old_text in run.text:
-                                run.text = run.text.replace(old_text, new_text)
-                                
-# Função para inserir as tabelas e realizar substituições de texto
-def inserir_tabelas_word(doc, itens_configurados, observacao, replacements):
+        for nome in PARTES_SECAO:
+            parte = getattr(section, nome)
+            # Cabeçalhos vinculados à seção anterior não têm definição própria
+            if parte.is_linked_to_previous:
+                continue
+            if id(parte.part) in vistos:
+                continue
+            vistos.add(id(parte.part))
+            elementos.append(parte._element)
+    return elementos
+
+
+# Função para substituir todos os marcadores do documento em uma única passada.
+# Percorre corpo, tabelas (inclusive aninhadas), cabeçalhos e rodapés com um único padrão compilado.
+def substituir_texto_documento(doc, replacements):
+    if not replacements:
+        return
+
+    # Chaves mais longas primeiro, para '{{OBRA}}' não ser confundida com marcadores menores
+    chaves = sorted(replacements, key=len, reverse=True)
+    padrao = re.compile('|'.join(re.escape(chave) for chave in chaves))
+    replacements = {chave: str(valor) for chave, valor in replacements.items()}
+    remover_ip = '{{IP}}' in replacements and not replacements['{{IP}}'].strip()
+
+    for elemento in _elementos_documento(doc):
+        # Lista fixa antes de alterar a árvore, pois parágrafos podem ser removidos
+        for p in list(elemento.iter(W_P)):
+            _substituir_paragrafo(p, padrao, replacements, remover_ip)
+
+# Função para inserir as tabelas (a partir da visão da proposta) e realizar substituições de texto
+def inserir_tabelas_word(doc, visao, observacao, replacements):
     # Realizar a substituição do texto usando o dicionário replacements
     substituir_texto_documento(doc, replacements)
 
@@ -371,7 +320,7 @@ def inserir_tabelas_word(doc, itens_configurados, observacao, replacements):
     for i, paragraph in enumerate(doc.paragraphs):
         if "Quadro de Preços" in paragraph.text:
             # Inserir a tabela de Quadro de Preços logo após o parágrafo
-            table = create_custom_table(doc, itens_configurados, observacao)
+            table = create_custom_table(doc, visao, observacao)
             doc.paragraphs[i+1]._element.addnext(table._element)
             break
 
@@ -379,12 +328,10 @@ def inserir_tabelas_word(doc, itens_configurados, observacao, replacements):
     for i, paragraph in enumerate(doc.paragraphs):
         if "Escopo de Fornecimento" in paragraph.text:
             # Inserir a tabela de escopo logo após o parágrafo
-            table_escopo = create_custom_table_escopo(doc, itens_configurados)
+            table_escopo = create_custom_table_escopo(doc, visao)
             doc.paragraphs[i+1]._element.addnext(table_escopo._element)
             break
 
     # Retornar o documento atualizado
     return doc
-    # Salvar o documento no caminho de saída
-    doc.save(output_path)
 
@@ -1,37 +1,304 @@
+import json
 import os
 import tempfile
-from shareplum import Site, Office365
-from shareplum.site import Version
+import threading
+import time
 
+# Tempo máximo (s) para conectar e para esperar cada resposta do SharePoint
+TIMEOUT = (10, 120)
+# Tentativas para falhas temporárias (rede, HTTP 429 e 5xx), com espera dobrando a cada uma
+TENTATIVAS = int(os.getenv("SHAREPOINT_TENTATIVAS", "3"))
+ESPERA_TENTATIVA = 1.0
+# Validade (s) do login quando os cookies não informam a expiração
+SESSAO_TTL = float(os.getenv("SHAREPOINT_SESSAO_TTL", "1800"))
+# O login é renovado este tempo (s) antes de expirar
+MARGEM_EXPIRACAO = 60
+TAMANHO_BLOCO = 1024 * 1024
+PASTA_DOWNLOADS = os.getenv("SHAREPOINT_DOWNLOAD_DIR", os.path.join(tempfile.gettempdir(), "sharepoint"))
+
+
+class SessaoExpirada(Exception):
+    pass
+
+
+class ErroTransitorio(Exception):
+    pass
+
+
+# Acesso ao SharePoint do Office 365: login por cookies (shareplum) e arquivos pela API REST, em blocos
+class BackendSharePoint:
+    def __init__(self, url, site, usuario, senha, biblioteca, pasta):
+        self.url = url
+        self.site = site
+        self.usuario = usuario
+        self.senha = senha
+        self.biblioteca = biblioteca
+        self.pasta = '/'.join([biblioteca, pasta])
+        self._sessao = None
+        self._site_url = None
+        self._pasta_servidor = None
+        self._digest = None
+        self._digest_expira = 0.0
+        self._pastas_criadas = set()
+
+    # Faz o login e abre o site e a pasta; devolve quando (time.time()) o login expira
+    def conectar(self):
+        from shareplum import Site, Office365
+        from shareplum.errors import ShareplumRequestError
+        from shareplum.site import Version
+        try:
+            cookies = Office365(self.url, username=self.usuario, password=self.senha).GetCookies()
+            site = Site(self.site, version=Version.v365, authcookie=cookies, timeout=TIMEOUT[1])
+            pasta = site.Folder(self.pasta)
+        except ShareplumRequestError as e:
+            # Falha de rede ou HTTP; usuário e senha errados não são repetidos
+            raise ErroTransitorio(f"Falha ao conectar ao SharePoint: {e}") from e
+        self._sessao = site._session
+        self._site_url = site.site_url
+        self._pasta_servidor = pasta.info['d']['ServerRelativeUrl']
+        self._digest = None
+        self._pastas_criadas = set()
+        expiracoes = [cookie.expires for cookie in cookies if cookie.expires]
+        return min(expiracoes) if expiracoes else time.time() + SESSAO_TTL
+
+    def _url_arquivo(self, nome_arquivo):
+        caminho = f"{self._pasta_servidor}/{nome_arquivo}".replace("'", "''")
+        return f"{self._site_url}/_api/web/GetFileByServerRelativeUrl('{caminho}')"
+
+    def _requisicao(self, metodo, url, **argumentos):
+        import requests
+        try:
+            resposta = self._sessao.request(metodo, url, timeout=TIMEOUT, **argumentos)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise ErroTransitorio(str(e)) from e
+        if resposta.status_code in (401, 403):
+            resposta.close()
+            raise SessaoExpirada(f"HTTP {resposta.status_code}")
+        if resposta.status_code == 429 or resposta.status_code >= 500:
+            resposta.close()
+            raise ErroTransitorio(f"HTTP {resposta.status_code}")
+        if resposta.status_code == 404:
+            resposta.close()
+            raise FileNotFoundError(url)
+        resposta.raise_for_status()
+        return resposta
+
+    # Versão (ETag), data de alteração e tamanho do arquivo, sem baixar o conteúdo
+    def metadados(self, nome_arquivo):
+        corpo = self._requisicao('GET', self._url_arquivo(nome_arquivo), headers={'Accept': 'application/json;odata=verbose'}).json()
+        dados = corpo.get('d', corpo)
+        return {'versao': dados.get('ETag'), 'modificado': dados.get('TimeLastModified'), 'tamanho': int(dados.get('Length', 0))}
+
+    # Conteúdo do arquivo em blocos, sem carregar tudo na memória
+    def blocos(self, nome_arquivo):
+        import requests
+        with self._requisicao('GET', self._url_arquivo(nome_arquivo) + '/$value', stream=True) as resposta:
+            try:
+                yield from resposta.iter_content(TAMANHO_BLOCO)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                # Conexão caiu no meio do arquivo: o download recomeça do início
+                raise ErroTransitorio(str(e)) from e
+
+    # Token (X-RequestDigest) exigido pelo SharePoint para gravar; renovado quando vence
+    def _cabecalho_digest(self):
+        if self._digest is None or time.time() >= self._digest_expira - MARGEM_EXPIRACAO:
+            info = self._requisicao('POST', f"{self._site_url}/_api/contextinfo").json()
+            self._digest = info['FormDigestValue']
+            self._digest_expira = time.time() + info.get('FormDigestTimeoutSeconds', SESSAO_TTL)
+        return {'X-RequestDigest': self._digest}
+
+    # Cria a pasta (relativa à biblioteca) se ainda não existe; feito uma vez por login
+    def _garantir_pasta(self, pasta):
+        caminho = '/'.join([self.biblioteca, pasta])
+        if caminho in self._pastas_criadas:
+            return caminho
+        cabecalhos = {
+            'Accept': 'application/json;odata=verbose',
+            'Content-Type': 'application/json;odata=verbose',
+            **self._cabecalho_digest(),
+        }
+        corpo = json.dumps({'__metadata': {'type': 'SP.Folder'}, 'ServerRelativeUrl': caminho})
+        self._requisicao('POST', f"{self._site_url}/_api/web/folders", headers=cabecalhos, data=corpo).close()
+        self._pastas_criadas.add(caminho)
+        return caminho
+
+    # Envia o arquivo (objeto aberto em modo binário) para a pasta, substituindo o que tiver o mesmo nome
+    def enviar(self, pasta, nome_arquivo, arquivo):
+        caminho = self._garantir_pasta(pasta).replace("'", "''")
+        nome = nome_arquivo.replace("'", "''")
+        url = f"{self._site_url}/_api/web/GetFolderByServerRelativeUrl('{caminho}')/Files/add(url='{nome}',overwrite=true)"
+        self._requisicao('POST', url, headers=self._cabecalho_digest(), data=arquivo).close()
+
+
+# Backend local que imita o SharePoint com os arquivos de uma pasta (desenvolvimento e testes sem rede).
+# As falhas colocadas em "falhas" são lançadas, uma por chamada, antes de cada operação.
+class BackendLocal:
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.falhas = []
+        self.chamadas = {'conectar': 0, 'metadados': 0, 'blocos': 0, 'enviar': 0}
+
+    def _falhar(self, operacao):
+        self.chamadas[operacao] += 1
+        if self.falhas:
+            raise self.falhas.pop(0)
+
+    def conectar(self):
+        self._falhar('conectar')
+        return time.time() + SESSAO_TTL
+
+    def metadados(self, nome_arquivo):
+        self._falhar('metadados')
+        info = os.stat(os.path.join(self.pasta, nome_arquivo))
+        return {'versao': f"{info.st_mtime_ns}-{info.st_size}", 'modificado': info.st_mtime, 'tamanho': info.st_size}
+
+    def blocos(self, nome_arquivo):
+        self._falhar('blocos')
+        with open(os.path.join(self.pasta, nome_arquivo), 'rb') as arquivo:
+            while True:
+                bloco = arquivo.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                yield bloco
+
+    def enviar(self, pasta, nome_arquivo, arquivo):
+        self._falhar('enviar')
+        destino = os.path.join(self.pasta, pasta, nome_arquivo)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino + '.tmp', 'wb') as saida:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+                saida.write(bloco)
+        os.replace(destino + '.tmp', destino)
+
+
+# Backend configurado pelo ambiente: SHAREPOINT_FAKE_DIR usa uma pasta local no lugar do SharePoint
+def backend_padrao():
+    if os.getenv("SHAREPOINT_FAKE_DIR"):
+        return BackendLocal(os.getenv("SHAREPOINT_FAKE_DIR"))
+    return BackendSharePoint(
+        os.getenv("SHAREPOINT_URL"),
+        os.getenv("SHAREPOINT_SITE"),
+        os.getenv("SHAREPOINT_USER"),
+        os.getenv("SHAREPOINT_PASSWORD"),
+        os.getenv("SHAREPOINT_DOC_LIBRARY"),
+        os.getenv("SHAREPOINT_FOLDER_NAME"),
+    )
+
+
+# Cliente do SharePoint: reaproveita o login até expirar, baixa em blocos direto para o disco,
+# só baixa de novo quando a versão remota muda e repete as falhas temporárias
 class SharePoint:
-    def __init__(self):
-        self.USERNAME = os.getenv("SHAREPOINT_USER")
-        self.PASSWORD = os.getenv("SHAREPOINT_PASSWORD")
-        self.SHAREPOINT_URL = os.getenv("SHAREPOINT_URL")
-        self.SHAREPOINT_SITE = os.getenv("SHAREPOINT_SITE")  # Substitua pelo site específico
-        self.SHAREPOINT_DOC = os.getenv("SHAREPOINT_DOC_LIBRARY")
-        self.FOLDER_NAME = os.getenv("SHAREPOINT_FOLDER_NAME")
-
-    def auth(self):
-        self.authcookie = Office365(self.SHAREPOINT_URL, username=self.USERNAME, password=self.PASSWORD).GetCookies()
-        self.site = Site(self.SHAREPOINT_SITE, version=Version.v365, authcookie=self.authcookie)
-        return self.site
-
-    def connect_folder(self):
-        self.auth_site = self.auth()
-        self.sharepoint_dir = '/'.join([self.SHAREPOINT_DOC, self.FOLDER_NAME])
-        self.folder = self.auth_site.Folder(self.sharepoint_dir)
-        return self.folder
+    def __init__(self, backend=None, pasta_downloads=PASTA_DOWNLOADS, tentativas=TENTATIVAS, espera=ESPERA_TENTATIVA):
+        self.backend = backend if backend is not None else backend_padrao()
+        self.pasta_downloads = pasta_downloads
+        self.tentativas = tentativas
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._expira_em = 0.0
+        self.estatisticas = {'logins': 0, 'downloads': 0, 'sem_alteracao': 0, 'envios': 0, 'repeticoes': 0}
+
+    def _conectar(self, renovar=False):
+        with self._lock:
+            if renovar or time.time() >= self._expira_em - MARGEM_EXPIRACAO:
+                self._expira_em = 0.0
+                self._expira_em = self.backend.conectar()
+                self.estatisticas['logins'] += 1
+
+    # Executa uma operação com login válido, renovando o login uma vez se ele foi recusado
+    def _executar(self, funcao, *argumentos):
+        falhas = 0
+        renovar = False
+        login_renovado = False
+        while True:
+            try:
+                self._conectar(renovar)
+                return funcao(*argumentos)
+            except SessaoExpirada:
+                if login_renovado:
+                    raise
+                renovar = login_renovado = True
+            except ErroTransitorio:
+                falhas += 1
+                if falhas >= self.tentativas:
+                    raise
+                renovar = False
+                time.sleep(self.espera * 2 ** (falhas - 1))
+            with self._lock:
+                self.estatisticas['repeticoes'] += 1
+
+    # Grava o arquivo em blocos em um temporário na mesma pasta e troca pelo definitivo de uma vez
+    def _gravar(self, nome_arquivo, destino):
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                for bloco in self.backend.blocos(nome_arquivo):
+                    arquivo.write(bloco)
+            os.replace(temporario, destino)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    def metadados(self, nome_arquivo):
+        return self._executar(self.backend.metadados, nome_arquivo)
+
+    # Baixa o arquivo para o disco se a versão remota mudou; devolve (caminho, se foi baixado agora)
+    def baixar_arquivo(self, nome_arquivo, destino=None):
+        destino = destino or os.path.join(self.pasta_downloads, nome_arquivo)
+        os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+        caminho_versao = destino + '.versao.json'
+
+        remoto = self.metadados(nome_arquivo)
+        try:
+            with open(caminho_versao) as arquivo:
+                local = json.load(arquivo)
+        except (OSError, ValueError):
+            local = None
+        if local == remoto and os.path.exists(destino) and os.path.getsize(destino) == remoto['tamanho']:
+            with self._lock:
+                self.estatisticas['sem_alteracao'] += 1
+            return destino, False
+
+        self._executar(self._gravar, nome_arquivo, destino)
+        with open(caminho_versao, 'w') as arquivo:
+            json.dump(remoto, arquivo)
+        with self._lock:
+            self.estatisticas['downloads'] += 1
+        return destino, True
+
+    def baixar_conteudo(self, file_name):
+        caminho, _ = self.baixar_arquivo(file_name)
+        with open(caminho, 'rb') as arquivo:
+            return arquivo.read()
+
+    # Envia um arquivo local para a pasta (relativa à biblioteca) com as mesmas repetições dos downloads
+    def enviar_arquivo(self, caminho, pasta, nome_arquivo=None):
+        nome_arquivo = nome_arquivo or os.path.basename(caminho)
+
+        def enviar():
+            # Reabre a cada tentativa para mandar o arquivo desde o começo
+            with open(caminho, 'rb') as arquivo:
+                self.backend.enviar(pasta, nome_arquivo, arquivo)
+
+        self._executar(enviar)
+        with self._lock:
+            self.estatisticas['envios'] += 1
 
     def download_file(self, file_name):
-        self._folder = self.connect_folder()
-        file = self._folder.get_file(file_name)
-        
-        # Caminho para salvar o arquivo temporariamente usando o diretório temporário do sistema
-        temp_path = os.path.join(tempfile.gettempdir(), file_name)
-        
-        # Salvar o arquivo localmente no caminho temporário
-        with open(temp_path, 'wb') as f:
-            f.write(file)
-        
-        return temp_path  # Retorna o caminho do arquivo baixado
+        # Caminho do arquivo baixado (na pasta de downloads do SharePoint dentro da pasta temporária do sistema)
+        caminho, _ = self.baixar_arquivo(file_name)
+        return caminho
+
+
+_sharepoint = None
+_lock_sharepoint = threading.Lock()
+
+
+# Função para obter o cliente do SharePoint compartilhado pelo processo (o login é reaproveitado)
+def obter_sharepoint():
+    global _sharepoint
+    if _sharepoint is None:
+        with _lock_sharepoint:
+            if _sharepoint is None:
+                _sharepoint = SharePoint()
+    return _sharepoint
@@ -0,0 +1,154 @@
+import os
+import subprocess
+import sys
+import types
+import pytest
+import arquivamento
+from arquivamento import ArquivamentoPropostas, travar_caixa
+from sharepoint_code import BackendLocal, ErroTransitorio, SharePoint
+
+ARQUIVOS = {'proposta.docx': b'word', 'resumo.pdf': b'pdf'}
+
+
+# Envio ao SharePoint local que falha nas primeiras chamadas
+class EnvioInstavel:
+    def __init__(self, cliente, falhas=0):
+        self.cliente = cliente
+        self.falhas = falhas
+        self.enviados = []
+
+    def __call__(self, caminho, pasta_destino, nome_arquivo):
+        if self.falhas:
+            self.falhas -= 1
+            raise ErroTransitorio('503')
+        self.cliente.enviar_arquivo(caminho, pasta_destino, nome_arquivo)
+        self.enviados.append(nome_arquivo)
+
+
+@pytest.fixture
+def remoto(tmp_path):
+    pasta = tmp_path / 'remoto'
+    pasta.mkdir()
+    return BackendLocal(str(pasta))
+
+
+@pytest.fixture
+def envio(remoto, tmp_path):
+    return EnvioInstavel(SharePoint(remoto, pasta_downloads=str(tmp_path / 'downloads'), tentativas=1, espera=0))
+
+
+# Relógio controlado pelo teste para o horário das novas tentativas
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(arquivamento, 'time', types.SimpleNamespace(time=lambda: agora[0], sleep=lambda _: None))
+    return agora
+
+
+def _caixa(tmp_path, envio, **kwargs):
+    return ArquivamentoPropostas(str(tmp_path / 'caixa'), enviar=envio, **kwargs)
+
+
+def _no_remoto(remoto, nome):
+    return os.path.join(remoto.pasta, 'Propostas', nome)
+
+
+def test_pendente_sobrevive_ao_reinicio(tmp_path, envio, remoto):
+    _caixa(tmp_path, envio).enfileirar(ARQUIVOS, 'Propostas')
+
+    reiniciado = _caixa(tmp_path, envio)
+    assert reiniciado.resumo()['pendentes'] == 1
+    assert reiniciado.processar_lote() == 1
+    with open(_no_remoto(remoto, 'resumo.pdf'), 'rb') as arquivo:
+        assert arquivo.read() == b'pdf'
+    assert reiniciado.resumo()['pendentes'] == 0
+    assert os.listdir(reiniciado.pasta_pendentes) == []
+
+
+def test_nova_tentativa_com_espera_dobrada(tmp_path, envio, relogio):
+    envio.falhas = 3
+    caixa = _caixa(tmp_path, envio, maximo_tentativas=5, espera_inicial=10, espera_maxima=25)
+    caixa.enfileirar(ARQUIVOS, 'Propostas')
+
+    esperas = []
+    for _ in range(3):
+        assert caixa.processar_lote() == 1
+        tarefa, = caixa._tarefas.values()
+        esperas.append(tarefa.proxima_tentativa - relogio[0])
+        # Antes do horário agendado a tarefa não é enviada
+        relogio[0] = tarefa.proxima_tentativa - 1
+        assert caixa.processar_lote() == 0
+        relogio[0] += 1
+    assert esperas == [10, 20, 25]
+    assert tarefa.tentativas == 3 and tarefa.ultimo_erro == 'ErroTransitorio: 503'
+
+    assert caixa.processar_lote() == 1
+    assert caixa.resumo()['arquivadas'] == 1
+
+
+def test_arquivo_ja_enviado_nao_e_reenviado(tmp_path, envio):
+    class FalhaNoSegundo(EnvioInstavel):
+        def __call__(self, caminho, pasta_destino, nome_arquivo):
+            if nome_arquivo == 'resumo.pdf' and self.falhas:
+                self.falhas -= 1
+                raise ErroTransitorio('503')
+            super().__call__(caminho, pasta_destino, nome_arquivo)
+
+    envio = FalhaNoSegundo(envio.cliente, falhas=1)
+    caixa = _caixa(tmp_path, envio, espera_inicial=0)
+    caixa.enfileirar(ARQUIVOS, 'Propostas')
+    caixa.processar_lote()
+    # O progresso gravado no disco vale também depois de um reinício
+    _caixa(tmp_path, envio, espera_inicial=0).processar_lote()
+    assert envio.enviados == ['proposta.docx', 'resumo.pdf']
+
+
+def test_desiste_apos_a_ultima_tentativa_e_reenvia_falhas(tmp_path, envio, remoto):
+    envio.falhas = 2
+    caixa = _caixa(tmp_path, envio, maximo_tentativas=2, espera_inicial=0)
+    id_tarefa = caixa.enfileirar(ARQUIVOS, 'Propostas')
+
+    caixa.processar_lote()
+    assert caixa.resumo()['em_falha'] == 0
+    caixa.processar_lote()
+    resumo = caixa.resumo()
+    assert (resumo['pendentes'], resumo['em_falha'], resumo['falhas']) == (0, 1, 1)
+    assert os.listdir(caixa.pasta_falhas) == [id_tarefa]
+    assert caixa.processar_lote() == 0
+
+    assert caixa.reenviar_falhas() == 1
+    tarefa, = caixa._tarefas.values()
+    assert tarefa.tentativas == 0
+    assert caixa.processar_lote() == 1
+    assert os.path.exists(_no_remoto(remoto, 'proposta.docx'))
+    assert caixa.resumo()['em_falha'] == 0
+
+
+# Outro processo segura a trava da caixa de saída (como o "arquivamento.py --enviar")
+TRAVA_EM_OUTRO_PROCESSO = """
+import sys
+from arquivamento import travar_caixa
+with travar_caixa(sys.argv[1]):
+    print('travada', flush=True)
+    sys.stdin.read()
+"""
+
+
+def test_lote_nao_roda_com_a_caixa_travada_por_outro_processo(tmp_path, envio):
+    caixa = _caixa(tmp_path, envio)
+    caixa.enfileirar(ARQUIVOS, 'Propostas')
+
+    outro = subprocess.Popen(
+        [sys.executable, '-c', TRAVA_EM_OUTRO_PROCESSO, caixa.arquivo_trava],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(arquivamento.__file__),
+    )
+    try:
+        assert outro.stdout.readline().strip() == 'travada'
+        assert caixa.processar_lote() is None
+        with travar_caixa(caixa.arquivo_trava, esperar=False) as travada:
+            assert not travada
+    finally:
+        outro.communicate('')
+
+    assert caixa.processar_lote() == 1
+    assert envio.enviados == ['proposta.docx', 'resumo.pdf']
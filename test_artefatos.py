@@ -0,0 +1,63 @@
+import os
+import time
+import types
+import pytest
+import artefatos
+from artefatos import EXTENSAO, ArmazemArtefatos
+
+
+# Relógio controlado pelo teste para o TTL em memória
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(artefatos, 'time', types.SimpleNamespace(monotonic=lambda: agora[0], time=time.time))
+    return agora
+
+
+def test_inicio_so_apaga_arquivos_vencidos_de_outros_processos(tmp_path):
+    recente = tmp_path / ('recente' + EXTENSAO)
+    antigo = tmp_path / ('antigo' + EXTENSAO)
+    outro = tmp_path / 'outro.txt'
+    for arquivo in (recente, antigo, outro):
+        arquivo.write_bytes(b'x')
+    duas_horas = time.time() - 7200
+    os.utime(antigo, (duas_horas, duas_horas))
+    os.utime(outro, (duas_horas, duas_horas))
+
+    ArmazemArtefatos(str(tmp_path), ttl=3600)
+
+    assert recente.exists() and outro.exists()
+    assert not antigo.exists()
+
+
+def test_leitura_e_resumo_limpam_os_expirados(tmp_path, relogio):
+    armazem = ArmazemArtefatos(str(tmp_path), ttl=60)
+    artefato = armazem.guardar('s1', 'a.pdf', b'conteudo', 'application/pdf')
+    assert armazem.ler(artefato) == b'conteudo'
+
+    relogio[0] += 61
+    assert armazem.resumo()['documentos'] == 0
+    assert armazem.estatisticas['expirados'] == 1
+    assert armazem.ler(artefato) is None
+    assert not os.path.exists(os.path.join(str(tmp_path), artefato.id + EXTENSAO))
+
+
+def test_documento_lido_nao_expira(tmp_path, relogio):
+    armazem = ArmazemArtefatos(str(tmp_path), ttl=60)
+    artefato = armazem.guardar('s1', 'a.pdf', b'conteudo', 'application/pdf')
+    relogio[0] += 50
+    armazem.ler(artefato)
+    relogio[0] += 50
+    assert armazem.existe(artefato)
+
+
+def test_remover_sessao_apaga_so_os_documentos_dela(tmp_path):
+    armazem = ArmazemArtefatos(str(tmp_path))
+    anterior = armazem.guardar('s1', 'a.pdf', b'1', 'application/pdf')
+    outra = armazem.guardar('s2', 'b.pdf', b'2', 'application/pdf')
+
+    armazem.remover_sessao('s1')
+
+    assert not armazem.existe(anterior)
+    assert armazem.ler(outra) == b'2'
+    assert armazem.resumo()['sessoes'] == 1
@@ -0,0 +1,126 @@
+import importlib
+import os
+import sys
+import types
+import msal
+import pytest
+from cryptography.fernet import Fernet
+
+
+# Cliente MSAL falso: contas fixas e resultado configurável do login silencioso
+class AppFalso:
+    def __init__(self, *args, **kwargs):
+        self.resultado_silencioso = {'access_token': 'token'}
+        self.contas_pedidas = []
+
+    def get_accounts(self):
+        return [
+            {'home_account_id': 'outra.t', 'username': 'outra@x.com'},
+            {'home_account_id': 'ana.t', 'username': 'ana@x.com'},
+        ]
+
+    def acquire_token_silent(self, scopes, account):
+        self.contas_pedidas.append(account['home_account_id'])
+        return self.resultado_silencioso
+
+    def get_authorization_request_url(self, scopes, redirect_uri):
+        return 'https://login.example/autorizar'
+
+
+# Importa o auth.py sem falar com o Azure (no import ele já tenta autenticar e para no link de login)
+@pytest.fixture
+def auth(monkeypatch):
+    monkeypatch.setattr(msal, 'ConfidentialClientApplication', AppFalso)
+    sys.modules.pop('auth', None)
+    modulo = importlib.import_module('auth')
+    yield modulo
+    sys.modules.pop('auth', None)
+
+
+@pytest.fixture
+def chave():
+    return Fernet.generate_key().decode()
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    return str(tmp_path / 'msal_cache.bin')
+
+
+def test_cache_criptografado_sobrevive_ao_reinicio(auth, arquivo, chave):
+    cache = auth.CacheTokens(arquivo, chave)
+    valor = cache.lembrar('ana.t')
+    cache.gravar()
+
+    with open(arquivo, 'rb') as conteudo:
+        assert b'ana.t' not in conteudo.read()
+    assert auth.CacheTokens(arquivo, chave).conta_do_navegador(valor) == 'ana.t'
+
+
+def test_chave_trocada_comeca_cache_vazio(auth, arquivo, chave, capsys):
+    cache = auth.CacheTokens(arquivo, chave)
+    cache.lembrar('ana.t')
+    cache.gravar()
+
+    assert auth.CacheTokens(arquivo, Fernet.generate_key().decode()).navegadores == {}
+    assert 'InvalidToken' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('conteudo', [b'{"msal": "{}"}', b'{"navegadores": {}}'])
+def test_arquivo_sem_as_chaves_esperadas_comeca_cache_vazio(auth, arquivo, chave, conteudo, capsys):
+    with open(arquivo, 'wb') as saida:
+        saida.write(Fernet(chave).encrypt(conteudo))
+
+    assert auth.CacheTokens(arquivo, chave).navegadores == {}
+    assert 'KeyError' in capsys.readouterr().out
+
+
+def test_cookie_desconhecido_ou_vencido_nao_tem_conta(auth, arquivo, chave, monkeypatch):
+    cache = auth.CacheTokens(arquivo, chave)
+    assert cache.conta_do_navegador('desconhecido') is None
+
+    monkeypatch.setattr(auth, 'DIAS_LEMBRAR', 0)
+    vencido = cache.lembrar('ana.t')
+    assert cache.conta_do_navegador(vencido) is None
+    cache.gravar()
+    assert auth.CacheTokens(arquivo, chave).navegadores == {}
+
+
+def test_sem_chave_nada_vai_para_o_disco(auth, arquivo):
+    cache = auth.CacheTokens(arquivo, None)
+    valor = cache.lembrar('ana.t')
+    cache.gravar()
+    assert cache.conta_do_navegador(valor) == 'ana.t'
+    assert not os.path.exists(arquivo)
+
+
+@pytest.fixture
+def navegador(auth, arquivo, chave, monkeypatch):
+    cache = auth.CacheTokens(arquivo, chave)
+    valor = cache.lembrar('ana.t')
+    monkeypatch.setattr(auth, 'obter_cache_tokens', lambda: cache)
+    monkeypatch.setattr(auth.st, 'context', types.SimpleNamespace(cookies={auth.COOKIE_CONTA: valor}))
+    return cache, valor
+
+
+def test_login_silencioso_usa_a_conta_do_cookie(auth, navegador):
+    app = AppFalso()
+    assert auth.login_silencioso(app) == 'ana@x.com'
+    assert app.contas_pedidas == ['ana.t']
+
+
+def test_login_silencioso_sem_cookie(auth, monkeypatch):
+    monkeypatch.setattr(auth.st, 'context', types.SimpleNamespace(cookies={}))
+    app = AppFalso()
+    assert auth.login_silencioso(app) is None
+    assert app.contas_pedidas == []
+
+
+def test_token_recusado_esquece_o_navegador(auth, navegador, arquivo, chave):
+    cache, valor = navegador
+    app = AppFalso()
+    app.resultado_silencioso = {'error': 'invalid_grant'}
+
+    assert auth.login_silencioso(app) is None
+    assert cache.conta_do_navegador(valor) is None
+    assert auth.CacheTokens(arquivo, chave).conta_do_navegador(valor) is None
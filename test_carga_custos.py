@@ -0,0 +1,55 @@
+import pandas as pd
+from carga_custos import COLUNAS_CUSTOS, calcular_diferencas, sincronizar_custos
+
+
+def _linha(cod_proj_custo, descricao, preco, **outros):
+    linha = {col: None for col in COLUNAS_CUSTOS}
+    linha.update(p_caixa=100.0, p_trafo=400.0, potencia=75.0, perdas='1,2%', classe_tensao='15 kV',
+                 valor_ip_baixo=1.0, valor_ip_alto=2.0, potencia_formatada='75 kVA', cod_proj_caixa='0013.0480.000')
+    linha.update(cod_proj_custo=cod_proj_custo, descricao=descricao, preco=preco, **outros)
+    return linha
+
+
+def test_chave_do_banco_sem_normalizar_casa_com_a_planilha():
+    # No banco a chave ficou como veio do Excel: espaços em volta e número com '.0'
+    atual = pd.DataFrame([
+        dict(_linha(' X ', 'Trafo 75 kVA', 1000.0), id=7),
+        dict(_linha('123.0', 'Trafo 112,5 kVA', 2000.0), id=9),
+        dict(_linha('456', 'Trafo 150 kVA', 3000.0), id=11),
+    ])
+    novo = pd.DataFrame([
+        dict(_linha('X', 'Trafo 75 kVA', 1000.0), id=1),
+        _linha(123.0, 'Trafo 112,5 kVA', 2500.0),
+        _linha('789', 'Trafo 225 kVA', 4000.0),
+    ])
+
+    diferencas = calcular_diferencas(atual, novo)
+
+    assert diferencas['inalterados'] == 1
+    assert diferencas['alterados'][['cod_proj_custo', 'preco']].values.tolist() == [['123', 2500.0]]
+    assert diferencas['ids_alterados'] == [9]
+    assert diferencas['novos']['cod_proj_custo'].tolist() == ['789']
+    assert diferencas['ids_removidos'] == [11]
+
+
+def test_sincronizar_nao_duplica_chave_gravada_de_outro_jeito(banco):
+    with banco() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    INSERT INTO custos_media_tensao ({', '.join(COLUNAS_CUSTOS)})
+                    SELECT {', '.join(COLUNAS_CUSTOS)} FROM json_populate_recordset(NULL::custos_media_tensao, %s)
+                """, (pd.DataFrame([_linha(' X ', 'Trafo 75 kVA', 1000.0),
+                                    _linha('123.0', 'Trafo 112,5 kVA', 2000.0)]).to_json(orient='records'),))
+
+    planilha = pd.DataFrame([_linha('X', 'Trafo 75 kVA', 1500.0), _linha('123', 'Trafo 112,5 kVA', 2000.0)])
+    resultado = sincronizar_custos(planilha)
+    assert (resultado['linhas_atualizadas'], resultado['linhas_inseridas'], resultado['linhas_inalteradas']) == (1, 0, 1)
+
+    # A segunda sincronização da mesma planilha não grava nada
+    resultado = sincronizar_custos(planilha)
+    assert (resultado['linhas_atualizadas'], resultado['linhas_inseridas'], resultado['versao_alterada']) == (0, 0, False)
+
+    with banco() as conn:
+        df = pd.read_sql("SELECT cod_proj_custo, preco FROM custos_media_tensao ORDER BY id", conn)
+    assert df.values.tolist() == [['X', 1500.0], ['123.0', 2000.0]]
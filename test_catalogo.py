@@ -0,0 +1,67 @@
+import time
+import pandas as pd
+import catalogo
+from carga_custos import COLUNAS_CUSTOS, carregar_custos, sincronizar_custos
+
+
+def _planilha(*precos):
+    return pd.DataFrame([{
+        'p_caixa': 100.0, 'p_trafo': 0.1, 'potencia': 75.0 * (posicao + 1), 'preco': preco, 'perdas': '1,2%',
+        'classe_tensao': '15 kV', 'valor_ip_baixo': 1.0, 'valor_ip_alto': 2.0, 'cod_proj_custo': str(posicao),
+        'descricao': f"Trafo {posicao}", 'potencia_formatada': '', 'cod_proj_caixa': '',
+    } for posicao, preco in enumerate(precos)], columns=COLUNAS_CUSTOS)
+
+
+def _precos(catalogo_atual):
+    return [linha['preco'] for linha in catalogo_atual.linhas]
+
+
+def test_checksum_sem_tabela_de_versao(banco):
+    catalogo.limpar_cache_catalogo()
+    with banco() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("INSERT INTO custos_media_tensao (potencia, preco, descricao) VALUES (75, 1000, 'Trafo 0')")
+    primeiro = catalogo.obter_catalogo()
+    assert primeiro.versao.startswith('h1-')
+
+    with banco() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE custos_media_tensao SET preco = 1500")
+    # Passado o CATALOGO_VERSAO_TTL, a nova consulta vê outro checksum e troca de catálogo
+    catalogo.consultar_versao.clear()
+    segundo = catalogo.obter_catalogo()
+    assert segundo.versao != primeiro.versao and _precos(segundo) == [1500.0]
+
+
+def test_versao_incrementada_troca_o_catalogo(banco):
+    catalogo.limpar_cache_catalogo()
+    carregar_custos(_planilha(1000.0, 2000.0))
+    assert catalogo.obter_catalogo().versao == 'v1'
+
+    sincronizar_custos(_planilha(1000.0, 2500.0))
+    # Sem invalidar: a versão antiga continua valendo até o TTL da consulta de versão
+    assert catalogo.obter_catalogo().versao == 'v1'
+    catalogo.consultar_versao.clear()
+    atual = catalogo.obter_catalogo()
+    assert atual.versao == 'v2' and _precos(atual) == [1000.0, 2500.0]
+
+
+def test_notify_invalida_a_versao_na_hora(banco, monkeypatch):
+    monkeypatch.setattr(catalogo, 'ESCUTAR_NOTIFICACOES', True)
+    catalogo.limpar_cache_catalogo()
+    carregar_custos(_planilha(1000.0))
+    assert catalogo.obter_catalogo().versao == 'v1'
+
+    # A escuta começa em segundo plano: repete a atualização até ela chegar (sem limpar o cache à mão)
+    limite = time.monotonic() + 15
+    preco = 1000.0
+    while catalogo.obter_catalogo().versao == 'v1':
+        assert time.monotonic() < limite, "a notificação de nova versão não chegou"
+        time.sleep(0.5)
+        if catalogo.obter_catalogo().versao == 'v1':
+            preco += 1
+            sincronizar_custos(_planilha(preco))
+            time.sleep(0.5)
+    assert _precos(catalogo.obter_catalogo()) == [preco]
@@ -0,0 +1,62 @@
+import pytest
+import indice_frete
+from indice_frete import ler_tabela_distancias, montar_indice, sugerir_frete
+from municipios import gravar_arquivo
+
+LINHAS = [
+    {'municipio': 'São Paulo/SP', 'distancia_km': '120', 'frete_percentual': '2,5'},
+    {'municipio': 'Rio de Janeiro/RJ', 'distancia_km': '450,5', 'frete_percentual': '4'},
+]
+
+
+# Índice gravado num arquivo temporário e carregado como no servidor
+@pytest.fixture
+def indice(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'indice_frete.json.gz')
+    gravar_arquivo(montar_indice(LINHAS, origem='/dados/distancias.csv'), caminho)
+    monkeypatch.setattr(indice_frete, 'ARQUIVO_INDICE', caminho)
+    monkeypatch.setattr(indice_frete, '_indice', None)
+    return caminho
+
+
+def test_sugestao_sem_diferenciar_acentos_e_maiusculas(indice):
+    assert sugerir_frete('SAO PAULO/SP') == ('São Paulo/SP', 120.0, 2.5)
+    assert sugerir_frete(' Rio de Janeiro/RJ ').frete_percentual == 4.0
+    assert indice_frete.obter_indice_frete().origem == 'distancias.csv'
+
+
+def test_municipio_fora_do_indice_ou_em_branco(indice):
+    assert sugerir_frete('Campinas/SP') is None
+    assert sugerir_frete('') is None
+    assert sugerir_frete(None) is None
+
+
+def test_sem_arquivo_nada_e_sugerido(tmp_path, monkeypatch):
+    monkeypatch.setattr(indice_frete, 'ARQUIVO_INDICE', str(tmp_path / 'nao_existe.json.gz'))
+    monkeypatch.setattr(indice_frete, '_indice', None)
+    assert sugerir_frete('São Paulo/SP') is None
+
+
+def test_municipio_repetido_com_outra_grafia():
+    linhas = LINHAS + [{'municipio': 'SAO PAULO/SP', 'distancia_km': '130', 'frete_percentual': '3'}]
+    with pytest.raises(ValueError, match='Linha 4: o município SAO PAULO/SP já está na linha 2'):
+        montar_indice(linhas)
+
+
+def test_linha_sem_frete():
+    linhas = [{'municipio': 'Santos/SP', 'distancia_km': '80', 'frete_percentual': ' '}]
+    with pytest.raises(ValueError, match='Linha 2'):
+        montar_indice(linhas)
+
+
+def test_tabela_csv_com_ponto_e_virgula(tmp_path):
+    caminho = tmp_path / 'distancias.csv'
+    caminho.write_text('municipio;distancia_km;frete_percentual\nSão Paulo/SP;120;2,5\n', encoding='utf-8')
+    assert montar_indice(ler_tabela_distancias(str(caminho)))['municipios'] == {'São Paulo/SP': [120.0, 2.5]}
+
+
+def test_tabela_sem_as_colunas_obrigatorias(tmp_path):
+    caminho = tmp_path / 'distancias.csv'
+    caminho.write_text('municipio,km\nSão Paulo/SP,120\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='não tem as colunas: distancia_km, frete_percentual'):
+        ler_tabela_distancias(str(caminho))
@@ -0,0 +1,29 @@
+import pytest
+from lote_propostas import montar_item
+
+DETALHES = {
+    'id': 1, 'descricao': 'Trafo 75 kVA', 'potencia': 75.0, 'classe_tensao': '15 kV', 'perdas': '1,2%',
+    'cod_proj_caixa': '0013.0480.000', 'cod_proj_custo': '10',
+}
+
+
+@pytest.mark.parametrize('fator_k, quantidade, esperado', [
+    ('', '', (1, 1)),
+    ('4', '3', (4, 3)),
+    ('13,0', '2.0', (13, 2)),
+])
+def test_inteiros_aceitos(fator_k, quantidade, esperado):
+    item = montar_item(2, {'fator_k': fator_k, 'quantidade': quantidade}, DETALHES)
+    assert (item['Fator K'], item['Quantidade']) == esperado
+
+
+@pytest.mark.parametrize('linha, mensagem', [
+    ({'fator_k': '1.5'}, "Item 2: Fator K 1.5 precisa ser um número inteiro"),
+    ({'fator_k': 'quatro'}, "Item 2: Fator K 'quatro' não é um número"),
+    ({'quantidade': '2,5'}, "Item 2: Quantidade 2,5 precisa ser um número inteiro"),
+    ({'quantidade': '0'}, "Item 2: Quantidade 0 inválida"),
+    ({'quantidade': '-3'}, "Item 2: Quantidade -3 inválida"),
+])
+def test_valores_nao_inteiros_ou_quantidade_menor_que_um(linha, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        montar_item(2, linha, DETALHES)
@@ -0,0 +1,74 @@
+import math
+import pandas as pd
+import pytest
+import pyarrow.parquet as pq
+from matriz_precos import COLUNAS_SAIDA, FATORES_K, OPCOES_CONTRIBUINTE, OPCOES_IP, exportar_matriz
+
+PARAMETROS = {'lucro': 5.0, 'icms': 12.0, 'frete': 5.0, 'comissao': 5.0, 'difal': 2.0, 'f_pobreza': 1.0}
+
+
+def _catalogo():
+    return pd.DataFrame({
+        'id': [1, 2, 3],
+        'descricao': ['Trafo 75', 'Trafo 150', 'Trafo 300'],
+        'potencia': [75.0, 150.0, 300.0],
+        'classe_tensao': ['15 kV', '24 kV', '36 kV'],
+        # Texto vazio em todo o primeiro bloco e preenchido depois
+        'perdas': [None, '1,2%', '1,0%'],
+        'cod_proj_custo': ['10', '20', '30'],
+        'cod_proj_caixa': [None, None, '0013.0480.000'],
+        'preco': [10_000.0, 20_000.0, 40_000.0],
+        'p_trafo': [0.05, 0.05, 0.05],
+        'valor_ip_baixo': [500.0, 800.0, 1_200.0],
+        'valor_ip_alto': [900.0, 1_500.0, 2_000.0],
+        'p_caixa': [0.1, 0.1, 0.1],
+    })
+
+
+def test_parquet_com_coluna_de_texto_vazia_no_primeiro_bloco(tmp_path):
+    caminho = str(tmp_path / 'precos.parquet')
+    resultado = exportar_matriz(_catalogo(), PARAMETROS, caminho, linhas_por_bloco=1)
+
+    tabela = pq.read_table(caminho)
+    combinacoes = len(FATORES_K) * len(OPCOES_IP) * len(OPCOES_CONTRIBUINTE)
+    assert resultado['precos'] == tabela.num_rows == 3 * combinacoes
+    assert tabela.schema.names == COLUNAS_SAIDA
+    assert str(tabela.schema.field('perdas').type) == 'string'
+    assert str(tabela.schema.field('preco_unitario').type) == 'int64'
+    assert pq.ParquetFile(caminho).num_row_groups == 3
+    assert tabela.column('perdas').to_pylist()[combinacoes:combinacoes + 1] == ['1,2%']
+
+
+@pytest.mark.parametrize('extensao', ['parquet', 'xlsx'])
+def test_linha_com_valor_invalido_fica_de_fora(tmp_path, extensao):
+    catalogo = _catalogo()
+    catalogo.loc[1, 'preco'] = math.nan
+    catalogo.loc[2, 'p_caixa'] = math.inf
+    caminho = str(tmp_path / f'precos.{extensao}')
+    resultado = exportar_matriz(catalogo, PARAMETROS, caminho, linhas_por_bloco=1)
+
+    combinacoes = len(FATORES_K) * len(OPCOES_IP) * len(OPCOES_CONTRIBUINTE)
+    assert resultado['precos'] == combinacoes
+    assert (resultado['linhas_ignoradas'], resultado['ids_ignorados']) == (2, [2, 3])
+    lidos = pd.read_parquet(caminho) if extensao == 'parquet' else pd.read_excel(caminho)
+    assert set(lidos['id']) == {1}
+
+
+def test_erro_na_exportacao_nao_deixa_arquivo(tmp_path):
+    caminho = tmp_path / 'precos.parquet'
+    # Percentuais que zeram o divisor: nenhum preço é calculável
+    with pytest.raises(ValueError):
+        exportar_matriz(_catalogo(), dict(PARAMETROS, icms=100.0), str(caminho), linhas_por_bloco=1)
+    assert not caminho.exists()
+
+
+def test_parquet_com_codigos_numericos_e_textuais(tmp_path):
+    catalogo = _catalogo()
+    catalogo['cod_proj_custo'] = pd.Series([10, '20A', None], dtype=object)
+    caminho = str(tmp_path / 'precos.parquet')
+    exportar_matriz(catalogo, PARAMETROS, caminho)
+
+    tabela = pq.read_table(caminho)
+    codigos = dict(zip(tabela.column('id').to_pylist(), tabela.column('cod_proj_custo').to_pylist()))
+    assert str(tabela.schema.field('cod_proj_custo').type) == 'string'
+    assert codigos == {1: '10', 2: '20A', 3: None}
@@ -0,0 +1,75 @@
+import pytest
+import municipios
+from municipios import _conteudo, _montar, buscar_cidades, gravar_arquivo, ler_arquivo
+
+# Amostra no formato do IBGE: [código, nome, UF]
+REGISTROS = [
+    [2211001, 'Teresina', 'PI'],
+    [2924009, 'Paulo Afonso', 'BA'],
+    [3106200, 'Belo Horizonte', 'MG'],
+    [3301009, 'Campos dos Goytacazes', 'RJ'],
+    [3304557, 'Rio de Janeiro', 'RJ'],
+    [3304904, 'São Gonçalo', 'RJ'],
+    [3549904, 'São José dos Campos', 'SP'],
+    [3550100, 'São Pedro', 'SP'],
+    [3550308, 'São Paulo', 'SP'],
+    [4125506, 'São José dos Pinhais', 'PR'],
+]
+
+
+@pytest.fixture
+def amostra():
+    return _montar(_conteudo(REGISTROS))
+
+
+def test_sem_diferenciar_acentos_e_maiusculas(amostra):
+    assert buscar_cidades('SÃO PAU', municipios=amostra) == ['São Paulo/SP']
+    assert buscar_cidades('sao goncalo', municipios=amostra) == ['São Gonçalo/RJ']
+
+
+def test_busca_pelo_comeco_de_qualquer_palavra(amostra):
+    assert buscar_cidades('rio jan', municipios=amostra) == ['Rio de Janeiro/RJ']
+    assert buscar_cidades('jose pinh', municipios=amostra) == ['São José dos Pinhais/PR']
+    # A UF também é uma palavra do nome
+    assert buscar_cidades('paulo sp', municipios=amostra) == ['São Paulo/SP']
+    # Só o começo das palavras conta
+    assert buscar_cidades('aulo', municipios=amostra) == []
+
+
+def test_nome_que_comeca_com_o_texto_vem_primeiro(amostra):
+    assert buscar_cidades('sao p', municipios=amostra) == ['São Paulo/SP', 'São Pedro/SP', 'São José dos Pinhais/PR']
+    assert buscar_cidades('campos', municipios=amostra) == ['Campos dos Goytacazes/RJ', 'São José dos Campos/SP']
+    assert buscar_cidades('paulo', municipios=amostra) == ['Paulo Afonso/BA', 'São Paulo/SP']
+
+
+def test_limite(amostra):
+    assert buscar_cidades('sao', limite=3, municipios=amostra) == [
+        'São Gonçalo/RJ', 'São José dos Campos/SP', 'São José dos Pinhais/PR'
+    ]
+    assert buscar_cidades('rj', limite=2, municipios=amostra) == ['Campos dos Goytacazes/RJ', 'Rio de Janeiro/RJ']
+
+
+def test_texto_sem_letras_nao_busca(amostra):
+    assert buscar_cidades(' - ', municipios=amostra) == []
+
+
+def test_arquivo_gravado_e_carregado_pelo_processo(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'municipios.json.gz')
+    gravar_arquivo(_conteudo(REGISTROS), caminho)
+    assert ler_arquivo(caminho)['municipios'] == REGISTROS
+
+    monkeypatch.setattr(municipios, 'ARQUIVO_MUNICIPIOS', caminho)
+    monkeypatch.setattr(municipios, '_municipios', None)
+    assert buscar_cidades('teresina') == ['Teresina/PI']
+    assert municipios.obter_municipios().posicoes['Teresina/PI'] == 9
+
+
+def test_atualizar_informa_incluidos_e_removidos(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'municipios.json.gz')
+    gravar_arquivo(_conteudo(REGISTROS[:-1]), caminho)
+    monkeypatch.setattr(municipios, 'baixar_do_ibge', lambda: REGISTROS[1:])
+
+    resultado = municipios.atualizar(caminho)
+
+    assert (resultado['incluidos'], resultado['removidos']) == (['São José dos Pinhais/PR'], ['Teresina/PI'])
+    assert resultado['municipios'] == len(REGISTROS) - 1
@@ -1,37 +1,36 @@
-import streamlit as st
-from io import BytesIO
-from pages.Resumo import gerar_pdf  # Suponha que 'Resumo' seja o módulo onde a função gerar_pdf está definida
+from documentos import gerar_pdf
+from visao_proposta import montar_proposta, montar_visao
 
-# Configuração dos dados de exemplo
-st.session_state['dados_iniciais'] = {
-    'bt': '001',
-    'rev': 'A',
-    'cliente': 'Cliente Exemplo',
-    'nomeCliente': 'Nome do Cliente',
-    'fone': '1234-5678',
-    'email': 'cliente@exemplo.com',
-    'obra': 'Obra Exemplo',
-    'dia': '09',
-    'mes': '12',
-    'ano': '2024',
-    'local_frete': 'São Paulo'
+# Configuração dos dados de exemplo (mesmas chaves do session_state das páginas)
+ESTADO = {
+    'dados_iniciais': {
+        'bt': '001',
+        'rev': 'A',
+        'cliente': 'Cliente Exemplo',
+        'nomeCliente': 'Nome do Cliente',
+        'fone': '1234-5678',
+        'email': 'cliente@exemplo.com',
+        'obra': 'Obra Exemplo',
+        'dia': '09',
+        'mes': '12',
+        'ano': '2024',
+        'local_frete': 'São Paulo'
+    },
+    'contribuinte_icms': 'Contribuinte Exemplo',
+    'lucro': 10.0,
+    'icms': 18.0,
+    'frete': 3.0,
+    'comissao': 5.0,
+    'difal': 2.0,
+    'f_pobreza': 0.5,
+    'local_frete_itens': 'São Paulo',
+    'itens_configurados': [
+        {'Potência': '15 kVA', 'IP': '00', 'Descrição': 'Item Exemplo 1', 'Fator K': 1.0, 'Quantidade': 5, 'Preço Unitário': 100.00},
+        {'Potência': '30 kVA', 'IP': '21', 'Descrição': 'Item Exemplo 2', 'Fator K': 1.2, 'Quantidade': 3, 'Preço Unitário': 150.00},
+        # Adicione mais itens conforme necessário
+    ],
 }
 
-st.session_state['contribuinte_icms'] = 'Contribuinte Exemplo'
-st.session_state['lucro'] = 10.0
-st.session_state['icms'] = 18.0
-st.session_state['frete'] = 3.0
-st.session_state['comissao'] = 5.0
-st.session_state['difal'] = 2.0
-st.session_state['f_pobreza'] = 0.5
-st.session_state['local_frete_itens'] = 'São Paulo'
-
-st.session_state['itens_configurados'] = [
-    {'Potência': '15 kVA', 'IP': '00', 'Descrição': 'Item Exemplo 1', 'Fator K': 1.0, 'Quantidade': 5, 'Preço Unitário': 100.00},
-    {'Potência': '30 kVA', 'IP': '21', 'Descrição': 'Item Exemplo 2', 'Fator K': 1.2, 'Quantidade': 3, 'Preço Unitário': 150.00},
-    # Adicione mais itens conforme necessário
-]
-
 # Função para mapear potência para código de projeto de caixa
 def get_mapping_code(potencia):
     mapping = {
@@ -58,21 +57,17 @@ def get_mapping_code(potencia):
     }
     return mapping.get(potencia, "Não especificado")
 
-# Chamada à função gerar_pdf
-pdf_buffer = gerar_pdf()
 
-if pdf_buffer:
-    # Verifica o código do item para cada configuração de item
-    for item in st.session_state['itens_configurados']:
-        potencia_item = item.get('Potência', '')
-        # Obtém o código correspondente para a potência
-        codigo_item = get_mapping_code(potencia_item)
-        st.write(f"Código para potência {potencia_item}: {codigo_item}")
+def test_gerar_pdf(tmp_path):
+    proposta = montar_proposta(ESTADO)
+    # Código da caixa de cada item pela potência
+    for item in proposta['itens_configurados']:
+        item['cod_proj_caixa'] = get_mapping_code(item.get('Potência', ''))
+
+    pdf_buffer = gerar_pdf(montar_visao(proposta))
 
     # Salva o PDF em um arquivo
-    output_path = 'teste.pdf'
-    with open(output_path, 'wb') as f:
-        f.write(pdf_buffer.getvalue())
-    st.success(f"PDF gerado com sucesso! Você pode encontrá-lo em {output_path}.")
-else:
-    st.error("Falha na geração do PDF.")
+    output_path = tmp_path / 'teste.pdf'
+    output_path.write_bytes(pdf_buffer.getvalue())
+    assert output_path.read_bytes().startswith(b'%PDF')
+    assert output_path.stat().st_size > 1000
@@ -0,0 +1,120 @@
+import bisect
+import math
+import numpy as np
+import pytest
+from precificacao import (
+    calcular_precos, calcular_percentuais, montar_entrada, montar_tabela_potencias,
+    icms_base, irpj_cssl, tkxadmmkt, mocusfixo, pisconfins, p_caixa_24, p_caixa_36, percentuais_k,
+)
+
+
+# Fórmula original da página de Itens, item a item (referência para o cálculo vetorizado)
+def preco_original(detalhes_item, linhas, fator_k_escolhido, ip_escolhido, parametros):
+    percentuais = ((parametros['lucro'] / 100) + (icms_base) + (parametros['comissao'] / 100) + (parametros['frete'] / 100)
+                   + irpj_cssl + tkxadmmkt + mocusfixo + pisconfins)
+    preco_base1 = detalhes_item['preco'] / (1 - detalhes_item['p_trafo'] - percentuais)
+
+    if fator_k_escolhido > 5:
+        potencia_equivalente = detalhes_item['potencia'] / (
+            (-0.000000391396 * fator_k_escolhido**6) +
+            (0.000044437349 * fator_k_escolhido**5) -
+            (0.001966117106 * fator_k_escolhido**4) +
+            (0.040938237195 * fator_k_escolhido**3) -
+            (0.345600795014 * fator_k_escolhido**2) -
+            (1.369407483908 * fator_k_escolhido) +
+            101.826204136368
+        ) / 100 * 10000
+        potencias = sorted(linha['potencia'] for linha in linhas)
+        idx = bisect.bisect_left(potencias, potencia_equivalente)
+        potencia_equivalente = potencias[idx] if idx < len(potencias) else potencias[-1]
+        equivalente = next(linha for linha in linhas if linha['potencia'] == potencia_equivalente)
+        valor_ip_baixo, valor_ip_alto, p_caixa = equivalente['valor_ip_baixo'], equivalente['valor_ip_alto'], equivalente['p_caixa']
+    else:
+        valor_ip_baixo, valor_ip_alto, p_caixa = detalhes_item['valor_ip_baixo'], detalhes_item['valor_ip_alto'], detalhes_item['p_caixa']
+
+    if ip_escolhido == '00':
+        adicional_ip = 0.0
+    else:
+        adicional_ip = valor_ip_baixo / (1 - percentuais - p_caixa) if int(ip_escolhido) < 54 else valor_ip_alto / (1 - percentuais - p_caixa)
+
+    adicional_caixa_classe = 0
+    if detalhes_item['classe_tensao'] == "24 kV":
+        adicional_caixa_classe = p_caixa_24 * adicional_ip
+    elif detalhes_item['classe_tensao'] == "36 kV":
+        adicional_caixa_classe = p_caixa_36 * adicional_ip
+
+    adicional_k = 0
+    if fator_k_escolhido in percentuais_k:
+        adicional_k = preco_base1 * percentuais_k[fator_k_escolhido]
+
+    return int(((preco_base1 + adicional_ip + adicional_k + adicional_caixa_classe) * (1 - 0.12)) /
+               (1 - (parametros['difal'] / 100) - (parametros['f_pobreza'] / 100) - (parametros['icms'] / 100)))
+
+
+def _catalogo(gerador, quantidade=40):
+    potencias = sorted(gerador.choice(np.arange(15, 5000, 5), quantidade, replace=False))
+    return [{
+        'id': posicao + 1,
+        'preco': float(gerador.uniform(1_000, 500_000)),
+        'p_trafo': float(gerador.uniform(0.0, 0.2)),
+        'potencia': float(potencia),
+        'valor_ip_baixo': float(gerador.uniform(100, 20_000)),
+        'valor_ip_alto': float(gerador.uniform(100, 40_000)),
+        'p_caixa': float(gerador.uniform(0.0, 0.3)),
+        'classe_tensao': str(gerador.choice(['15 kV', '24 kV', '36 kV', 'outra'])),
+    } for posicao, potencia in enumerate(potencias)]
+
+
+PARAMETROS = {'lucro': 5.0, 'icms': 12.0, 'frete': 5.0, 'comissao': 5.0, 'difal': 2.0, 'f_pobreza': 1.0}
+
+
+def _comparar(linhas, escolhidas, fatores_k, ips, parametros):
+    precos = calcular_precos(montar_entrada(escolhidas, fatores_k, ips), montar_tabela_potencias(linhas), parametros)
+    esperados = [preco_original(linha, linhas, k, ip, parametros) for linha, k, ip in zip(escolhidas, fatores_k, ips)]
+    assert precos['preco_unitario'].tolist() == esperados
+
+
+def test_mesmo_preco_da_formula_original():
+    gerador = np.random.default_rng(2024)
+    linhas = _catalogo(gerador)
+    for _ in range(20):
+        quantidade = 200
+        escolhidas = [linhas[i] for i in gerador.integers(0, len(linhas), quantidade)]
+        fatores_k = [int(k) for k in gerador.choice([1, 4, 6, 8, 13, 20], quantidade)]
+        ips = [str(ip) for ip in gerador.choice(['00', '21', '23', '54', '65'], quantidade)]
+        parametros = {chave: float(gerador.uniform(0, 15)) for chave in PARAMETROS}
+        _comparar(linhas, escolhidas, fatores_k, ips, parametros)
+
+
+def test_truncamento_igual_ao_int():
+    linhas = _catalogo(np.random.default_rng(7), quantidade=10)
+    # Varre o preço em passos pequenos: muitos resultados caem perto de um inteiro
+    escolhidas = [dict(linhas[3], preco=float(preco)) for preco in np.arange(1_000.0, 30_000.0, 0.37)]
+    _comparar(linhas, escolhidas, [1] * len(escolhidas), ['00'] * len(escolhidas), PARAMETROS)
+
+    # Preço exatamente inteiro e resultados negativos (int() trunca em direção a zero, não para baixo)
+    percentuais = calcular_percentuais(PARAMETROS['lucro'], PARAMETROS['comissao'], PARAMETROS['frete'])
+    divisor = 1 - (PARAMETROS['difal'] + PARAMETROS['f_pobreza'] + PARAMETROS['icms']) / 100
+    exato = dict(linhas[0], p_trafo=0.0, preco=1234 * divisor / 0.88 * (1 - percentuais))
+    negativos = [dict(linhas[0], p_trafo=0.9, preco=preco) for preco in [1.0, 10.0, 333.3]]
+    _comparar(linhas, [exato] + negativos, [1] * 4, ['00'] * 4, PARAMETROS)
+    assert any(preco_original(linha, linhas, 1, '00', PARAMETROS) < 0 for linha in negativos)
+
+
+@pytest.mark.parametrize('alteracao', [
+    {'preco': math.nan},
+    {'preco': math.inf},
+    {'valor_ip_baixo': math.nan},
+])
+def test_recusa_valores_nao_finitos(alteracao):
+    linhas = _catalogo(np.random.default_rng(1), quantidade=5)
+    escolhidas = [linhas[0], dict(linhas[1], **alteracao)]
+    with pytest.raises(ValueError, match="itens: 2"):
+        calcular_precos(montar_entrada(escolhidas, [1, 1], ['00', '21']), montar_tabela_potencias(linhas), PARAMETROS)
+
+
+def test_recusa_divisor_zerado():
+    linhas = _catalogo(np.random.default_rng(1), quantidade=5)
+    parametros = dict(PARAMETROS, icms=100.0, difal=0.0, f_pobreza=0.0)
+    with pytest.raises(ValueError):
+        calcular_precos(montar_entrada(linhas[:1], [1], ['00']), montar_tabela_potencias(linhas), parametros)
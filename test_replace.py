@@ -0,0 +1,139 @@
+from io import BytesIO
+from docx import Document
+from replace import inserir_tabelas_word, substituir_texto_documento
+from visao_proposta import montar_proposta, montar_visao
+
+REPLACEMENTS = {
+    '{{CLIENTE}}': 'Cliente Exemplo',
+    '{{OBRA}}': 'Obra Exemplo',
+    '{{BT}}': '001',
+    '{{REV}}': 'A',
+    '{{IP}}': '',
+}
+
+
+def _textos(paragrafos):
+    return [p.text for p in paragrafos]
+
+
+# Documento com marcadores em um único run (os mesmos resultados da substituição original, run a run)
+def test_marcadores_inteiros_como_na_substituicao_original():
+    doc = Document()
+    doc.add_paragraph('Cliente: {{CLIENTE}}')
+    doc.add_paragraph('Obra {{OBRA}} - BT {{BT}} rev. {{REV}}')
+    doc.add_paragraph('Grau de proteção: {{IP}}')
+    doc.add_paragraph('Sem marcadores')
+    tabela = doc.add_table(rows=1, cols=2)
+    tabela.cell(0, 0).text = '{{OBRA}}'
+    tabela.cell(0, 1).text = 'IP {{IP}}'
+    doc.sections[0].header.paragraphs[0].text = 'Proposta {{BT}}'
+
+    substituir_texto_documento(doc, REPLACEMENTS)
+
+    assert _textos(doc.paragraphs) == ['Cliente: Cliente Exemplo', 'Obra Obra Exemplo - BT 001 rev. A', 'Sem marcadores']
+    assert tabela.cell(0, 0).text == 'Obra Exemplo'
+    # A célula fica com um parágrafo vazio, obrigatório no Word
+    assert _textos(tabela.cell(0, 1).paragraphs) == ['']
+    assert _textos(doc.sections[0].header.paragraphs) == ['Proposta 001']
+
+
+def test_marcador_dividido_em_varios_runs_mantem_formatacao_do_primeiro():
+    doc = Document()
+    paragrafo = doc.add_paragraph('Cliente: ')
+    negrito = paragrafo.add_run('{{CLI')
+    negrito.bold = True
+    paragrafo.add_run('EN')
+    paragrafo.add_run('TE}} e obra {{OBRA}}')
+
+    substituir_texto_documento(doc, REPLACEMENTS)
+
+    assert paragrafo.text == 'Cliente: Cliente Exemplo e obra Obra Exemplo'
+    assert [run.text for run in paragrafo.runs] == ['Cliente: ', 'Cliente Exemplo', '', ' e obra Obra Exemplo']
+    assert paragrafo.runs[1].bold
+
+
+def test_rodape_e_tabela_aninhada():
+    doc = Document()
+    externa = doc.add_table(rows=1, cols=1)
+    interna = externa.cell(0, 0).add_table(rows=1, cols=1)
+    interna.cell(0, 0).text = 'Cliente {{CLIENTE}}'
+    secao = doc.sections[0]
+    secao.footer.paragraphs[0].text = 'Rev. {{REV}}'
+    secao.different_first_page_header_footer = True
+    secao.first_page_header.paragraphs[0].text = 'BT {{BT}}'
+
+    substituir_texto_documento(doc, REPLACEMENTS)
+
+    assert interna.cell(0, 0).text == 'Cliente Cliente Exemplo'
+    assert secao.footer.paragraphs[0].text == 'Rev. A'
+    assert secao.first_page_header.paragraphs[0].text == 'BT 001'
+
+
+def test_ip_preenchido_nao_remove_o_paragrafo():
+    doc = Document()
+    doc.add_paragraph('Grau de proteção: {{IP}}')
+
+    substituir_texto_documento(doc, dict(REPLACEMENTS, **{'{{IP}}': 'IP-54'}))
+
+    assert _textos(doc.paragraphs) == ['Grau de proteção: IP-54']
+
+
+def test_ip_dividido_em_runs_tambem_remove_o_paragrafo():
+    doc = Document()
+    doc.add_paragraph('Antes')
+    paragrafo = doc.add_paragraph('IP ')
+    paragrafo.add_run('{{I')
+    paragrafo.add_run('P}}')
+
+    substituir_texto_documento(doc, REPLACEMENTS)
+
+    assert _textos(doc.paragraphs) == ['Antes']
+
+
+def _visao():
+    return montar_visao(montar_proposta({
+        'dados_iniciais': {'bt': '001', 'cliente': 'Cliente Exemplo'},
+        'itens_configurados': [
+            {'Potência': '15 kVA', 'IP': '00', 'Fator K': 1, 'Quantidade': 5, 'Preço Unitário': 100.0,
+             'Tensão Primária': '13.8', 'Tensão Secundária': '380', 'Perdas': '1,2%', 'IPI': 0.0},
+            {'Potência': '30 kVA', 'IP': '21', 'Fator K': 4, 'Quantidade': 3, 'Preço Unitário': 1500.0,
+             'Tensão Primária': '13.8', 'Tensão Secundária': '220', 'Perdas': '1,0%', 'IPI': 0.0},
+        ],
+    }))
+
+
+def test_tabelas_inseridas_apos_os_titulos():
+    doc = Document()
+    doc.add_paragraph('Quadro de Preços')
+    doc.add_paragraph('Valores em reais:')
+    doc.add_paragraph('Escopo de Fornecimento')
+    doc.add_paragraph('Itens:')
+    visao = _visao()
+
+    inserir_tabelas_word(doc, visao, 'Frete incluso', {'{{BT}}': '001'})
+
+    # O XML montado em bloco precisa abrir de novo no python-docx
+    arquivo = BytesIO()
+    doc.save(arquivo)
+    quadro, escopo = Document(arquivo).tables
+
+    # Cabeçalho, um item por linha, total e observação
+    assert len(quadro.rows) == len(visao.itens) + 3
+    assert [celula.text for celula in quadro.rows[0].cells] == [
+        'Item', 'Qtde', 'Potência', 'K', 'Tensões', 'IP', 'Perda', 'Preço Uni. R$', 'Preço Total R$', 'IPI'
+    ]
+    assert [celula.text for celula in quadro.rows[2].cells] == [
+        '2', '3', '30 kVA', '4', '13.8kV /220 V', '21', '1,0%', '1.500,00', '4.500,00', '0,0%'
+    ]
+    assert quadro.rows[3].cells[0].text == 'Valor Total do Fornecimento:'
+    assert quadro.rows[3].cells[-1].text == visao.total_moeda
+    assert quadro.rows[4].cells[0].text == 'Obs.: Frete incluso'
+
+    assert len(escopo.rows) == len(visao.itens) + 1
+    assert escopo.cell(1, 0).text == '1'
+    assert escopo.cell(1, 1).text == ''.join(parte for parte, _ in visao.itens[0].escopo_partes)
+    negritos = [run.text for run in escopo.cell(1, 1).paragraphs[0].runs if run.bold]
+    assert negritos == [parte for parte, negrito in visao.itens[0].escopo_partes if negrito]
+
+    corpo = [elemento.tag.split('}')[1] for elemento in doc.element.body if not elemento.tag.endswith('sectPr')]
+    assert corpo == ['p', 'p', 'tbl', 'p', 'p', 'tbl']
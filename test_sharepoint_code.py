@@ -0,0 +1,86 @@
+import os
+import pytest
+from sharepoint_code import BackendLocal, ErroTransitorio, SessaoExpirada, SharePoint
+
+
+@pytest.fixture
+def remoto(tmp_path):
+    pasta = tmp_path / 'remoto'
+    pasta.mkdir()
+    (pasta / 'template.docx').write_bytes(b'versao 1')
+    return BackendLocal(str(pasta))
+
+
+@pytest.fixture
+def cliente(remoto, tmp_path):
+    return SharePoint(remoto, pasta_downloads=str(tmp_path / 'downloads'), tentativas=3, espera=0)
+
+
+def test_login_reaproveitado(cliente, remoto):
+    cliente.metadados('template.docx')
+    cliente.baixar_arquivo('template.docx')
+    cliente.enviar_arquivo(os.path.join(remoto.pasta, 'template.docx'), 'Propostas', 'copia.docx')
+    assert remoto.chamadas['conectar'] == 1
+    assert cliente.estatisticas['logins'] == 1
+
+
+def test_arquivo_sem_alteracao_nao_e_baixado_de_novo(cliente, remoto):
+    caminho, baixado = cliente.baixar_arquivo('template.docx')
+    assert baixado
+    assert cliente.baixar_arquivo('template.docx') == (caminho, False)
+    assert remoto.chamadas['blocos'] == 1
+    assert cliente.estatisticas['sem_alteracao'] == 1
+
+
+def test_arquivo_alterado_e_baixado_de_novo(cliente, remoto):
+    caminho, _ = cliente.baixar_arquivo('template.docx')
+    with open(os.path.join(remoto.pasta, 'template.docx'), 'ab') as arquivo:
+        arquivo.write(b' e 2')
+    assert cliente.baixar_arquivo('template.docx') == (caminho, True)
+    with open(caminho, 'rb') as arquivo:
+        assert arquivo.read() == b'versao 1 e 2'
+    assert cliente.estatisticas['downloads'] == 2
+
+
+def test_falhas_temporarias_sao_repetidas(cliente, remoto):
+    remoto.falhas = [ErroTransitorio('503'), ErroTransitorio('429')]
+    caminho, baixado = cliente.baixar_arquivo('template.docx')
+    assert baixado and os.path.exists(caminho)
+    assert cliente.estatisticas['repeticoes'] == 2
+
+
+def test_desiste_apos_as_tentativas(cliente, remoto):
+    cliente.metadados('template.docx')
+    remoto.falhas = [ErroTransitorio('503')] * 3
+    with pytest.raises(ErroTransitorio):
+        cliente.metadados('template.docx')
+    assert remoto.chamadas['metadados'] == 1 + 3
+    assert remoto.chamadas['conectar'] == 1
+
+
+def test_falha_temporaria_no_login_e_repetida(cliente, remoto):
+    remoto.falhas = [ErroTransitorio('conexão recusada')]
+    cliente.metadados('template.docx')
+    assert remoto.chamadas['conectar'] == 2
+    assert cliente.estatisticas['logins'] == 1
+
+
+def test_login_recusado_faz_novo_login(cliente, remoto):
+    cliente.metadados('template.docx')
+    # 401/403 numa operação: o cliente faz login de novo e repete a operação uma vez
+    remoto.falhas = [SessaoExpirada('401')]
+    cliente.enviar_arquivo(os.path.join(remoto.pasta, 'template.docx'), 'Propostas', 'copia.docx')
+    assert cliente.estatisticas['logins'] == 2
+    assert os.path.exists(os.path.join(remoto.pasta, 'Propostas', 'copia.docx'))
+
+
+def test_login_recusado_duas_vezes_desiste(cliente, remoto):
+    cliente.metadados('template.docx')
+    remoto.falhas = [SessaoExpirada('403'), SessaoExpirada('403')]
+    with pytest.raises(SessaoExpirada):
+        cliente.metadados('template.docx')
+
+
+def test_arquivo_inexistente(cliente):
+    with pytest.raises(FileNotFoundError):
+        cliente.baixar_arquivo('nao_existe.docx')
@@ -0,0 +1,205 @@
+from collections import namedtuple
+from babel import Locale, numbers
+
+# Formatação brasileira, feita uma única vez ao montar a visão da proposta
+LOCALE = Locale.parse('pt_BR')
+FORMATO_VALOR = '#,##0.00'
+FORMATO_PERCENTUAL = '#,##0.0#'
+
+# Percentual de caixa considerado por classe de tensão (itens IP 00 não têm caixa)
+PERCENTUAL_CAIXA_CLASSE = {
+    "15 kV": 0,
+    "24 kV": 30,
+    "36 kV": 50
+}
+
+# Percentuais comerciais na ordem em que aparecem nos documentos
+ROTULOS_PERCENTUAIS = [
+    ('lucro', 'Lucro'),
+    ('icms', 'ICMS'),
+    ('frete', 'Frete'),
+    ('comissao', 'Comissão'),
+    ('difal', 'DIFAL'),
+    ('f_pobreza', 'F.pobreza'),
+]
+
+# Chaves do session_state que descrevem uma proposta (além de dados_iniciais e itens_configurados)
+CHAVES_PROPOSTA = [
+    'lucro', 'icms', 'frete', 'comissao', 'difal', 'f_pobreza', 'contribuinte_icms', 'local_frete_itens',
+    'versao_catalogo'
+]
+
+
+# Função para copiar do session_state tudo o que os documentos precisam, sem depender do Streamlit
+def montar_proposta(estado):
+    proposta = {chave: estado.get(chave) for chave in CHAVES_PROPOSTA}
+    proposta['dados_iniciais'] = dict(estado.get('dados_iniciais', {}))
+    proposta['itens_configurados'] = [dict(item) for item in estado.get('itens_configurados', [])]
+    return proposta
+
+
+# Nome do arquivo Word da proposta
+def nome_arquivo_word(proposta):
+    return f"Proposta Blutrafos nº BT {proposta['dados_iniciais']['bt']}-Rev{proposta['dados_iniciais']['rev']}.docx"
+
+
+# Nome do arquivo PDF com o extrato da proposta
+def nome_arquivo_pdf(proposta):
+    return f"Resumo_Proposta_BT_{proposta['dados_iniciais']['bt']}-Rev{proposta['dados_iniciais']['rev']}_EXTRATO.pdf"
+
+
+# Item da proposta já formatado para os documentos (imutável)
+ItemVisao = namedtuple('ItemVisao', [
+    'numero', 'quantidade', 'descricao', 'potencia_texto', 'fator_k', 'ip', 'perdas', 'tensoes_texto',
+    'eficiencia', 'nbi', 'percentual_caixa_texto', 'codigo_custo', 'codigo_caixa',
+    'preco_unitario', 'preco_total', 'preco_unitario_texto', 'preco_total_texto',
+    'preco_unitario_moeda', 'preco_total_moeda', 'ipi_texto', 'escopo_partes',
+])
+
+# Proposta completa, montada uma vez por geração e usada pelo Word e pelo PDF (imutável)
+VisaoProposta = namedtuple('VisaoProposta', [
+    'bt', 'rev', 'cliente', 'nome_cliente', 'fone', 'email', 'obra', 'dia', 'mes', 'ano', 'local_frete',
+    'local_frete_itens', 'contribuinte_icms', 'percentuais', 'icms_texto', 'ips_texto',
+    'itens', 'total', 'total_texto', 'total_moeda',
+])
+
+
+def formatar_valor(valor):
+    return numbers.format_decimal(valor, format=FORMATO_VALOR, locale=LOCALE)
+
+
+def formatar_moeda(valor):
+    return numbers.format_currency(valor, 'BRL', locale=LOCALE)
+
+
+def formatar_percentual(valor):
+    return numbers.format_decimal(float(valor or 0.0), format=FORMATO_PERCENTUAL, locale=LOCALE) + '%'
+
+
+# Função para determinar a eficiência com base nas perdas
+def determinar_eficiencia(perdas):
+    if perdas == '5356-D':
+        return "D"
+    elif perdas == '5356-A':
+        return "A"
+    elif perdas == '1,2 %':
+        return "1,2%"
+    elif perdas == '1,0 %':
+        return "1%"
+    else:
+        return "N/A"  # Valor padrão se não for encontrado
+
+
+# Potência com "kVA": inteira sem casas decimais, fracionária com uma casa e vírgula
+def formatar_potencia(potencia):
+    if isinstance(potencia, (int, float)):
+        if potencia % 1 == 0:
+            return f"{int(potencia)} kVA"
+        return f"{potencia:.1f}".replace('.', ',') + " kVA"
+    return potencia
+
+
+# Tensão secundária de linha e de fase (dividida por raiz de 3), ex.: 380/220V
+def formatar_tensao_secundaria(tensao_secundaria):
+    try:
+        tensao_secundaria_float = float(tensao_secundaria)
+        tensao_calculada = tensao_secundaria_float / 1.73
+        return f"{round(tensao_secundaria_float)}/{round(tensao_calculada)}V"
+    except ValueError:
+        # Se a conversão falhar, exibe apenas o valor original como texto e um aviso
+        return f"{tensao_secundaria}V (valor inválido para cálculo)"
+
+
+# Função para montar o texto do escopo de um item em partes (texto, negrito)
+def montar_escopo(item, potencia_texto, eficiencia, nbi):
+    classe_tensao = item.get('classe_tensao', 'N/A').replace('kV', '').strip()  # Remove 'kV'
+    tensao_secundaria_texto = formatar_tensao_secundaria(item.get('Tensão Secundária', '0'))
+
+    # Texto de escopo com ** marcando as palavras em negrito
+    escopo_text = (
+        f"Transformador Trifásico **isolado a seco**, Classe de tensão **{classe_tensao}/1,1kV**, "
+        f"Marca e Fabricação Blutrafos, Potência: **{potencia_texto}**, Fator: **K={item.get('Fator K', 'N/A')}**, "
+        f"Tensão **Primária**: **{item.get('Tensão Primária', 'N/A')}kV**, Derivações: **{item.get('Derivações', 'N/A')}**, "
+        f"Tensão **Secundária**: **{tensao_secundaria_texto}**, Grupo de Ligação: **Dyn-1**, "
+        f"Frequência: **60Hz**, NBI: **{nbi}**, Classe de Temperatura: F (155ºC), "
+        f"Elevação Temperatura média dos enrolamentos: **100ºC**, Materiais dos enrolamentos: **Alumínio**, "
+        f"Altitude de Instalação: **≤1000m**, Temperatura ambiente máxima: 40°C, "
+        f"Alta tensão Encapsulado em Resina Epóxi à Vácuo, Regime de Serviço: Contínuo, "
+        f"Tipo de Refrigeração: **AN** e Grau de Proteção: **IP-{item.get('IP', 'N/A')}**, "
+        f"Demais características cfe. Norma ABNT-NBR 5356/11 - Eficiência **“{eficiencia}”** e acessórios abaixo."
+    )
+    # Partes ímpares (entre **) ficam em negrito
+    return tuple((parte, i % 2 == 1) for i, parte in enumerate(escopo_text.split("**")))
+
+
+# Função para montar a visão de um item configurado (dicionário no formato da página de Itens)
+def montar_item(numero, item):
+    quantidade = int(item.get('Quantidade', 0) or 0)
+    preco_unitario = float(item.get('Preço Unitário', 0) or 0)
+    preco_total = preco_unitario * quantidade
+    potencia_texto = formatar_potencia(item.get('Potência', 'N/A'))
+    eficiencia = determinar_eficiencia(item.get('Perdas'))
+    nbi = item.get('NBI', 'N/A')
+    ip = str(item.get('IP', ''))
+
+    if ip == '00':
+        percentual_caixa_texto = '0%'
+    elif item.get('classe_tensao') in PERCENTUAL_CAIXA_CLASSE:
+        percentual_caixa_texto = f"{PERCENTUAL_CAIXA_CLASSE[item['classe_tensao']]}%"
+    else:
+        percentual_caixa_texto = 'Não especificado'
+
+    return ItemVisao(
+        numero=numero,
+        quantidade=quantidade,
+        descricao=item.get('Descrição', ''),
+        potencia_texto=potencia_texto,
+        fator_k=item.get('Fator K', ''),
+        ip=ip,
+        perdas=str(item.get('Perdas', '')),
+        tensoes_texto=f"{item.get('Tensão Primária')}kV /{item.get('Tensão Secundária')} V",
+        eficiencia=eficiencia,
+        nbi=nbi,
+        percentual_caixa_texto=percentual_caixa_texto,
+        codigo_custo=item.get('cod_proj_custo'),
+        codigo_caixa="N/A" if ip == '00' else item.get('cod_proj_caixa'),
+        preco_unitario=preco_unitario,
+        preco_total=preco_total,
+        preco_unitario_texto=formatar_valor(preco_unitario),
+        preco_total_texto=formatar_valor(preco_total),
+        preco_unitario_moeda=formatar_moeda(preco_unitario),
+        preco_total_moeda=formatar_moeda(preco_total),
+        ipi_texto=formatar_percentual(item.get('IPI', 0.0)),
+        escopo_partes=montar_escopo(item, potencia_texto, eficiencia, nbi),
+    )
+
+
+# Função para montar a visão da proposta a partir de montar_proposta (ou de uma proposta do lote)
+def montar_visao(proposta):
+    dados_iniciais = proposta['dados_iniciais']
+    itens = tuple(montar_item(numero, item) for numero, item in enumerate(proposta['itens_configurados'], start=1))
+    total = sum(item.preco_total for item in itens)
+
+    return VisaoProposta(
+        bt=str(dados_iniciais.get('bt', '')),
+        rev=str(dados_iniciais.get('rev', '')),
+        cliente=str(dados_iniciais.get('cliente', '')),
+        nome_cliente=str(dados_iniciais.get('nomeCliente', '')),
+        fone=str(dados_iniciais.get('fone', '')),
+        email=str(dados_iniciais.get('email', '')),
+        obra=str(dados_iniciais.get('obra', '') or ''),
+        dia=str(dados_iniciais.get('dia', '')),
+        mes=str(dados_iniciais.get('mes', '')),
+        ano=str(dados_iniciais.get('ano', '')),
+        local_frete=str(dados_iniciais.get('local_frete', '')),
+        local_frete_itens=str(proposta.get('local_frete_itens', '')),
+        contribuinte_icms=proposta.get('contribuinte_icms', ''),
+        percentuais=tuple((rotulo, formatar_percentual(proposta.get(chave))) for chave, rotulo in ROTULOS_PERCENTUAIS),
+        icms_texto=formatar_percentual(proposta.get('icms')),
+        # IPs diferentes de 00, em ordem (o texto não muda de uma geração para outra)
+        ips_texto=', '.join(sorted({item.ip for item in itens if item.ip != '00'})),
+        itens=itens,
+        total=total,
+        total_texto=formatar_valor(total),
+        total_moeda=formatar_moeda(total),
+    )